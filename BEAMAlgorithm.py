@@ -40,16 +40,14 @@ class BEAMAlgorithm(GPFAlgorithm):
         
     def processAlgorithm(self, progress):
         GPFAlgorithm.processAlgorithm(self, GPFUtils.beamKey(), progress)
+
+    def processBatch(self, inputs, outputPattern, progress, parallelJobs = None, memory = None):
+        GPFAlgorithm.processBatch(self, GPFUtils.beamKey(), inputs, outputPattern, progress, parallelJobs, memory)
         
     def helpFile(self):
         GPFAlgorithm.helpFile(self, GPFUtils.beamKey())
         
     def getIcon(self):
         return  QIcon(os.path.dirname(__file__) + "/images/beam.png")
-    
-    def getCopy(self):
-        newone = BEAMAlgorithm(self.descriptionFile)
-        newone.provider = self.provider
-        return newone
                 
         
\ No newline at end of file
@@ -33,40 +33,59 @@ from processing.core.AlgorithmProvider import AlgorithmProvider
 from processing.core.ProcessingLog import ProcessingLog
 from processing_gpf.GPFUtils import GPFUtils
 from processing_gpf.BEAMAlgorithm import BEAMAlgorithm
+from processing_gpf.GPFDescriptionIndex import GPFDescriptionIndex
+from processing_gpf.GPFAlgorithmRegistry import GPFAlgorithmRegistry
 
 class BEAMAlgorithmProvider(AlgorithmProvider):
 
     def __init__(self):
         AlgorithmProvider.__init__(self)
         self.activate = False
-        self.createAlgsList() #preloading algorithms to speed up
+        # Algorithms are created when the provider is loaded with a usable BEAM install
+        self.preloadedAlgs = None
+        # Shared with the SNAP provider so that operators are resolved across providers
+        self.registry = GPFAlgorithmRegistry.instance()
 
     def initializeSettings(self):
         AlgorithmProvider.initializeSettings(self)
         ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.BEAM_FOLDER, "BEAM install directory", GPFUtils.programPath(GPFUtils.beamKey())))
         ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.BEAM_THREADS, "Maximum number of parallel (native) threads", 4))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.BEAM_PARALLEL_JOBS, "Maximum number of parallel GPT executions", 2))
 
     def unload(self):
         AlgorithmProvider.unload(self)
         ProcessingConfig.removeSetting(GPFUtils.BEAM_FOLDER)
         ProcessingConfig.removeSetting(GPFUtils.BEAM_THREADS)
+        ProcessingConfig.removeSetting(GPFUtils.BEAM_PARALLEL_JOBS)
+        GPFUtils.stopBeamBandLister()
         
     def createAlgsList(self):
         self.preloadedAlgs = []
         folder = GPFUtils.gpfDescriptionPath(GPFUtils.beamKey())
-        for descriptionFile in os.listdir(folder):
-            if descriptionFile.endswith("txt"):
-                try:
-                    alg = BEAMAlgorithm(os.path.join(folder, descriptionFile))
-                    if alg.name.strip() != "":
-                        self.preloadedAlgs.append(alg)
-                    else:
-                        ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Could not open BEAM algorithm: " + descriptionFile)
-                except Exception,e:
+        # Reads the index of description files, the algorithms then get their
+        # descriptions from it
+        for descriptionPath, _ in GPFDescriptionIndex.descriptions(folder):
+            descriptionFile = os.path.basename(descriptionPath)
+            try:
+                alg = BEAMAlgorithm(descriptionPath)
+                if alg.name.strip() != "":
+                    alg.provider = self
+                    self.preloadedAlgs.append(alg)
+                else:
                     ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Could not open BEAM algorithm: " + descriptionFile)
+            except Exception,e:
+                ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Could not open BEAM algorithm: " + descriptionFile)
         # leave out for now as the functionality is not fully developed
         #self.preloadedAlgs.append(MultinodeGPFCreator())  
                     
+    def loadAlgorithms(self):
+        # Algorithms of a deactivated provider are not used to resolve operators
+        self.registry.clear(self.getName())
+        AlgorithmProvider.loadAlgorithms(self)
+
+    def getAlgorithmFromOperator(self, operatorName):
+        return self.registry.algorithmFromOperator(self.getName(), operatorName)
+                    
     def getDescription(self):
         return "BEAM (Envisat image analysis)"
 
@@ -77,7 +96,15 @@ class BEAMAlgorithmProvider(AlgorithmProvider):
         return QIcon(os.path.dirname(__file__) + "/images/beam.png")
 
     def _loadAlgorithms(self):
+        if not GPFUtils.beamInstalled():
+            ProcessingLog.addToLog(ProcessingLog.LOG_INFO, "BEAM algorithms not loaded since BEAM install directory doesn't contain bin/gpt")
+            self.algs = []
+            return
+        if self.preloadedAlgs is None:
+            self.createAlgsList()
         self.algs = self.preloadedAlgs  
+        for alg in self.algs:
+            self.registry.add(self.getName(), alg, GPFUtils.beamKey())
         
     def getSupportedOutputRasterLayerExtensions(self):
         return ["tif", "dim"]
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+***************************************************************************
+    BEAMBandLister.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import subprocess
+import threading
+from processing.core.ProcessingLog import ProcessingLog
+from processing_gpf.GPFOutputReader import GPFOutputReader
+
+# Client of listBeamBands running in server mode (see processing_beam_java).
+# The Java helper is started once and then lists the bands of products sent to
+# it through its stdin, so that a JVM doesn't have to be started for every
+# product. If the helper dies it is restarted with the next request.
+#
+# The protocol is line oriented:
+#  - helper prints READY once it is able to accept requests,
+#  - client sends "filename<tab>appendProductName",
+#  - helper prints the band names prefixed with BAND_DELIM followed by DONE,
+#  - client sends "QUIT" to stop the helper.
+class BEAMBandLister:
+
+    READY = "__bands_ready"
+    DONE = "__bands_done"
+    BAND_DELIM = "__band:"
+
+    def __init__(self, command, classFile = None):
+        self.command = command
+        self.proc = None
+        self.reader = None
+        # Set when the helper can't be started in server mode (e.g. class file
+        # compiled from an older version), in which case callers have to fall back
+        # to starting it for every product
+        self.unsupported = classFile is not None and not BEAMBandLister.supportsServerMode(classFile)
+        self.lock = threading.Lock()
+
+    # Whether the compiled helper implements server mode. Class files compiled 
+    # from older versions of listBeamBands.java would take -server for a product
+    # name, so this is checked without starting a JVM: the protocol markers are
+    # string constants in the class file.
+    @staticmethod
+    def supportsServerMode(classFile):
+        try:
+            with open(classFile, "rb") as compiled:
+                return BEAMBandLister.READY in compiled.read()
+        except (IOError, OSError):
+            return False
+
+    def isRunning(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    # Start the helper unless it's running. Returns False if it can't be started.
+    def start(self):
+        if self.isRunning():
+            return True
+        if self.unsupported:
+            return False
+        try:
+            self.proc = subprocess.Popen(self.command, stdout=subprocess.PIPE, stdin=subprocess.PIPE,
+                                         stderr=subprocess.STDOUT, universal_newlines=True)
+        except OSError, e:
+            self.proc = None
+            self.unsupported = True
+            ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Could not start BEAM band listing helper: " + str(e))
+            return False
+        self.reader = GPFOutputReader(self.proc.stdout)
+        startupLines = []
+        for line in iter(self.reader.readLine, None):
+            if line.startswith(BEAMBandLister.READY):
+                return True
+            startupLines.append(line)
+        self.proc = None
+        self.unsupported = True
+        ProcessingLog.addToLog(ProcessingLog.LOG_WARNING, "BEAM band listing helper could not be started in server mode:\n" + "".join(startupLines))
+        return False
+
+    def stop(self):
+        with self.lock:
+            if self.isRunning():
+                try:
+                    self.proc.stdin.write("QUIT\n")
+                    self.proc.stdin.flush()
+                    self.proc.wait()
+                except (IOError, OSError):
+                    self.proc.kill()
+            self.proc = None
+
+    # List the band names of the product. Returns None if the helper is not
+    # available, in which case the caller should list the bands in another way.
+    def listBands(self, filename, appendProductName = False):
+        with self.lock:
+            # Second attempt if the helper died since the previous request
+            for attempt in range(2):
+                if not self.start():
+                    return None
+                if isinstance(filename, unicode):
+                    filename = filename.encode("utf-8")
+                try:
+                    self.proc.stdin.write(filename + "\t" + str(appendProductName) + "\n")
+                    self.proc.stdin.flush()
+                except (IOError, OSError):
+                    self.proc = None
+                    continue
+                bands = []
+                for line in iter(self.reader.readLine, None):
+                    if line.startswith(BEAMBandLister.DONE):
+                        return bands
+                    if line.startswith(BEAMBandLister.BAND_DELIM):
+                        bands.append(line[len(BEAMBandLister.BAND_DELIM):].strip())
+                self.proc = None
+            return None
@@ -27,6 +27,7 @@ class DeleteGpfModelAction(ContextAction):
             QMessageBox.No)
         if reply == QMessageBox.Yes:
             os.remove(self.alg.descriptionFile)  
+            self.alg.provider.modelChangedByPlugin(self.alg.descriptionFile)
             try:
                 # QGIS 2.16 (and up?) Processing implementation
                 from processing.core.alglist import algList
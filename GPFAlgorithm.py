@@ -28,6 +28,9 @@
 
 import os
 import re
+import copy
+import shutil
+import tempfile
 import GPFRasterOutput
 try:
     import xml.etree.cElementTree as ET
@@ -44,6 +47,11 @@ from processing.core.outputs import getOutputFromString
 from processing.core.ProcessingLog import ProcessingLog
 from processing.core.GeoAlgorithmExecutionException import GeoAlgorithmExecutionException
 from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFGraph import GPFGraph, GPFGraphNode
+from processing_gpf.GPFGraphOptimizer import GPFGraphOptimizer
+from processing_gpf.GPFTiling import GPFTiling
+from processing_gpf.GPFRunReport import GPFRunReport
+from processing_gpf.GPFDescriptionIndex import GPFDescriptionIndex
 from processing_gpf.GPFParametersDialog import GPFParametersDialog
 from processing_gpf import GPFParameters
 
@@ -61,7 +69,11 @@ class GPFAlgorithm(GeoAlgorithm):
         GeoAlgorithm.__init__(self)
         self.multipleRasterInput = False
         self.descriptionFile = descriptionfile
-        self.defineCharacteristicsFromFile()
+        self.defineHeaderFromFile()
+        # Parameters and outputs are created only when the algorithm is opened,
+        # executed or added to a model (see __getattr__)
+        del self.parameters
+        del self.outputs
         self.nodeID = ""+self.operator+"_"+str(GPFAlgorithm.nodeIDNum)
         GPFAlgorithm.nodeIDNum +=1
         self.previousAlgInGraph = None
@@ -78,18 +90,55 @@ class GPFAlgorithm(GeoAlgorithm):
     def getCustomParametersDialog(self):
         return GPFParametersDialog(self)
 
+    # Copy of the algorithm made from this one (the prototype held by the provider)
+    # instead of from the description file. The copy gets its own node ID, is not
+    # linked to the algorithms of the prototype's graph and has its own copies of
+    # the parameters, outputs and of every list, dict or set attribute of them, 
+    # so that changing the copy never changes the prototype.
+    def getCopy(self):
+        newone = GPFAlgorithm.copyContainers(copy.copy(self))
+        newone.parameters = [GPFAlgorithm.copyContainers(copy.copy(param)) for param in self.parameters]
+        newone.outputs = [GPFAlgorithm.copyContainers(copy.copy(output)) for output in self.outputs]
+        newone.nodeID = ""+self.operator+"_"+str(GPFAlgorithm.nodeIDNum)
+        GPFAlgorithm.nodeIDNum +=1
+        newone.previousAlgInGraph = None
+        return newone
+
+    # Replace the list, dict and set attributes of a shallow copy with copies
+    @staticmethod
+    def copyContainers(obj):
+        for name, value in obj.__dict__.items():
+            if isinstance(value, (list, dict, set)):
+                obj.__dict__[name] = copy.copy(value)
+        return obj
+
+    # Called only for attributes which are not set, i.e. parameters and outputs
+    # of an algorithm which has not been fully defined yet
+    def __getattr__(self, name):
+        if name in ("parameters", "outputs") and "descriptionFile" in self.__dict__:
+            self.parameters = []
+            self.outputs = []
+            self.defineCharacteristicsFromFile()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    # Operator, description, name and group which is all that is needed 
+    # to show the algorithm in the toolbox
+    def defineHeaderFromFile(self):
+        lines = GPFDescriptionIndex.lines(self.descriptionFile) + ["", "", "", ""]
+        self.operator, self.description, self.name, self.group = lines[:4]
+
+    # Description file lines come from GPFDescriptionIndex so that the file
+    # doesn't have to be read again every time the algorithm is created
     def defineCharacteristicsFromFile(self):
-        lines = open(self.descriptionFile)
-        line = lines.readline().strip("\n").strip()
-        self.operator = line
-        line = lines.readline().strip("\n").strip()
-        self.description = line
-        line = lines.readline().strip("\n").strip()
-        self.name = line
-        line = lines.readline().strip("\n").strip()
-        self.group = line
-        line = lines.readline().strip("\n").strip()
-        while line != "":
+        lines = GPFDescriptionIndex.lines(self.descriptionFile) + ["", "", "", ""]
+        self.operator = lines[0]
+        self.description = lines[1]
+        self.name = lines[2]
+        self.group = lines[3]
+        for line in lines[4:]:
+            if line == "":
+                break
             try:
                 if line.startswith("Parameter"):
                     try:
@@ -110,26 +159,19 @@ class GPFAlgorithm(GeoAlgorithm):
                     self.addOutput(GPFRasterOutput.getOutputFromString(line))
                 else:
                     self.addOutput(getOutputFromString(line))
-                line = lines.readline().strip("\n").strip()
             except Exception,e:
                 ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Could not open GPF algorithm: " + self.descriptionFile + "\n" + line)
                 raise e
-        lines.close()
 
     def addGPFNode(self, graph):
         # if there are previous nodes that should be added to the graph, recursively go backwards and add them
         if self.previousAlgInGraph != None:
             self.previousAlgInGraph.addGPFNode(graph)
 
-        # now create and add the current node
-        node = ET.Element("node", {"id":self.nodeID})
-        operator = ET.SubElement(node, "operator")
-        operator.text = self.operator
-
-        # sources are added in the parameters loop below
-        sources = ET.SubElement(node, "sources")
-
-        parametersNode = ET.SubElement(node, "parameters")
+        # now create the current node, it's added to the graph after its sources
+        # (which are added in the parameters loop below)
+        node = GPFGraphNode(self.nodeID, self.operator)
+        parametersNode = node.parameters
 
         for param in self.parameters:
 
@@ -149,19 +191,18 @@ class GPFAlgorithm(GeoAlgorithm):
                             sourceNodeId = self.addProductSetReaderNode(graph, param.value)
                         else:
                             paramName = param.name
-                            if operator.text == "Read":
+                            if self.operator == "Read":
                                 sourceNodeId = self.addReadNode(graph, param.value, dataFormat, self.nodeID)
                                 return graph
                             else:
                                 sourceNodeId = self.addReadNode(graph, param.value, dataFormat)
-                        if sources.find(paramName) == None:
-                            source = ET.SubElement(sources, paramName)
-                            source.set("refid", sourceNodeId)
+                        if paramName not in node.sources:
+                            node.sources[paramName] = sourceNodeId
                     # else assume its a reference to a previous node and add a "source" element
                     elif param.value:
-                        source = ET.SubElement(sources, param.name, {"refid":param.value})
+                        node.sources[param.name] = param.value
                 # This is to allow GPF graphs to save custom names of input rasters
-                elif operator.text == "Read":
+                elif self.operator == "Read":
                     dataFormat = 'GeoTIFF'
                     param.value = ""
                     sourceNodeId = self.addReadNode(graph, param.value, dataFormat, self.nodeID)
@@ -211,12 +252,7 @@ class GPFAlgorithm(GeoAlgorithm):
                 elif isinstance(param, ParameterExtent):
                     values = param.value.split(",")
                     if len(values) == 4:
-                        parameter.text = "POLYGON(("
-                        parameter.text += values[0] + ' ' + values[2] +", "
-                        parameter.text += values[0] + ' ' + values[3] +", "
-                        parameter.text += values[1] + ' ' + values[3] +", "
-                        parameter.text += values[1] + ' ' + values[2] +", "
-                        parameter.text += values[0] + ' ' + values[2] +"))"
+                        parameter.text = GPFUtils.extentToPolygon(values)
                 elif isinstance(param, ParameterFile):
                     if param.value is None or param.value == "None":
                         parameter.text = ""
@@ -227,30 +263,22 @@ class GPFAlgorithm(GeoAlgorithm):
 
         # For "Write" operator also save the output raster as a parameter
         if self.operator == "Write":
-            fileParameter = ET.SubElement(parametersNode, "file")
-            fileParameter.text = str((self.outputs[0]).value)
+            node.setParameter("file", str((self.outputs[0]).value))
 
-
-        graph.append(node)
+        graph.addNode(node)
         return graph
 
     def addProductSetReaderNode(self, graph, filename):
         nodeID = self.nodeID+"_ProductSet-Reader"
-        node = graph.find(".//*[@id='"+nodeID+"']")
+        node = graph.node(nodeID)
 
-        # add ProductSet-Reader node if it doesn't exist yet
+        # add ProductSet-Reader node with the file list if it doesn't exist yet
         if node == None:
-            node = ET.SubElement(graph, "node", {"id":nodeID})
-            ET.SubElement(node, "sources")
-            operator = ET.SubElement(node, "operator")
-            operator.text = "ProductSet-Reader"
-            # add the file list
-            parametersNode = ET.SubElement(node, "parameters")
-            parameter = ET.SubElement(parametersNode, "fileList")
-            parameter.text=filename
+            node = graph.addNode(GPFGraphNode(nodeID, "ProductSet-Reader"))
+            node.setParameter("fileList", filename)
         # otherwise append filename to the node's fileList
         else:
-            parameter = node.find(".//fileList")
+            parameter = node.parameter("fileList")
             parameter.text +=","+filename
         return nodeID
 
@@ -259,20 +287,12 @@ class GPFAlgorithm(GeoAlgorithm):
         if not nodeID:
             nodeID = self.nodeID+"_read_"+str(GPFAlgorithm.nodeIDNum)
         GPFAlgorithm.nodeIDNum +=1
-        node = ET.SubElement(graph, "node", {"id":nodeID})
-        operator = ET.SubElement(node, "operator")
-        operator.text = "Read"
-
-        # Add empty source
-        ET.SubElement(node, "sources")
+        node = graph.addNode(GPFGraphNode(nodeID, "Read"))
 
         # Add file parameter with input file path
-        parametersNode = ET.SubElement(node, "parameters")
-        fileParameter = ET.SubElement(parametersNode, "file")
-        fileParameter.text = filename
+        node.setParameter("file", filename)
         if dataFormat:
-            dataFormatParameter = ET.SubElement(parametersNode, "formatName")
-            dataFormatParameter.text = dataFormat
+            node.setParameter("formatName", dataFormat)
         
         return nodeID
 
@@ -281,35 +301,27 @@ class GPFAlgorithm(GeoAlgorithm):
         # add write node
         nodeID = self.nodeID+"_write_"+str(GPFAlgorithm.nodeIDNum)
         GPFAlgorithm.nodeIDNum +=1
-        node = ET.SubElement(graph, "node", {"id":nodeID})
-        operator = ET.SubElement(node, "operator")
-        operator.text = "Write"
+        node = graph.addNode(GPFGraphNode(nodeID, "Write"))
 
         # add source
-        sources = ET.SubElement(node, "sources")
-        ET.SubElement(sources, "sourceProduct", {"refid":self.nodeID})
+        node.sources["sourceProduct"] = self.nodeID
 
         # add some options
-        parametersNode = ET.SubElement(node, "parameters")
-        parameter = ET.SubElement(parametersNode, "file")
-        parameter.text = str(output.value)
-        parameter = ET.SubElement(parametersNode, "formatName")
+        node.setParameter("file", str(output.value))
         if output.value.lower().endswith(".dim"):
-            parameter.text = "BEAM-DIMAP"
+            node.setParameter("formatName", "BEAM-DIMAP")
         elif output.value.lower().endswith(".hdr"):
-            parameter.text = "ENVI"
+            node.setParameter("formatName", "ENVI")
         else:
             if key == GPFUtils.beamKey():
-                parameter.text = "GeoTIFF"
+                node.setParameter("formatName", "GeoTIFF")
             else:
-                parameter.text = "GeoTIFF-BigTIFF"
+                node.setParameter("formatName", "GeoTIFF-BigTIFF")
         return graph
 
-    def processAlgorithm(self, key, progress):
+    def buildGraph(self, key):
         # Create a GFP for execution with SNAP's GPT
-        graph = ET.Element("graph", {'id':self.operator+'_gpf'})
-        version = ET.SubElement(graph, "version")
-        version.text = "1.0"
+        graph = GPFGraph(self.operator+'_gpf')
 
         # Add node with this algorithm's operator
         graph = self.addGPFNode(graph)
@@ -319,16 +331,133 @@ class GPFAlgorithm(GeoAlgorithm):
             for output in self.outputs:
                 graph = self.addWriteNode(graph, output, key)
 
+        if GPFGraphOptimizer.isActivated():
+            GPFGraphOptimizer.optimize(graph)
+        return graph
+
+    def processAlgorithm(self, key, progress):
+        # Large extents can be split into tiles processed in parallel
+        if GPFTiling.tileSize() > 0 and GPFTiling.canTile(key, self.operator):
+            extent = self.tilingExtent()
+            if extent is not None:
+                if self.processTiled(key, progress, extent):
+                    return
+
+        report = GPFRunReport(self.name)
+        report.begin("graph build")
+        graph = self.buildGraph(key)
+        report.end("graph build")
+
         # Log the GPF
         loglines = []
         loglines.append("GPF Graph")
-        GPFUtils.indentXML(graph)
-        for line in ET.tostring(graph).splitlines():
+        for line in graph.toXml().splitlines():
             loglines.append(line)
         ProcessingLog.addToLog(ProcessingLog.LOG_INFO, loglines)
 
         # Execute the GPF
-        GPFUtils.executeGpf(key, ET.tostring(graph), progress)
+        GPFUtils.executeGpf(key, graph, progress, report = report)
+
+    # Geographic extent to be split into tiles: the value of the extent parameter
+    # (clipped to the input raster) or the extent of the input raster. None if 
+    # the input raster is not map projected and the algorithm keeps its geocoding.
+    def tilingExtent(self):
+        extent = None
+        rasterExtent = None
+        for param in self.parameters:
+            if isinstance(param, ParameterExtent) and param.value:
+                values = param.value.split(",")
+                if len(values) == 4:
+                    extent = tuple([float(value) for value in values])
+            elif isinstance(param, ParameterRaster) and param.value and rasterExtent is None:
+                rasterExtent = GPFUtils.rasterGeoExtent(param.value)
+        if rasterExtent is None and self.operator not in GPFTiling.PROJECTING_OPERATORS:
+            return None
+        if extent is None:
+            return rasterExtent
+        return GPFTiling.intersectExtents(extent, rasterExtent)
+
+    # Split the extent into overlapping tiles, execute the graph of each tile (with
+    # a Subset of the tile injected after the Read nodes) in parallel and assemble
+    # the tile outputs. Only GeoTIFF and VRT outputs of the operators in 
+    # GPFTiling.TILED_OPERATORS can be assembled, returns False if the algorithm
+    # can't be executed in tiles.
+    def processTiled(self, key, progress, extent, tileSize = None, overlap = None):
+        tileSize = tileSize or GPFTiling.tileSize()
+        overlap = overlap if overlap is not None else GPFTiling.tileOverlap()
+        if not GPFTiling.canTile(key, self.operator) or len(self.outputs) == 0:
+            return False
+        for output in self.outputs:
+            if not (output.value and os.path.splitext(output.value)[1].lower() in (".tif", ".tiff", ".vrt")):
+                ProcessingLog.addToLog(ProcessingLog.LOG_INFO, "Tiled processing requires GeoTIFF or VRT output, executing "+self.name+" without tiling")
+                return False
+        tiles = GPFTiling.tileExtents(extent, tileSize, overlap)
+        if len(tiles) < 2:
+            return False
+
+        outputPaths = [output.value for output in self.outputs]
+        workDirs = []
+        for outputPath in outputPaths:
+            # Tiles of VRT outputs have to be kept next to the VRT
+            if outputPath.lower().endswith(".vrt"):
+                workDir = os.path.splitext(outputPath)[0] + "_tiles"
+                if not os.path.exists(workDir):
+                    os.makedirs(workDir)
+            else:
+                workDir = tempfile.mkdtemp(prefix="gpf_tiles_")
+            workDirs.append(workDir)
+
+        try:
+            graphs = []
+            try:
+                for i, (core, tileExtent) in enumerate(tiles):
+                    for output, workDir in zip(self.outputs, workDirs):
+                        output.value = os.path.join(workDir, "tile_%d.tif" % i)
+                    graph = GPFTiling.addTileSubset(self.buildGraph(key), tileExtent)
+                    graphs.append(("tile %d of %d" % (i + 1, len(tiles)), graph))
+            finally:
+                for output, outputPath in zip(self.outputs, outputPaths):
+                    output.value = outputPath
+
+            ProcessingLog.addToLog(ProcessingLog.LOG_INFO, "Executing "+self.name+" in %d tiles of %s degrees with %s degrees overlap" % (len(tiles), tileSize, overlap))
+            GPFUtils.executeGpfBatch(key, graphs, progress)
+
+            progress.setInfo("Assembling tiles")
+            for outputPath, workDir in zip(outputPaths, workDirs):
+                tileFiles = [(core, os.path.join(workDir, "tile_%d.tif" % i)) for i, (core, _) in enumerate(tiles)]
+                GPFTiling.mosaic(tileFiles, outputPath, workDir)
+        finally:
+            for outputPath, workDir in zip(outputPaths, workDirs):
+                if not outputPath.lower().endswith(".vrt"):
+                    shutil.rmtree(workDir, ignore_errors = True)
+        return True
+
+    # Run this algorithm over many input products. inputs is a list of paths or glob
+    # patterns which are used, one at a time, as value of the first raster parameter.
+    # The outputs are named according to outputPattern (see GPFUtils.batchOutputPath)
+    # and other parameters keep their current values. Up to parallelJobs graphs are
+    # executed at the same time and memory can override their JVM memory options
+    # (see GPFUtils.jvmMemory).
+    def processBatch(self, key, inputs, outputPattern, progress, parallelJobs = None, memory = None):
+        inputParam = None
+        for param in self.parameters:
+            if isinstance(param, ParameterRaster):
+                inputParam = param
+                break
+        if inputParam is None:
+            raise GeoAlgorithmExecutionException("Algorithm "+self.name+" has no raster input")
+
+        # Each graph is built from a copy of the algorithm so that the batch
+        # values don't stay in this algorithm (and in later copies of it)
+        graphs = []
+        for index, inputPath in enumerate(GPFUtils.expandBatchInputs(inputs)):
+            alg = self.getCopy()
+            alg.getParameterFromName(inputParam.name).value = inputPath
+            for output in alg.outputs:
+                output.value = GPFUtils.batchOutputPath(outputPattern, inputPath, index, output.name)
+            graphs.append((inputPath, alg.buildGraph(key)))
+
+        GPFUtils.executeGpfBatch(key, graphs, progress, parallelJobs, memory)
 
     def commandLineName(self):
         return self.provider.getName().lower().replace(" ", "") + ":" + self.operator.lower().replace("-","")
@@ -0,0 +1,130 @@
+"""
+***************************************************************************
+    GPFAlgorithmRegistry.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+from processing.core.ProcessingConfig import ProcessingConfig
+from processing_gpf.GPFUtils import GPFUtils
+
+# Algorithms of the GPF providers indexed by operator, command line name and
+# group. One registry is shared by the SNAP and BEAM providers (see instance)
+# but operators are resolved only among the algorithms of the asking provider,
+# since its graphs are executed with its own gpt (a SNAP model can't use a BEAM
+# algorithm). Some operators are available in several toolboxes of the SNAP
+# provider (e.g. Subset in the SNAP generic algorithms and in S1 Toolbox), in
+# which case the algorithm of the toolbox earlier in PRECEDENCE is used for
+# the operator, independently of the order in which the toolboxes are loaded. The algorithms of a provider are no longer valid when
+# the Sentinel toolboxes are activated or deactivated since then the provider's
+# algorithms change.
+class GPFAlgorithmRegistry:
+
+    PRECEDENCE = [GPFUtils.s1tbxKey(), GPFUtils.s2tbxKey(), GPFUtils.s3tbxKey(), GPFUtils.snapKey()]
+
+    _instance = None
+
+    # The registry shared by all providers
+    @staticmethod
+    def instance():
+        if GPFAlgorithmRegistry._instance is None:
+            GPFAlgorithmRegistry._instance = GPFAlgorithmRegistry()
+        return GPFAlgorithmRegistry._instance
+
+    def __init__(self):
+        # (algorithm, toolbox key) by provider name
+        self.entries = {}
+        # activated toolboxes by provider name when its algorithms were loaded
+        self.toolboxes = {}
+        self.index()
+
+    # Activation of the Sentinel toolboxes
+    @staticmethod
+    def activatedToolboxes():
+        return tuple([ProcessingConfig.getSetting(setting) == True for setting in 
+                      [GPFUtils.S1TBX_ACTIVATE, GPFUtils.S2TBX_ACTIVATE, GPFUtils.S3TBX_ACTIVATE]])
+
+    # Remove the algorithms of the given provider before they are loaded again
+    def clear(self, providerName):
+        self.entries[providerName] = []
+        self.toolboxes[providerName] = GPFAlgorithmRegistry.activatedToolboxes()
+        self.index()
+
+    def isValid(self, providerName):
+        return self.toolboxes.get(providerName) == GPFAlgorithmRegistry.activatedToolboxes()
+
+    # Add the algorithm of the given provider and toolbox. Models and other 
+    # algorithms without a toolbox are not indexed by operator.
+    def add(self, providerName, alg, toolboxKey = None):
+        self.entries.setdefault(providerName, []).append((alg, toolboxKey))
+        self.indexAlgorithm(providerName, alg, toolboxKey)
+
+    def remove(self, providerName, alg):
+        self.entries[providerName] = [entry for entry in self.entries.get(providerName, []) if entry[0] is not alg]
+        self.index()
+
+    def index(self):
+        self.byOperator = {}
+        self.byCommandLineName = {}
+        self.byGroup = {}
+        for providerName, entries in self.entries.iteritems():
+            for alg, toolboxKey in entries:
+                self.indexAlgorithm(providerName, alg, toolboxKey)
+
+    def indexAlgorithm(self, providerName, alg, toolboxKey):
+        self.byCommandLineName[alg.commandLineName()] = alg
+        self.byGroup.setdefault((providerName, alg.group), []).append(alg)
+        operator = getattr(alg, "operator", None)
+        if operator and toolboxKey is not None:
+            if toolboxKey in GPFAlgorithmRegistry.PRECEDENCE:
+                rank = GPFAlgorithmRegistry.PRECEDENCE.index(toolboxKey)
+            else:
+                rank = len(GPFAlgorithmRegistry.PRECEDENCE)
+            current = self.byOperator.get((providerName, operator))
+            if current is None or rank < current[0]:
+                self.byOperator[(providerName, operator)] = (rank, alg)
+
+    # Algorithm of the given provider for the operator or None if the provider
+    # doesn't have it
+    def algorithmFromOperator(self, providerName, operator):
+        entry = self.byOperator.get((providerName, operator))
+        if entry is None:
+            return None
+        return entry[1]
+
+    def algorithmFromCommandLineName(self, name):
+        return self.byCommandLineName.get(name)
+
+    # Algorithms of the given provider by group, optionally only those whose 
+    # name contains text
+    def groups(self, providerName, text = ""):
+        text = text.lower()
+        groups = {}
+        for (provider, group), algs in self.byGroup.iteritems():
+            if provider != providerName:
+                continue
+            algs = [alg for alg in algs if text in alg.name.lower()]
+            if algs:
+                groups[group] = algs
+        return groups
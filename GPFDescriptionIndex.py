@@ -0,0 +1,180 @@
+"""
+***************************************************************************
+    GPFDescriptionIndex.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import marshal
+import threading
+from processing.tools.system import userFolder
+from processing.core.ProcessingLog import ProcessingLog
+
+# Index of the algorithm description files (*_description/*.txt). It holds the
+# lines of every description file, so that providers load all descriptions
+# of a toolbox with one read of the index instead of opening every file. The
+# folders are checked once per session: the size and modification time of
+# every indexed file is compared with the index, so that files edited in place
+# are read again, and when the modification time of the folder changed
+# (description files added, removed or replaced, e.g. by a plugin update) the
+# folder is listed again. A warm load costs one stat per file and only the
+# files which changed are read. The index is saved with marshal in the user
+# folder, which loads about twice as fast as JSON.
+class GPFDescriptionIndex:
+
+    VERSION = 2
+
+    _index = None
+    # Folders checked in this session and lines of their files by path
+    _checked = set()
+    _byPath = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def indexPath():
+        return os.path.join(userFolder(), "gpf_description_index.dat")
+
+    # Index loaded from the user folder: {folder: {"mtime": folder mtime,
+    # "files": {file name: entry}}}
+    @staticmethod
+    def index():
+        if GPFDescriptionIndex._index is None:
+            index = {}
+            try:
+                with open(GPFDescriptionIndex.indexPath(), "rb") as indexFile:
+                    data = marshal.load(indexFile)
+                if data.get("version") == GPFDescriptionIndex.VERSION:
+                    index = data["folders"]
+            except (IOError, EOFError, ValueError, TypeError, KeyError, AttributeError):
+                # Missing or corrupt index is rebuilt
+                pass
+            GPFDescriptionIndex._index = index
+        return GPFDescriptionIndex._index
+
+    @staticmethod
+    def save():
+        try:
+            tempPath = GPFDescriptionIndex.indexPath() + ".tmp"
+            with open(tempPath, "wb") as indexFile:
+                marshal.dump({"version": GPFDescriptionIndex.VERSION, "folders": GPFDescriptionIndex.index()}, indexFile)
+            if os.path.exists(GPFDescriptionIndex.indexPath()):
+                os.remove(GPFDescriptionIndex.indexPath())
+            os.rename(tempPath, GPFDescriptionIndex.indexPath())
+        except (IOError, OSError), e:
+            ProcessingLog.addToLog(ProcessingLog.LOG_WARNING, "Could not save GPF description index: " + str(e))
+
+    # Lines of a description file, as used by GPFAlgorithm: operator, description,
+    # name, group and then parameters and outputs until the first empty line
+    @staticmethod
+    def readLines(descriptionFile):
+        lines = []
+        with open(descriptionFile) as descriptionLines:
+            for line in descriptionLines:
+                line = line.strip("\n").strip()
+                if line == "" and len(lines) >= 4:
+                    break
+                lines.append(line)
+        return lines
+
+    # Entry of the description file, read again if the file has changed.
+    # Returns the entry and whether the index was updated.
+    @staticmethod
+    def entry(files, folder, fileName):
+        stat = os.stat(os.path.join(folder, fileName))
+        entry = files.get(fileName)
+        if entry is not None and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            return entry, False
+        entry = {"mtime": stat.st_mtime, "size": stat.st_size,
+                 "lines": GPFDescriptionIndex.readLines(os.path.join(folder, fileName))}
+        files[fileName] = entry
+        return entry, True
+
+    # Index of the folder, updated if the folder changed since the index was
+    # saved. Must be called with the lock held.
+    @staticmethod
+    def folderIndex(folder):
+        index = GPFDescriptionIndex.index()
+        if folder in GPFDescriptionIndex._checked and folder in index:
+            return index[folder]
+        mtime = os.stat(folder).st_mtime
+        folderIndex = index.get(folder)
+        files = folderIndex["files"] if folderIndex is not None else {}
+        if folderIndex is None or folderIndex["mtime"] != mtime:
+            fileNames = [fileName for fileName in os.listdir(folder) if fileName.endswith("txt")]
+        else:
+            # Same files as when indexed, but they may have been edited in place
+            fileNames = files.keys()
+        updated = folderIndex is None or folderIndex["mtime"] != mtime
+        for fileName in fileNames:
+            try:
+                updated = GPFDescriptionIndex.entry(files, folder, fileName)[1] or updated
+            except (IOError, OSError), e:
+                ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Could not read GPF algorithm description: " + fileName + "\n" + str(e))
+                files.pop(fileName, None)
+                updated = True
+        # Forget deleted description files
+        for fileName in set(files.keys()) - set(fileNames):
+            del files[fileName]
+        if updated:
+            folderIndex = {"mtime": mtime, "files": files}
+            index[folder] = folderIndex
+            GPFDescriptionIndex.save()
+        GPFDescriptionIndex._checked.add(folder)
+        return folderIndex
+
+    # Paths and lines of all description files in the folder
+    @staticmethod
+    def descriptions(folder):
+        folder = os.path.abspath(folder)
+        with GPFDescriptionIndex._lock:
+            files = GPFDescriptionIndex.folderIndex(folder)["files"]
+            descriptions = [(os.path.join(folder, fileName), files[fileName]["lines"]) for fileName in sorted(files.keys())]
+            GPFDescriptionIndex._byPath.update(descriptions)
+            return descriptions
+
+    # Lines of one description file
+    @staticmethod
+    def lines(descriptionFile):
+        lines = GPFDescriptionIndex._byPath.get(descriptionFile)
+        if lines is not None:
+            return lines
+        folder, fileName = os.path.split(os.path.abspath(descriptionFile))
+        with GPFDescriptionIndex._lock:
+            files = GPFDescriptionIndex.folderIndex(folder)["files"]
+            entry = files.get(fileName)
+            if entry is None:
+                # Not a description file of the folder (e.g. other extension)
+                entry, _ = GPFDescriptionIndex.entry(files, folder, fileName)
+                GPFDescriptionIndex.save()
+        return entry["lines"]
+
+    @staticmethod
+    def clear():
+        with GPFDescriptionIndex._lock:
+            GPFDescriptionIndex._index = {}
+            GPFDescriptionIndex._checked = set()
+            GPFDescriptionIndex._byPath = {}
+            if os.path.exists(GPFDescriptionIndex.indexPath()):
+                os.remove(GPFDescriptionIndex.indexPath())
@@ -0,0 +1,128 @@
+"""
+***************************************************************************
+    GPFGraph.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+from collections import OrderedDict
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from processing_gpf.GPFUtils import GPFUtils
+
+# Node of a GPF graph: its operator, source products (source name -> ID of the
+# node producing it) and parameters. Parameters can be nested (e.g. band 
+# descriptors of BandMaths) so they are kept as an XML element.
+class GPFGraphNode:
+
+    def __init__(self, nodeID, operator):
+        self.nodeID = nodeID
+        self.operator = operator
+        self.sources = OrderedDict()
+        self.parameters = ET.Element("parameters")
+
+    # Element of the parameter at the given path (e.g. "targetBand/name") or None
+    def parameter(self, path):
+        return self.parameters.find(path)
+
+    def setParameter(self, name, value):
+        parameter = ET.SubElement(self.parameters, name)
+        parameter.text = value
+        return parameter
+
+    def toElement(self):
+        node = ET.Element("node", {"id":self.nodeID})
+        operator = ET.SubElement(node, "operator")
+        operator.text = self.operator
+        sources = ET.SubElement(node, "sources")
+        for name, refid in self.sources.iteritems():
+            ET.SubElement(sources, name, {"refid":refid})
+        node.append(self.parameters)
+        return node
+
+# GPF graph built by the GPF algorithms and models. Nodes are kept in the order
+# in which they are added and are indexed by their ID, so that the algorithms
+# can look up the nodes they refer to while the graph is being built without
+# searching through the whole graph. The graph is serialized to GPF XML for GPT
+# or for saving a model only once it is complete.
+class GPFGraph:
+
+    def __init__(self, graphID):
+        self.graphID = graphID
+        self.nodeList = []
+        self.nodesById = {}
+        self.applicationData = []
+
+    def __len__(self):
+        return len(self.nodeList)
+
+    def nodes(self):
+        return list(self.nodeList)
+
+    # Node with the given ID or None if the graph doesn't contain it
+    def node(self, nodeID):
+        return self.nodesById.get(nodeID)
+
+    def addNode(self, node):
+        if node.nodeID in self.nodesById:
+            raise ValueError("GPF graph already contains node " + node.nodeID)
+        self.nodeList.append(node)
+        self.nodesById[node.nodeID] = node
+        return node
+
+    def removeNode(self, nodeID):
+        node = self.nodesById.pop(nodeID)
+        self.nodeList.remove(node)
+        return node
+
+    # Make all the nodes reading from one node read from another one instead
+    def replaceSource(self, refid, newRefid):
+        for node in self.nodeList:
+            for name, sourceRefid in node.sources.iteritems():
+                if sourceRefid == refid:
+                    node.sources[name] = newRefid
+
+    # Application specific data (e.g. node positions in the graph builder), 
+    # saved after the nodes
+    def addApplicationData(self, attrib):
+        element = ET.Element("applicationData", attrib)
+        self.applicationData.append(element)
+        return element
+
+    def toElement(self):
+        graph = ET.Element("graph", {"id":self.graphID})
+        version = ET.SubElement(graph, "version")
+        version.text = "1.0"
+        for node in self.nodeList:
+            graph.append(node.toElement())
+        for element in self.applicationData:
+            graph.append(element)
+        GPFUtils.indentXML(graph)
+        return graph
+
+    def toXml(self):
+        return ET.tostring(self.toElement())
@@ -0,0 +1,267 @@
+"""
+***************************************************************************
+    GPFGraphOptimizer.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+import re
+from processing.core.ProcessingConfig import ProcessingConfig
+from processing.core.ProcessingLog import ProcessingLog
+from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFGraph import GPFGraphNode
+
+# Rewrites a GPF graph before it is executed so that GPT does less work:
+#  - no-op operators (e.g. a Subset without region, band selection or 
+#    sub-sampling) are removed and their consumers read from their source,
+#  - geographic Subsets are also applied, with a safety margin, upstream of
+#    the pixel-local operators before them so that those don't process the
+#    whole scene,
+#  - Read nodes with identical parameters (file, format, ...) are merged so 
+#    that each product is opened and decoded only once,
+#  - Read, Subset and pixel-local nodes whose products aren't used by any 
+#    Write node or other operator are removed. Other operators might write
+#    files themselves (e.g. StatisticsOp with outputAsciiFile, PixEx) and are
+#    never removed.
+# Nodes in keep (e.g. model intermediates) are left untouched. Graphs without
+# any Write node are not pruned since then the operators must write their
+# products themselves.
+class GPFGraphOptimizer:
+
+    READ_OPERATORS = ["Read", "ProductSet-Reader"]
+    WRITE_OPERATORS = ["Write", "ProductSet-Writer"]
+
+    # Operators whose output pixels depend only on the same input pixels (and 
+    # metadata, which Subset keeps), so they give the same result on a subset
+    PIXEL_LOCAL_OPERATORS = ["BandMaths", "Calibration", "LinearToFromdB", "NdviOp", "BiophysicalOp"]
+
+    # Pixel-local operators which handle the bursts of Sentinel-1 TOPS SLC products
+    # and so can't be given a subset of those products
+    BURST_OPERATORS = ["Calibration"]
+
+    DEFAULT_SUBSET_MARGIN = 0.01
+
+    @staticmethod
+    def isActivated():
+        return ProcessingConfig.getSetting(GPFUtils.GPF_GRAPH_OPTIMIZE) == True
+
+    # Margin in degrees added around Subsets moved upstream
+    @staticmethod
+    def subsetMargin():
+        try:
+            return float(ProcessingConfig.getSetting(GPFUtils.GPF_SUBSET_MARGIN))
+        except:
+            return GPFGraphOptimizer.DEFAULT_SUBSET_MARGIN
+
+    # Optimize the graph in place and log what was rewritten
+    @staticmethod
+    def optimize(graph, keep = ()):
+        nodeCount = len(graph)
+        loglines = []
+        loglines += GPFGraphOptimizer.collapseNoOps(graph, keep)
+        loglines += GPFGraphOptimizer.pushDownSubsets(graph, keep)
+        loglines += GPFGraphOptimizer.mergeReads(graph, keep)
+        loglines += GPFGraphOptimizer.pruneDeadNodes(graph, keep)
+        if loglines:
+            loglines.insert(0, "GPF graph optimization: %d nodes before, %d nodes after" % (nodeCount, len(graph)))
+            ProcessingLog.addToLog(ProcessingLog.LOG_INFO, loglines)
+        return graph
+
+    # Comparable representation of an XML element, ignoring whitespace 
+    # and the attributes which store model inputs' settings
+    @staticmethod
+    def elementKey(element):
+        attributes = tuple(sorted([(name, value) for name, value in element.attrib.items() if not name.startswith("qgisModel")]))
+        children = tuple([GPFGraphOptimizer.elementKey(child) for child in element])
+        return (element.tag, attributes, (element.text or "").strip(), children)
+
+    @staticmethod
+    def isNoOp(node):
+        # Subset of the whole product which keeps all bands and the metadata
+        if node.operator == "Subset":
+            for parameter in node.parameters:
+                value = (parameter.text or "").strip()
+                if parameter.tag in ["subSamplingX", "subSamplingY"]:
+                    if value not in ["", "1"]:
+                        return False
+                elif parameter.tag == "copyMetadata":
+                    if value.lower() != "true":
+                        return False
+                elif value or len(parameter) > 0:
+                    return False
+            return node.parameter("copyMetadata") is not None
+        return False
+
+    @staticmethod
+    def collapseNoOps(graph, keep):
+        loglines = []
+        for node in graph.nodes():
+            if node.nodeID in keep or len(node.sources) != 1 or not GPFGraphOptimizer.isNoOp(node):
+                continue
+            sourceID = node.sources.values()[0]
+            graph.replaceSource(node.nodeID, sourceID)
+            graph.removeNode(node.nodeID)
+            loglines.append("Removed no-op "+node.operator+" node "+node.nodeID)
+        return loglines
+
+    # (xmin, xmax, ymin, ymax) bounding box of a WKT polygon or None
+    @staticmethod
+    def polygonExtent(wkt):
+        if not wkt or not wkt.strip().upper().startswith("POLYGON"):
+            return None
+        values = [float(value) for value in re.findall("[-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?", wkt)]
+        if len(values) < 6 or len(values) % 2 != 0:
+            return None
+        xs = values[0::2]
+        ys = values[1::2]
+        return min(xs), max(xs), min(ys), max(ys)
+
+    # File read by the Read node the node's product comes from, following nodes
+    # with a single source, or None
+    @staticmethod
+    def productFile(graph, node):
+        while node is not None and node.operator not in GPFGraphOptimizer.READ_OPERATORS and len(node.sources) == 1:
+            node = graph.node(node.sources.values()[0])
+        if node is None or node.operator not in GPFGraphOptimizer.READ_OPERATORS:
+            return None
+        fileParameter = node.parameter("file")
+        if fileParameter is None or not (fileParameter.text or "").strip():
+            return None
+        return fileParameter.text.strip()
+
+    # Whether a Subset can be applied before the node, which is pixel-local.
+    # Operators handling TOPS bursts can't be given a subset of SLC products 
+    # (S1?_??_SLC__* naming) or of products whose type is not known.
+    @staticmethod
+    def canSubsetBefore(graph, node):
+        if node.operator not in GPFGraphOptimizer.BURST_OPERATORS:
+            return True
+        productFile = GPFGraphOptimizer.productFile(graph, node)
+        return productFile is not None and "_SLC_" not in productFile.upper()
+
+    # Apply each geographic Subset also before the chain of pixel-local 
+    # operators which leads to it. The chain is only followed through nodes 
+    # which have no other consumers, since those need the whole product. The 
+    # new Subset keeps all bands and the metadata and covers the region of the
+    # original Subset plus a margin, and the original Subset still crops the
+    # product of the chain to the exact region and selects its bands. Subsets
+    # of regions crossing the antimeridian are not moved.
+    @staticmethod
+    def pushDownSubsets(graph, keep):
+        loglines = []
+        margin = GPFGraphOptimizer.subsetMargin()
+        consumers = {}
+        for node in graph.nodes():
+            for sourceID in node.sources.values():
+                consumers.setdefault(sourceID, []).append(node.nodeID)
+        for subset in graph.nodes():
+            if subset.operator != "Subset" or len(subset.sources) != 1:
+                continue
+            region = subset.parameter("region")
+            geoRegion = subset.parameter("geoRegion")
+            if (region is not None and (region.text or "").strip()) or geoRegion is None:
+                continue
+            extent = GPFGraphOptimizer.polygonExtent(geoRegion.text)
+            if extent is None:
+                continue
+            xmin, xmax, ymin, ymax = extent
+            # Longitudes beyond +-180 or spanning more than half of the globe 
+            # mean that the polygon crosses the antimeridian
+            if xmin < -180.0 or xmax > 180.0 or xmax - xmin > 180.0:
+                continue
+
+            chain = []
+            consumerID = subset.nodeID
+            sourceID = subset.sources.values()[0]
+            node = graph.node(sourceID)
+            while (node is not None and node.operator in GPFGraphOptimizer.PIXEL_LOCAL_OPERATORS and 
+                   node.nodeID not in keep and len(node.sources) == 1 and consumers.get(node.nodeID) == [consumerID] and
+                   GPFGraphOptimizer.canSubsetBefore(graph, node)):
+                chain.append(node)
+                consumerID = node.nodeID
+                sourceID = node.sources.values()[0]
+                node = graph.node(sourceID)
+            if not chain or node is None:
+                continue
+
+            extent = (max(xmin - margin, -180.0), min(xmax + margin, 180.0), max(ymin - margin, -90.0), min(ymax + margin, 90.0))
+            pushedSubset = graph.addNode(GPFGraphNode(subset.nodeID+"_pushdown", "Subset"))
+            pushedSubset.sources["sourceProduct"] = sourceID
+            pushedSubset.setParameter("geoRegion", GPFUtils.extentToPolygon(extent))
+            pushedSubset.setParameter("copyMetadata", "True")
+            top = chain[-1]
+            for name, refid in top.sources.items():
+                if refid == sourceID:
+                    top.sources[name] = pushedSubset.nodeID
+            consumers[sourceID] = [nodeID for nodeID in consumers[sourceID] if nodeID != top.nodeID] + [pushedSubset.nodeID]
+            consumers[pushedSubset.nodeID] = [top.nodeID]
+            loglines.append("Applied Subset "+subset.nodeID+" also before "+", ".join([node.nodeID for node in reversed(chain)]))
+        return loglines
+
+    @staticmethod
+    def mergeReads(graph, keep):
+        loglines = []
+        readers = {}
+        for node in graph.nodes():
+            if node.operator not in GPFGraphOptimizer.READ_OPERATORS or node.sources:
+                continue
+            # Readers without file are left for GPT to report
+            if not "".join(node.parameters.itertext()).strip():
+                continue
+            key = (node.operator, GPFGraphOptimizer.elementKey(node.parameters))
+            if key not in readers:
+                readers[key] = node.nodeID
+            elif node.nodeID not in keep:
+                graph.replaceSource(node.nodeID, readers[key])
+                graph.removeNode(node.nodeID)
+                loglines.append("Merged "+node.operator+" node "+node.nodeID+" into "+readers[key])
+        return loglines
+
+    # Operators without side effects which only compute a product
+    @staticmethod
+    def isPrunable(node):
+        return (node.operator in GPFGraphOptimizer.READ_OPERATORS or node.operator == "Subset" or 
+                node.operator in GPFGraphOptimizer.PIXEL_LOCAL_OPERATORS)
+
+    @staticmethod
+    def pruneDeadNodes(graph, keep):
+        loglines = []
+        if not [node for node in graph.nodes() if node.operator in GPFGraphOptimizer.WRITE_OPERATORS]:
+            return loglines
+        toVisit = [node.nodeID for node in graph.nodes() if not GPFGraphOptimizer.isPrunable(node)]
+        toVisit += [nodeID for nodeID in keep if graph.node(nodeID) is not None]
+        needed = set()
+        while toVisit:
+            nodeID = toVisit.pop()
+            node = graph.node(nodeID)
+            if nodeID in needed or node is None:
+                continue
+            needed.add(nodeID)
+            toVisit += node.sources.values()
+        for node in graph.nodes():
+            if node.nodeID not in needed:
+                graph.removeNode(node.nodeID)
+                loglines.append("Removed node "+node.nodeID+" whose product isn't used")
+        return loglines
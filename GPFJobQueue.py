@@ -0,0 +1,158 @@
+"""
+***************************************************************************
+    GPFJobQueue.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import threading
+from processing_gpf.GPFUtils import GPFUtils
+
+# Progress object for jobs executed in the background. Qt widgets (e.g. the
+# algorithm dialog) can not be updated from other threads so background jobs
+# report to this object instead, from which the GUI thread can read the state.
+class GPFJobFeedback:
+
+    def __init__(self, name = ""):
+        self.name = name
+        self.lock = threading.Lock()
+        self.percentage = 0
+        self.consoleLines = []
+
+    def setPercentage(self, percentage):
+        with self.lock:
+            self.percentage = percentage
+
+    def setConsoleInfo(self, text):
+        with self.lock:
+            self.consoleLines.append(text)
+
+    def setInfo(self, text):
+        self.setConsoleInfo(text)
+
+    def setText(self, text):
+        self.setConsoleInfo(text)
+
+    def getPercentage(self):
+        with self.lock:
+            return self.percentage
+
+    def getConsoleInfo(self):
+        with self.lock:
+            return "".join(self.consoleLines)
+
+
+# A single GPF graph execution submitted to GPFJobQueue
+class GPFJob:
+
+    def __init__(self, key, gpf, progress = None, name = "", threads = None, memory = None, parallelJobs = 1):
+        self.key = key
+        self.gpf = gpf
+        self.threads = threads
+        self.memory = memory
+        # number of jobs which may run at the same time as this one, see GPFUtils.executeGpf
+        self.parallelJobs = parallelJobs
+        self.name = name
+        self.progress = progress if progress is not None else GPFJobFeedback(name)
+        self.error = None
+        self.finished = threading.Event()
+
+    def run(self):
+        try:
+            GPFUtils.executeGpf(self.key, self.gpf, self.progress, self.threads, self.memory, parallelJobs = self.parallelJobs)
+        except Exception, e:
+            self.error = e
+        finally:
+            self.finished.set()
+
+    def isFinished(self):
+        return self.finished.is_set()
+
+    # Wait for the job to finish and re-raise the exception raised during its
+    # execution, if any.
+    def wait(self):
+        # Event.wait without timeout can not be interrupted in Python 2
+        while not self.finished.wait(1):
+            pass
+        if self.error is not None:
+            raise self.error
+
+
+# Executes GPF graphs of the key provider (SNAP by default) in background threads,
+# with at most maxJobs (by default the provider's "Maximum number of parallel GPT
+# executions" setting, for SNAP limited by the memory of the host) running at once.
+# Each job reports to its own progress object. The memory of the jobs is sized
+# for that number of parallel jobs.
+class GPFJobQueue:
+
+    def __init__(self, maxJobs = None, key = None):
+        self.maxJobs = maxJobs
+        self.key = key or GPFUtils.snapKey()
+        self.lock = threading.Lock()
+        self.pending = []
+        self.running = 0
+
+    def concurrency(self):
+        if self.maxJobs is not None:
+            return max(self.maxJobs, 1)
+        maxJobs = GPFUtils.maxParallelJobs(self.key)
+        memoryJobs = GPFUtils.memoryParallelJobs()
+        if self.key == GPFUtils.snapKey() and memoryJobs is not None:
+            return min(maxJobs, memoryJobs)
+        return maxJobs
+
+    def submit(self, key, gpf, progress = None, name = "", threads = None, memory = None):
+        job = GPFJob(key, gpf, progress, name, threads, memory, self.concurrency())
+        with self.lock:
+            self.pending.append(job)
+            self._dispatch()
+        return job
+
+    # Wait for all the given jobs and return the ones which failed
+    @staticmethod
+    def waitAll(jobs):
+        failed = []
+        for job in jobs:
+            try:
+                job.wait()
+            except Exception:
+                failed.append(job)
+        return failed
+
+    # Has to be called with self.lock held
+    def _dispatch(self):
+        while self.pending and self.running < self.concurrency():
+            job = self.pending.pop(0)
+            self.running += 1
+            thread = threading.Thread(target = self._run, args = (job,))
+            thread.daemon = True
+            thread.start()
+
+    def _run(self, job):
+        try:
+            job.run()
+        finally:
+            with self.lock:
+                self.running -= 1
+                self._dispatch()
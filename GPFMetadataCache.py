@@ -0,0 +1,143 @@
+"""
+***************************************************************************
+    GPFMetadataCache.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import copy
+import time
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from processing.tools.system import userFolder
+from processing.core.ProcessingLog import ProcessingLog
+
+# Cache of product metadata (band names, polarisations, pixel spacing) which
+# otherwise has to be read by snappy or BEAM every time a parameter panel asks
+# for it. Entries are keyed by product path and kind of metadata and are valid
+# as long as the size and modification time of the product don't change.
+# Recently used entries are kept in memory and all entries are stored in an
+# SQLite database in the user folder so they survive QGIS restarts. Callers
+# get copies of the cached values which they are free to modify.
+class GPFMetadataCache:
+
+    MEMORY_ENTRIES = 256
+    DATABASE_ENTRIES = 5000
+
+    _memory = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def databasePath():
+        return os.path.join(userFolder(), "gpf_metadata.sqlite")
+
+    @staticmethod
+    def connect():
+        connection = sqlite3.connect(GPFMetadataCache.databasePath(), timeout = 10)
+        connection.execute("CREATE TABLE IF NOT EXISTS metadata (path TEXT, kind TEXT, size INTEGER, mtime REAL, "
+                           "value TEXT, accessed REAL, PRIMARY KEY (path, kind))")
+        return connection
+
+    # Path, size and modification time of the product or None if it doesn't exist
+    @staticmethod
+    def identity(path):
+        if not path:
+            return None
+        path = os.path.abspath(unicode(path))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return path, stat.st_size, stat.st_mtime
+
+    # Cached value or None if the metadata of this product is not cached
+    @staticmethod
+    def lookup(path, kind):
+        identity = GPFMetadataCache.identity(path)
+        if identity is None:
+            return None
+        path, size, mtime = identity
+        key = (path, kind)
+        with GPFMetadataCache._lock:
+            entry = GPFMetadataCache._memory.pop(key, None)
+            if entry is not None:
+                if entry[0] == size and entry[1] == mtime:
+                    GPFMetadataCache._memory[key] = entry
+                    return copy.deepcopy(entry[2])
+                entry = None
+        try:
+            connection = GPFMetadataCache.connect()
+            try:
+                row = connection.execute("SELECT size, mtime, value FROM metadata WHERE path = ? AND kind = ?", key).fetchone()
+                if row is None or row[0] != size or row[1] != mtime:
+                    return None
+                connection.execute("UPDATE metadata SET accessed = ? WHERE path = ? AND kind = ?", (time.time(),) + key)
+                connection.commit()
+            finally:
+                connection.close()
+            value = json.loads(row[2])
+        except (sqlite3.Error, ValueError), e:
+            ProcessingLog.addToLog(ProcessingLog.LOG_WARNING, "Could not read product metadata cache: " + str(e))
+            return None
+        GPFMetadataCache.remember(key, (size, mtime, value))
+        return copy.deepcopy(value)
+
+    @staticmethod
+    def store(path, kind, value):
+        identity = GPFMetadataCache.identity(path)
+        if identity is None:
+            return
+        path, size, mtime = identity
+        GPFMetadataCache.remember((path, kind), (size, mtime, copy.deepcopy(value)))
+        try:
+            connection = GPFMetadataCache.connect()
+            try:
+                connection.execute("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?)",
+                                   (path, kind, size, mtime, json.dumps(value), time.time()))
+                # Forget the least recently used products
+                connection.execute("DELETE FROM metadata WHERE rowid IN (SELECT rowid FROM metadata "
+                                   "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (GPFMetadataCache.DATABASE_ENTRIES,))
+                connection.commit()
+            finally:
+                connection.close()
+        except sqlite3.Error, e:
+            ProcessingLog.addToLog(ProcessingLog.LOG_WARNING, "Could not write product metadata cache: " + str(e))
+
+    @staticmethod
+    def remember(key, entry):
+        with GPFMetadataCache._lock:
+            GPFMetadataCache._memory.pop(key, None)
+            GPFMetadataCache._memory[key] = entry
+            while len(GPFMetadataCache._memory) > GPFMetadataCache.MEMORY_ENTRIES:
+                GPFMetadataCache._memory.popitem(last = False)
+
+    @staticmethod
+    def clear():
+        with GPFMetadataCache._lock:
+            GPFMetadataCache._memory.clear()
+        if os.path.exists(GPFMetadataCache.databasePath()):
+            os.remove(GPFMetadataCache.databasePath())
@@ -0,0 +1,128 @@
+"""
+***************************************************************************
+    GPFMetadataPrefetcher.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import threading
+import traceback
+from collections import OrderedDict
+from PyQt4 import QtCore
+from processing.core.ProcessingLog import ProcessingLog
+from processing_gpf.GPFUtils import GPFUtils
+
+# Reads product metadata (band names, polarisations, pixel sizes) for the GPF
+# parameter panels in a background thread, so that the UI doesn't freeze while
+# snappy or BEAM open the product. Requests are identified by a key which
+# includes the product path and modification time. Requests with the same key
+# are executed once and pending requests can be cancelled when the user selects
+# another product. Requests are executed one at a time since they all share the
+# same JVM. The fetched signal is emitted (in the worker thread, so connected
+# slots of GUI objects are called in the GUI thread) when a request is done.
+class GPFMetadataPrefetcher(QtCore.QThread):
+
+    MAX_RESULTS = 64
+
+    fetched = QtCore.pyqtSignal(object, object)
+
+    _instance = None
+
+    @staticmethod
+    def instance():
+        if GPFMetadataPrefetcher._instance is None:
+            GPFMetadataPrefetcher._instance = GPFMetadataPrefetcher()
+        return GPFMetadataPrefetcher._instance
+
+    # Key of a metadata request or None if the product doesn't exist
+    @staticmethod
+    def key(kind, path, *options):
+        if not path:
+            return None
+        snapPath, _ = GPFUtils.gdalPathToSnapPath(unicode(path))
+        try:
+            mtime = os.path.getmtime(snapPath)
+        except (OSError, TypeError):
+            return None
+        return (kind, unicode(path), mtime) + options
+
+    def __init__(self):
+        QtCore.QThread.__init__(self)
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()
+        self.current = None
+        self.results = OrderedDict()
+        self.active = False
+
+    def result(self, key):
+        with self.lock:
+            return self.results.get(key)
+
+    def isFetching(self, key):
+        with self.lock:
+            return key == self.current or key in self.pending
+
+    # Fetch the metadata by calling function in the background unless it
+    # has already been fetched or is being fetched. failedResult is the result
+    # if function raises an exception.
+    def request(self, key, function, failedResult = None):
+        if key is None:
+            return
+        with self.lock:
+            if key in self.results or key == self.current or key in self.pending:
+                return
+            self.pending[key] = (function, failedResult)
+            startThread = not self.active
+            self.active = True
+        if startThread:
+            # the thread might still be returning from its previous run
+            self.wait()
+            self.start()
+
+    # Cancel a request which has not started yet
+    def cancel(self, key):
+        with self.lock:
+            self.pending.pop(key, None)
+
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.current = None
+                    self.active = False
+                    return
+                key, (function, failedResult) = self.pending.popitem(last = False)
+                self.current = key
+            try:
+                result = function()
+            except Exception:
+                ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Could not read product metadata: " + traceback.format_exc())
+                result = failedResult
+            with self.lock:
+                self.results[key] = result
+                while len(self.results) > GPFMetadataPrefetcher.MAX_RESULTS:
+                    self.results.popitem(last = False)
+                self.current = None
+            self.fetched.emit(key, result)
@@ -42,6 +42,10 @@ from processing.modeler.ModelerAlgorithm import Algorithm, ValueFromOutput, Valu
 from processing.modeler.WrongModelException import WrongModelException
 from processing.gui.Help2Html import getHtmlFromDescriptionsDict
 from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFGraph import GPFGraph, GPFGraphNode
+from processing_gpf.GPFGraphOptimizer import GPFGraphOptimizer
+from processing_gpf.GPFResultCache import GPFResultCache
+from processing_gpf.GPFRunReport import GPFRunReport
 from processing_gpf.GPFParametersDialog import GPFParametersDialog
 from PyQt4.QtCore import QPointF
 from PyQt4.QtGui import QIcon, QMessageBox
@@ -72,6 +76,9 @@ class GPFModelerAlgorithm (GeoAlgorithm):
         self.algs = {}
         #Input parameters. A dict of Input objects, with names as keys
         self.inputs = {}
+        # Names of algorithms whose outputs are kept as intermediate products
+        # so that later executions can start from them
+        self.intermediates = set()
         
         # NOTE:
         # This doesn't seem used so remove it later from BEAMParmetersPanel and S1TbxAlgorithm
@@ -98,6 +105,7 @@ class GPFModelerAlgorithm (GeoAlgorithm):
             newone.algs[algname] = Algorithm()
             newone.algs[algname].__dict__.update(copy.deepcopy(alg.todict()))
         newone.inputs = copy.deepcopy(self.inputs)
+        newone.intermediates = set(self.intermediates)
         newone.defineCharacteristics()
         newone.name = self.name
         newone.group = self.group
@@ -106,13 +114,127 @@ class GPFModelerAlgorithm (GeoAlgorithm):
         return newone
         
     def processAlgorithm(self, progress):
-        gpfXml = self.toXml(forExecution = True)
+        report = GPFRunReport(self.name)
+        report.begin("graph build")
+        graph = self.toGraph(forExecution = True)
+        if graph is None:
+            raise GeoAlgorithmExecutionException("Could not create GPF graph of model "+self.name)
+        intermediates = []
+        if self.intermediates:
+            intermediates = self.incrementalGraph(graph)
+        report.end("graph build")
         loglines = []
         loglines.append("GPF Graph")
-        for line in gpfXml.splitlines():
+        for line in graph.toXml().splitlines():
             loglines.append(line)
         ProcessingLog.addToLog(ProcessingLog.LOG_INFO, loglines)
-        GPFUtils.executeGpf(GPFUtils.getKeyFromProviderName(self.provider.getName()), gpfXml, progress)
+        status = None
+        try:
+            status = GPFUtils.executeGpf(GPFUtils.getKeyFromProviderName(self.provider.getName()), graph, progress, report = report)
+        finally:
+            for nodeHash, path in intermediates:
+                if status == 0:
+                    GPFResultCache.storeIntermediate(nodeHash, path)
+                else:
+                    GPFResultCache.discardIntermediate(path)
+    
+    def isIntermediate(self, algName):
+        return algName in self.intermediates
+    
+    def setIntermediate(self, algName, keep):
+        if keep:
+            self.intermediates.add(algName)
+        else:
+            self.intermediates.discard(algName)
+    
+    # Rewrite the execution graph (GPFGraph) so that it starts from the deepest cached 
+    # intermediate products. Nodes with a cached intermediate product (keyed by 
+    # the hash of the node and everything upstream of it) are replaced by Read nodes,
+    # nodes which are then no longer needed are removed and Write nodes are added 
+    # for intermediates which are not cached yet. Returns a list of (node hash, 
+    # path) tuples of the intermediates which will be written.
+    def incrementalGraph(self, graph):
+        hashes = GPFResultCache.nodeHashes(graph.toElement())
+        if hashes is None:
+            return []
+        intermediateIDs = [self.algs[name].algorithm.nodeID for name in self.intermediates 
+                           if name in self.algs and self.algs[name].algorithm.operator != "Write"]
+        loglines = ["Incremental model execution"]
+        
+        # Start from cached products
+        cachedIDs = set()
+        for nodeID in intermediateIDs:
+            path = GPFResultCache.intermediatePath(hashes[nodeID])
+            node = graph.node(nodeID)
+            if node is not None and path:
+                node.operator = "Read"
+                node.sources.clear()
+                node.parameters = ET.Element("parameters")
+                node.setParameter("file", path)
+                cachedIDs.add(nodeID)
+                loglines.append("Using cached intermediate product of "+nodeID+": "+path)
+        
+        # Remove nodes which don't lead to any Write node anymore
+        needed = set()
+        toVisit = [node.nodeID for node in graph.nodes() if node.operator == "Write"]
+        while toVisit:
+            nodeID = toVisit.pop()
+            if nodeID in needed or graph.node(nodeID) is None:
+                continue
+            needed.add(nodeID)
+            toVisit += graph.node(nodeID).sources.values()
+        for node in graph.nodes():
+            if node.nodeID not in needed:
+                graph.removeNode(node.nodeID)
+                loglines.append("Skipping node "+node.nodeID)
+        
+        # Keep the products of intermediates which are not cached yet. The nodes
+        # are added after the others, application data always comes last.
+        newIntermediates = []
+        for nodeID in intermediateIDs:
+            if nodeID not in needed or nodeID in cachedIDs:
+                continue
+            path = GPFResultCache.newIntermediatePath()
+            node = graph.addNode(GPFGraphNode(nodeID+"_intermediate", "Write"))
+            node.sources["sourceProduct"] = nodeID
+            node.setParameter("file", path)
+            node.setParameter("formatName", "BEAM-DIMAP")
+            newIntermediates.append((hashes[nodeID], path))
+            loglines.append("Keeping intermediate product of "+nodeID)
+        
+        ProcessingLog.addToLog(ProcessingLog.LOG_INFO, loglines)
+        return newIntermediates
+
+    # Run this model over many input products. inputs is a list of paths or glob
+    # patterns which are used, one at a time, as value of the first raster input of
+    # the model. The model outputs are named according to outputPattern (see 
+    # GPFUtils.batchOutputPath) and other inputs keep their current values. memory can override
+    # the JVM memory options (see GPFUtils.jvmMemory).
+    def processBatch(self, inputs, outputPattern, progress, parallelJobs = None, memory = None):
+        inputParam = None
+        for param in self.parameters:
+            if isinstance(param, ParameterRaster):
+                inputParam = param
+                break
+        if inputParam is None:
+            raise GeoAlgorithmExecutionException("Model "+self.name+" has no raster input")
+        
+        # Each graph is built from a copy of the model, with the values of this
+        # model's inputs, so that the batch values don't stay in this model
+        graphs = []
+        for index, inputPath in enumerate(GPFUtils.expandBatchInputs(inputs)):
+            model = self.getCopy()
+            for param in self.parameters:
+                model.getParameterFromName(param.name).value = param.value
+            model.getParameterFromName(inputParam.name).value = inputPath
+            for output in model.outputs:
+                output.value = GPFUtils.batchOutputPath(outputPattern, inputPath, index, output.description)
+            graph = model.toGraph(forExecution = True)
+            if graph is None:
+                raise GeoAlgorithmExecutionException("Could not create GPF graph of model "+self.name)
+            graphs.append((inputPath, graph))
+        
+        GPFUtils.executeGpfBatch(GPFUtils.getKeyFromProviderName(self.provider.getName()), graphs, progress, parallelJobs, memory)
     
     def commandLineName(self):
         if self.descriptionFile is None:
@@ -121,9 +243,17 @@ class GPFModelerAlgorithm (GeoAlgorithm):
             return self.provider.getName()+':' + os.path.basename(self.descriptionFile)[:-4].lower()
         
     def toXml(self, forExecution = False):
-        graph = ET.Element("graph", {'id':"Graph"})
-        version = ET.SubElement(graph, "version")
-        version.text = "1.0"
+        graph = self.toGraph(forExecution)
+        if graph is None:
+            return None
+        # Serialize the graph, indented to make it look nice in text file
+        return graph.toXml()
+
+    # GPFGraph of the model, or None if the model can't be saved or executed.
+    # Graphs for execution are passed to GPFUtils.executeGpf as they are, so
+    # that they don't need to be parsed again.
+    def toGraph(self, forExecution = False):
+        graph = GPFGraph("Graph")
         
         # If the XML is made to be saved then set parameters and outputs.
         # If it is made for execution then parameters and outputs are already set.
@@ -143,6 +273,7 @@ class GPFModelerAlgorithm (GeoAlgorithm):
             self.prepareAlgorithm(alg)
             
             graph = alg.algorithm.addGPFNode(graph)
+            node = graph.node(alg.algorithm.nodeID)
             
             # Save custom names of model outputs
             for out in alg.algorithm.outputs:
@@ -152,7 +283,7 @@ class GPFModelerAlgorithm (GeoAlgorithm):
                         QMessageBox.warning(None, self.tr('Unable to save model'),
                                 self.tr('Output rasters can only be saved by Write operator. Remove the value of raster output in %s algorithm or add a Write operator' % (alg.algorithm.operator,) ))
                         return
-                outTag = graph.find('node[@id="'+alg.algorithm.nodeID+'"]/parameters/'+out.name)
+                outTag = node.parameter(out.name)
                 if outTag is not None:
                     safeOutName = self.getSafeNameForOutput(alg.name, out.name)
                     for modelOutput in self.outputs:
@@ -172,23 +303,28 @@ class GPFModelerAlgorithm (GeoAlgorithm):
                         QMessageBox.warning(None, self.tr('Unable to save model'),
                             self.tr('Input rasters can only be loaded by Read operator. Change the value of raster input in %s algorithm to an output of another algorithm' % (alg.algorithm.operator,) ))
                         return
-                    paramTag = graph.find('node[@id="'+alg.algorithm.nodeID+'"]/parameters/'+param.replace('!', '').replace('>', '/'))
+                    paramTag = node.parameter(param.replace('!', '').replace('>', '/'))
                     if paramTag is not None:
                         pos = self.inputs[paramValue].pos
                         paramTag.attrib["qgisModelInputPos"] = str(pos.x())+","+str(pos.y())
                         paramTag.attrib["qgisModelInputVars"] = str(self.inputs[paramValue].param.todict())
             
         # Save model layout
-        presentation = ET.SubElement(graph, "applicationData", {"id":"Presentation", "name":self.name, "group":self.group})
+        presentation = graph.addApplicationData({"id":"Presentation", "name":self.name, "group":self.group})
         ET.SubElement(presentation, "Description")
         for alg in self.algs.values():
             node = ET.SubElement(presentation, "node", {"id":alg.algorithm.nodeID})
+            if alg.name in self.intermediates:
+                node.attrib["cacheOutput"] = "True"
             ET.SubElement(node, "displayPosition", {"x":str(alg.pos.x()), "y":str(alg.pos.y())})     
         
-        # Make it look nice in text file
-        GPFUtils.indentXML(graph)
+        # Graphs for execution are optimized, except for the intermediates 
+        # which are handled by incrementalGraph
+        if forExecution and GPFGraphOptimizer.isActivated():
+            keep = [self.algs[name].algorithm.nodeID for name in self.intermediates if name in self.algs]
+            GPFGraphOptimizer.optimize(graph, keep)
         
-        return ET.tostring(graph)
+        return graph
         
     # Need to set the parameter here while checking it's type to
     # accommodate drop-down list, CRS and extent
@@ -221,9 +357,20 @@ class GPFModelerAlgorithm (GeoAlgorithm):
 
     @staticmethod
     def fromFile(filename, gpfAlgorithmProvider):
+        return GPFModelerAlgorithm.fromXml(GPFModelerAlgorithm.readXml(filename), filename, gpfAlgorithmProvider)
+    
+    # Parsed XML of the GPF graph file. This doesn't need the provider's algorithms
+    # so it can be done outside of the main thread (see SNAPAlgorithmProvider.loadGpfModels)
+    @staticmethod
+    def readXml(filename):
+        try:
+            return ET.parse(filename).getroot()
+        except Exception, e:
+            raise WrongModelException("Error reading GPF XML file: "+str(e))
+    
+    @staticmethod
+    def fromXml(root, filename, gpfAlgorithmProvider):
         try:
-            tree = ET.parse(filename)
-            root = tree.getroot()
             if root.tag == "graph" and "id" in root.attrib and root.attrib["id"] == "Graph":
                 model = GPFModelerAlgorithm(gpfAlgorithmProvider)
                 model.descriptionFile = filename
@@ -312,6 +459,8 @@ class GPFModelerAlgorithm (GeoAlgorithm):
                 model.group = presentation.attrib["group"] if "group" in presentation.attrib.keys() else "Uncategorized"
                 # Place the nodes on the graph canvas
                 for alg in model.algs.values():
+                    if presentation.find('node[@id="'+alg.description+'"][@cacheOutput="True"]') is not None:
+                        model.intermediates.add(alg.name)
                     position = presentation.find('node[@id="'+alg.description+'"]/displayPosition')
                     if position is not None:
                         alg.pos = QPointF(float(position.attrib["x"]), float(position.attrib["y"])) 
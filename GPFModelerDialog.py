@@ -90,17 +90,17 @@ class GPFModelerDialog(ModelerDialog):
         groups = {}
         
         # Add only GPF algorithms
-        for alg in self.gpfAlgorithmProvider.algs:
-            if not alg.showInModeler or alg.allowOnlyOpenedLayers:
-                continue
-            if text == '' or text.lower() in alg.name.lower():
-                if alg.group in groups:
-                    groupItem = groups[alg.group]
+        for group, algs in self.gpfAlgorithmProvider.algorithmRegistry().groups(self.gpfAlgorithmProvider.getName(), text).iteritems():
+            for alg in algs:
+                if not alg.showInModeler or alg.allowOnlyOpenedLayers:
+                    continue
+                if group in groups:
+                    groupItem = groups[group]
                 else:
                     groupItem = QTreeWidgetItem()
-                    groupItem.setText(0, alg.group)
-                    groupItem.setToolTip(0, alg.group)
-                    groups[alg.group] = groupItem
+                    groupItem.setText(0, group)
+                    groupItem.setToolTip(0, group)
+                    groups[group] = groupItem
                 algItem = TreeAlgorithmItem(alg)
                 groupItem.addChild(algItem)
 
@@ -206,6 +206,9 @@ class GPFModelerDialog(ModelerDialog):
                 return
             fout.write(text)
             fout.close()
+            # The provider is reloaded when the dialog is closed (see 
+            # EditGpfModelAction), the models watcher doesn't need to
+            self.gpfAlgorithmProvider.modelChangedByPlugin(filename)
             self.update = True
             QMessageBox.information(self, self.tr('Model saved'),
                                     self.tr('Model was correctly saved.'))
@@ -27,12 +27,42 @@
 """
 
 from processing.modeler.ModelerGraphicItem import ModelerGraphicItem
-from processing.modeler.ModelerAlgorithm import ModelerParameter, Algorithm
+from processing.modeler.ModelerAlgorithm import ModelerParameter, ModelerOutput, Algorithm
 from processing_gpf.GPFModelerParameterDefinitionDialog import GPFModelerParameterDefinitionDialog
 from processing_gpf.GPFModelerParametersDialog import GPFModelerParametersDialog
+from PyQt4.QtGui import QMenu
 
 class GPFModelerGraphicItem(ModelerGraphicItem):
     
+    # Function contextMenuEvent is the same as in ModelerGraphicItem class from
+    # QGIS 2.18.3 except that algorithms also have an action to keep their
+    # output as intermediate product for incremental model execution
+    def contextMenuEvent(self, event):
+        if isinstance(self.element, ModelerOutput):
+            return
+        popupmenu = QMenu()
+        removeAction = popupmenu.addAction('Remove')
+        removeAction.triggered.connect(self.removeElement)
+        editAction = popupmenu.addAction('Edit')
+        editAction.triggered.connect(self.editElement)
+        if isinstance(self.element, Algorithm):
+            if not self.element.active:
+                removeAction = popupmenu.addAction('Activate')
+                removeAction.triggered.connect(self.activateAlgorithm)
+            else:
+                deactivateAction = popupmenu.addAction('Deactivate')
+                deactivateAction.triggered.connect(self.deactivateAlgorithm)
+            intermediateAction = popupmenu.addAction('Keep output as intermediate product')
+            intermediateAction.setCheckable(True)
+            intermediateAction.setChecked(self.model.isIntermediate(self.element.name))
+            intermediateAction.toggled.connect(self.setIntermediate)
+        popupmenu.exec_(event.screenPos())
+    
+    def setIntermediate(self, keep):
+        self.model.setIntermediate(self.element.name, keep)
+        if self.model.modelerdialog:
+            self.model.modelerdialog.hasChanged = True
+    
     # Function editElement is exactly the same as in ModelerGraphicItem class from
     # QGIS 2.18.3 except that ModelerParameterDefinitionDialog is replaced by 
     # GPFModelerParameterDefinitionDialog and ModelerParametersDialog is replaced
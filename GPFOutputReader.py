@@ -0,0 +1,154 @@
+"""
+***************************************************************************
+    GPFOutputReader.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import re
+import time
+import select
+
+# Reads GPT console output in blocks (as soon as it is available in the pipe)
+# and splits it into lines incrementally. SNAP prints the progress as
+# "....10%....20%" without new lines so the percentage is also parsed from
+# the unfinished line, from the percentage at the end of the line only so that
+# other numbers in the output (e.g. "1.25%" in a warning) don't move the
+# progress. Updates of the progress dialog are coalesced so that they happen at
+# most once per UPDATE_INTERVAL seconds, but everything is passed to it before
+# waiting for more output. The console lines are still passed to the dialog one
+# by one, as it shows each call as a line.
+class GPFOutputReader:
+
+    BLOCK_SIZE = 4096
+    UPDATE_INTERVAL = 0.2
+
+    progressRegex = re.compile("\.(\d{2,3})\%\.*(?: done\.)?\s*$")
+
+    def __init__(self, stream, progress = None, loglines = None, report = None):
+        self.fd = stream.fileno()
+        self.progress = progress
+        self.loglines = loglines if loglines is not None else []
+        # GPFRunReport recording the progress timestamps
+        self.report = report
+        # unfinished line and complete lines not yet processed
+        self.partial = ""
+        self.pendingLines = []
+        # console lines and percentage not yet passed to the progress dialog
+        self.consoleLines = []
+        self.percentage = None
+        self.reportedPercentage = None
+        self.lastUpdate = 0
+
+    # Direct the output of the next job to another progress dialog, log lines and report
+    def setTarget(self, progress, loglines, report = None):
+        self.progress = progress
+        self.loglines = loglines
+        self.report = report
+        self.consoleLines = []
+        self.percentage = None
+        self.reportedPercentage = None
+
+    # Read the next block of output. Returns False at the end of the stream.
+    def readBlock(self):
+        data = os.read(self.fd, GPFOutputReader.BLOCK_SIZE)
+        if not data:
+            if self.partial:
+                self.pendingLines.append(self.partial + "\n")
+                self.partial = ""
+            return False
+        lines = (self.partial + data.replace("\r\n", "\n")).split("\n")
+        self.partial = lines.pop()
+        self.pendingLines.extend([line + "\n" for line in lines])
+        return True
+
+    # Whether the next read returns without blocking. Pipes can't be polled
+    # on Windows, there every read is considered blocking.
+    def dataAvailable(self):
+        try:
+            return bool(select.select([self.fd], [], [], 0)[0])
+        except (select.error, ValueError, OSError):
+            return False
+
+    # Read the next line without passing it to the progress dialog or log lines.
+    # Returns None at the end of the stream.
+    def readLine(self):
+        while not self.pendingLines:
+            if not self.readBlock():
+                if not self.pendingLines:
+                    return None
+        return self.pendingLines.pop(0)
+
+    # Process output until the end of stream or until a line starting with endMarker.
+    # That line is then returned and is not added to the log lines.
+    def readUntil(self, endMarker = None):
+        try:
+            while True:
+                while self.pendingLines:
+                    line = self.pendingLines.pop(0)
+                    if endMarker and line.startswith(endMarker):
+                        return line
+                    self.loglines.append(line)
+                    self.consoleLines.append(line)
+                    if self.report is not None:
+                        self.report.consoleLine(line)
+                    self.parsePercentage(line)
+                self.parsePercentage(self.partial)
+                self.updateProgress(force = not self.dataAvailable())
+                if not self.readBlock() and not self.pendingLines:
+                    return None
+        finally:
+            self.updateProgress(force = True)
+
+    def parsePercentage(self, text):
+        match = GPFOutputReader.progressRegex.search(text)
+        if match:
+            self.percentage = int(match.group(1))
+            if self.report is not None:
+                self.report.addProgress(self.percentage)
+
+    def updateProgress(self, force = False):
+        if self.progress is None:
+            return
+        now = time.time()
+        if not force and now - self.lastUpdate < GPFOutputReader.UPDATE_INTERVAL:
+            return
+        self.lastUpdate = now
+        updated = False
+        if self.consoleLines:
+            for line in self.consoleLines:
+                self.progress.setConsoleInfo(line)
+            self.consoleLines = []
+            updated = True
+        if self.percentage is not None and self.percentage != self.reportedPercentage:
+            self.progress.setPercentage(self.percentage)
+            self.reportedPercentage = self.percentage
+            updated = True
+        if updated:
+            # force refresh of the execution dialog
+            try:
+                self.progress.repaint()
+            except:
+                pass
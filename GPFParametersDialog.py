@@ -42,6 +42,7 @@ class GPFParametersDialog(AlgorithmDialog):
 
         self.mainWidget = GPFParametersPanel(self, alg)
         self.setMainWidget()
+        self.mainWidget.connectMetadataPrefetch()
         
         # Same look as AlgorithmDialog
         cornerWidget = QWidget()
@@ -28,6 +28,7 @@
 
 from processing.gui.ParametersPanel import ParametersPanel
 from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFMetadataPrefetcher import GPFMetadataPrefetcher
 from processing_gpf.GPFParameters import ParameterBands, ParameterPolarisations, ParameterPixelSize
 from PyQt4 import QtGui, QtCore
 
@@ -48,17 +49,114 @@ class GPFParametersPanel(ParametersPanel):
             item = ParametersPanel.getWidgetFromParameter(self, param)
         return item
     
+    # Start reading the metadata of source rasters in the background as soon
+    # as they are selected so it's ready when the user clicks the buttons
+    def connectMetadataPrefetch(self):
+        for widget in self.valueItems.values():
+            if isinstance(widget, GPFMetadataPanel):
+                widget.connectSourceRaster(self.valueItems.get(widget.sourceRaster))
     
+# Base class of panels with a button showing metadata of the source raster.
+# The metadata is read by GPFMetadataPrefetcher and the dialog is shown
+# straight away, either with the metadata or in loading state until the 
+# metadata is fetched. metadataKind and keyOptions identify the metadata of
+# a product, readMetadata(path) reads it and createDialog(metadata, path) 
+# creates the dialog showing it. failedResult is shown if reading fails and
+# emptyResult if there is no product. The key of the request needs the
+# modification time of the product, so while the user types a path the
+# request waits until the typing stopped for PREFETCH_DELAY milliseconds.
+class GPFMetadataPanel(QtGui.QWidget):
+    
+    FAILED_RESULT = ['Could not read product metadata', 'See Processing log for more details']
+    PREFETCH_DELAY = 500
+    
+    def __init__(self, parent, programKey, sourceRaster, metadataKind, readMetadata, createDialog,
+                 keyOptions = (), failedResult = FAILED_RESULT, emptyResult = []):
+        QtGui.QWidget.__init__(self)
+        self.parent = parent
+        self.programKey = programKey
+        self.sourceRaster = sourceRaster
+        self.metadataKind = metadataKind
+        self.readMetadata = readMetadata
+        self.createDialog = createDialog
+        self.keyOptions = keyOptions
+        self.failedResult = failedResult
+        self.emptyResult = emptyResult
+        self.requestedKey = None
+        self.prefetchTimer = QtCore.QTimer(self)
+        self.prefetchTimer.setSingleShot(True)
+        self.prefetchTimer.setInterval(GPFMetadataPanel.PREFETCH_DELAY)
+        self.prefetchTimer.timeout.connect(self.prefetchMetadata)
+        
+    def getFilePath(self):
+        value = self.parent.getRasterParamPath(self.sourceRaster)
+        return value
+    
+    # Key of the metadata request, the function reading the metadata, the 
+    # result if reading fails and the result without product
+    def metadataRequest(self, path):
+        key = GPFMetadataPrefetcher.key(self.metadataKind, path, *self.keyOptions)
+        function = lambda: self.readMetadata(path)
+        return key, function, self.failedResult, self.emptyResult
+    
+    def createMetadataDialog(self, metadata, path):
+        return self.createDialog(metadata, path)
+    
+    def connectSourceRaster(self, widget):
+        combo = getattr(widget, "cmbText", None)
+        if combo is not None:
+            combo.currentIndexChanged.connect(self.prefetchMetadata)
+            combo.editTextChanged.connect(lambda text: self.prefetchTimer.start())
+        self.prefetchMetadata()
+        
+    def prefetchMetadata(self, *args):
+        self.prefetchTimer.stop()
+        path = self.getFilePath()
+        key, function, failedResult, emptyResult = self.metadataRequest(path)
+        prefetcher = GPFMetadataPrefetcher.instance()
+        if self.requestedKey is not None and self.requestedKey != key:
+            prefetcher.cancel(self.requestedKey)
+        self.requestedKey = key
+        prefetcher.request(key, function, failedResult)
+        return path, key, emptyResult
+    
+    def showMetadataDialog(self):
+        path, key, emptyResult = self.prefetchMetadata()
+        prefetcher = GPFMetadataPrefetcher.instance()
+        metadata = emptyResult if key is None else prefetcher.result(key)
+        dlg = self.createMetadataDialog(metadata, path)
+        dlg.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+        if metadata is None:
+            dlg.metadataKey = key
+            prefetcher.fetched.connect(dlg.metadataFetched)
+            # The prefetcher would otherwise keep closed dialogs alive
+            dlg.finished.connect(lambda result: GPFMetadataPanel.disconnectMetadataDialog(dlg))
+            # The metadata might have been fetched while the dialog was created
+            metadata = prefetcher.result(key)
+            if metadata is not None:
+                dlg.metadataFetched(key, metadata)
+        dlg.show()
+    
+    @staticmethod
+    def disconnectMetadataDialog(dlg):
+        try:
+            GPFMetadataPrefetcher.instance().fetched.disconnect(dlg.metadataFetched)
+        except TypeError:
+            # Already disconnected
+            pass
+    
+
 # Special functionality for S1 Toolbox terrain-correction
 # S1 Toolbox pixel size input panel is the same as normal number
 # input panel except that it has a button next to it
 # to show selected products pixel size.     
-class S1TbxPixelSizeInputPanel(QtGui.QWidget):
+class S1TbxPixelSizeInputPanel(GPFMetadataPanel):
     
     def __init__(self, default, isInteger, parent, programKey):
-        QtGui.QWidget.__init__(self)
-        self.parent = parent
-        self.programKey = programKey
+        GPFMetadataPanel.__init__(self, parent, programKey, "sourceProduct", "pixelSize",
+                                  lambda path: GPFUtils.getS1TbxPixelSize(path, programKey),
+                                  lambda pixelSizes, path: S1TbxPixelSizeInputDialog(pixelSizes, path, parent),
+                                  (programKey,), {'!': 'Could not read product metadata. See Processing log for more details'}, {})
         self.numberPanel = QtGui.QLineEdit()
         self.numberPanel.setText(str(default))
         self.metadataButton = QtGui.QPushButton()
@@ -71,12 +169,6 @@ class S1TbxPixelSizeInputPanel(QtGui.QWidget):
         self.horizontalLayout.addWidget(self.numberPanel)
         self.horizontalLayout.addWidget(self.metadataButton)
 
-    def showMetadataDialog(self):
-        sourceProduct = self.parent.getRasterParamPath("sourceProduct")
-        pixelSizes = GPFUtils.getS1TbxPixelSize(sourceProduct, self.programKey)
-        dlg = S1TbxPixelSizeInputDialog(pixelSizes, sourceProduct, self.parent)
-        dlg.show()
-        
     def getValue(self):
         return self.numberPanel.text()
     
@@ -88,6 +180,7 @@ class S1TbxPixelSizeInputDialog(QtGui.QDialog):
     def __init__(self, pixelSizes, filename, parent):
         self.pixelSizes = pixelSizes
         self.filename = filename
+        self.metadataKey = None
         QtGui.QDialog.__init__(self, parent)
         self.setWindowModality(0)
         self.setupUi()
@@ -111,6 +204,9 @@ class S1TbxPixelSizeInputDialog(QtGui.QDialog):
         self.verticalLayout.addLayout(self.horizontalLayout)
        
     def setTableContent(self):
+        if self.pixelSizes is None:
+            showLoading(self.table)
+            return
         self.table.setRowCount(len(self.pixelSizes))
         i=0
         for k,v in self.pixelSizes.items():
@@ -120,17 +216,30 @@ class S1TbxPixelSizeInputDialog(QtGui.QDialog):
             item.setText(text)
             self.table.setCellWidget(i,0, item)
             i += 1     
+            
+    def metadataFetched(self, key, pixelSizes):
+        if key == self.metadataKey and self.pixelSizes is None:
+            self.pixelSizes = pixelSizes
+            self.setTableContent()
+            
+# Show a single row telling that the product metadata is being read
+def showLoading(table):
+    table.setRowCount(1)
+    item = QtGui.QLabel("Reading product metadata...")
+    item.setEnabled(False)
+    table.setCellWidget(0, 0, item)
              
 # GPF bands selector panel is the same as normal text panel
 # except that it has a button next to it to show band names 
-class GPFBandsSelectorPanel(QtGui.QWidget):
+class GPFBandsSelectorPanel(GPFMetadataPanel):
     
     def __init__(self, default, parent, programKey, bandSourceRaster, appendProductName):
-        QtGui.QWidget.__init__(self)
-        self.parent = parent
+        GPFMetadataPanel.__init__(self, parent, programKey, bandSourceRaster, "bands",
+                                  lambda path: GPFUtils.getBeamBandNames(path, programKey, appendProductName),
+                                  lambda bands, path: GPFBandsListDialog(bands, path, self),
+                                  (programKey, appendProductName))
         self.appendProductName = appendProductName
         self.bandSourceRaster = bandSourceRaster
-        self.programKey = programKey
         self.bandsPanel = QtGui.QLineEdit()
         self.bandsPanel.setText(str(default))
         self.bandsButton = QtGui.QPushButton()
@@ -147,14 +256,8 @@ class GPFBandsSelectorPanel(QtGui.QWidget):
         self.bandsPanel.setText(bands)
        
     def showBandsDialog(self):
-        bands = GPFUtils.getBeamBandNames(self.getFilePath(), self.programKey, self.appendProductName)
-        dlg = GPFBandsListDialog(bands, self.getFilePath(), self)
-        dlg.show()
+        self.showMetadataDialog()
         
-    def getFilePath(self):
-        value = self.parent.getRasterParamPath(self.bandSourceRaster)
-        return value
-    
     def getValue(self):
         return self.bandsPanel.text()
     
@@ -167,6 +270,7 @@ class GPFBandsListDialog(QtGui.QDialog):
         self.bands = bands
         self.selectedBands = []
         self.filename = filename
+        self.metadataKey = None
         QtGui.QDialog.__init__(self, parent)
         self.parent = parent
         self.setWindowModality(0)
@@ -213,6 +317,9 @@ class GPFBandsListDialog(QtGui.QDialog):
         QtCore.QMetaObject.connectSlotsByName(self)
         
     def setTableContent(self):
+        if self.bands is None:
+            showLoading(self.table)
+            return
         self.table.setRowCount(len(self.bands))
         for i in range(len(self.bands)):
             item = QtGui.QCheckBox()
@@ -220,6 +327,11 @@ class GPFBandsListDialog(QtGui.QDialog):
             self.table.setCellWidget(i,0, item)
             QtCore.QObject.connect(item, QtCore.SIGNAL("stateChanged(int)"), self.updateBandList)
     
+    def metadataFetched(self, key, bands):
+        if key == self.metadataKey and self.bands is None:
+            self.bands = bands
+            self.setTableContent()
+    
     
     def updateBandList(self):
         selectedBands = ""
@@ -234,6 +346,8 @@ class GPFBandsListDialog(QtGui.QDialog):
         self.bandList.setText(selectedBands)
             
     def selectAll(self):
+        if self.bands is None:
+            return
         checked = False
         for i in range(len(self.bands)):
             widget = self.table.cellWidget(i, 0)
@@ -259,11 +373,10 @@ class GPFPolarisationsSelectorPanel(GPFBandsSelectorPanel):
     def __init__(self, default, parent, programKey, bandSourceRaster, appendProductName):
         super(GPFPolarisationsSelectorPanel, self).__init__(default, parent, programKey, bandSourceRaster, appendProductName)
         self.bandsButton.setText("Polarisations")
-        
-    def showBandsDialog(self):
-        polarisations = GPFUtils.getPolarisations(self.getFilePath())
-        dlg = GPFPolarisationsListDialog(polarisations, self.getFilePath(), self)
-        dlg.show()
+        self.metadataKind = "polarisations"
+        self.readMetadata = GPFUtils.getPolarisations
+        self.createDialog = lambda polarisations, path: GPFPolarisationsListDialog(polarisations, path, self)
+        self.keyOptions = ()
         
 class GPFPolarisationsListDialog(GPFBandsListDialog): 
     def setupUi(self):
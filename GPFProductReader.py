@@ -0,0 +1,212 @@
+"""
+***************************************************************************
+    GPFProductReader.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import re
+import glob
+import zipfile
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+# Readers of product metadata which parse the XML headers of the products
+# directly, so that band names, polarisations, raster size and pixel spacing
+# can be listed without starting a JVM. Supported are BEAM-DIMAP (.dim),
+# Sentinel-1 SAFE (manifest.safe and annotation files, also read in place
+# from .zip archives) and Sentinel-2 (MTD_MSIL*.xml). read() returns a dictionary with keys:
+#   productName, bands, polarisations, width, height, pixelSpacing, partial
+# where pixelSpacing is a dictionary of "range_spacing" and "azimuth_spacing"
+# (value, unit) tuples, or None for other formats. Missing values are None.
+# partial lists the keys whose values are incomplete, e.g. the bands of
+# Sentinel-2 products which SNAP extends with angle, mask and quality bands.
+class GPFProductReader:
+
+    s2MetadataRegex = re.compile("^MTD_MSIL[123][ABC]\.xml$", re.IGNORECASE)
+
+    @staticmethod
+    def localName(tag):
+        return tag.rsplit("}", 1)[-1]
+
+    @staticmethod
+    def emptyMetadata():
+        return {"productName": None, "bands": None, "polarisations": None,
+                "width": None, "height": None, "pixelSpacing": None, "partial": []}
+
+    @staticmethod
+    def read(path):
+        if not path:
+            return None
+        path = unicode(path)
+        try:
+            if os.path.isdir(path) and path.upper().rstrip(os.sep).endswith(".SAFE"):
+                if os.path.exists(os.path.join(path, "manifest.safe")):
+                    return GPFProductReader.readSafe(os.path.join(path, "manifest.safe"))
+                s2Metadata = [f for f in os.listdir(path) if GPFProductReader.s2MetadataRegex.match(f)]
+                if s2Metadata:
+                    return GPFProductReader.readS2(os.path.join(path, s2Metadata[0]))
+            elif os.path.basename(path).lower() == "manifest.safe":
+                return GPFProductReader.readSafe(path)
+            elif path.lower().endswith(".dim"):
+                return GPFProductReader.readDimap(path)
+            elif GPFProductReader.s2MetadataRegex.match(os.path.basename(path)):
+                return GPFProductReader.readS2(path)
+            elif path.lower().endswith(".zip") and os.path.isfile(path):
+                return GPFProductReader.readSafeZip(path)
+        except (IOError, OSError, SyntaxError, ValueError, zipfile.BadZipfile):
+            # Unreadable or unexpected header, let snappy try
+            pass
+        return None
+
+    @staticmethod
+    def readDimap(path):
+        metadata = GPFProductReader.emptyMetadata()
+        root = ET.parse(path).getroot()
+        metadata["productName"] = root.findtext("Dataset_Id/DATASET_NAME")
+        metadata["bands"] = [band.findtext("BAND_NAME") for band in root.findall("Image_Interpretation/Spectral_Band_Info")]
+        if root.findtext("Raster_Dimensions/NCOLS"):
+            metadata["width"] = int(root.findtext("Raster_Dimensions/NCOLS"))
+            metadata["height"] = int(root.findtext("Raster_Dimensions/NROWS"))
+        abstracted = root.find('Dataset_Sources/MDElem[@name="metadata"]/MDElem[@name="Abstracted_Metadata"]')
+        if abstracted is not None:
+            attributes = dict([(attribute.attrib.get("name"), attribute) for attribute in abstracted.findall("MDATTR")])
+            polarisations = []
+            for i in range(1, 5):
+                attribute = attributes.get("mds%d_tx_rx_polar" % i)
+                if attribute is not None and attribute.text and attribute.text.strip() not in ("", "-"):
+                    polarisations.append(attribute.text.strip())
+            metadata["polarisations"] = polarisations
+            if "range_spacing" in attributes and "azimuth_spacing" in attributes:
+                metadata["pixelSpacing"] = {}
+                for name in ["range_spacing", "azimuth_spacing"]:
+                    metadata["pixelSpacing"][name] = (float(attributes[name].text), attributes[name].attrib.get("unit", ""))
+        return metadata
+
+    @staticmethod
+    def readSafe(manifestPath):
+        safeDir = os.path.dirname(os.path.abspath(manifestPath))
+        productName = os.path.splitext(os.path.basename(safeDir))[0]
+        annotationPaths = sorted(glob.glob(os.path.join(safeDir, "annotation", "*.xml")))
+        return GPFProductReader.parseSafe(productName, manifestPath, annotationPaths, lambda path: open(path, "rb"))
+    
+    # Zipped SAFE product. Only the manifest and the annotation files are 
+    # decompressed, the rest of the archive is not touched.
+    @staticmethod
+    def readSafeZip(zipPath):
+        with zipfile.ZipFile(zipPath) as archive:
+            names = archive.namelist()
+            manifests = [name for name in names if name.lower().endswith("manifest.safe")]
+            if not manifests:
+                return None
+            manifest = min(manifests, key = len)
+            safeDir = manifest[:-len("manifest.safe")]
+            productName = os.path.splitext(safeDir.rstrip("/").split("/")[-1])[0]
+            if not productName:
+                productName = os.path.splitext(os.path.basename(zipPath))[0]
+            annotationDir = safeDir + "annotation/"
+            annotationPaths = sorted([name for name in names if name.startswith(annotationDir) and 
+                                      name.endswith(".xml") and "/" not in name[len(annotationDir):]])
+            return GPFProductReader.parseSafe(productName, manifest, annotationPaths, archive.open)
+    
+    # Metadata from S1 manifest and annotation files, opened with openFile
+    @staticmethod
+    def parseSafe(productName, manifestPath, annotationPaths, openFile):
+        metadata = GPFProductReader.emptyMetadata()
+        metadata["productName"] = productName
+        polarisations = []
+        productType = None
+        with openFile(manifestPath) as manifestFile:
+            manifestRoot = ET.parse(manifestFile).getroot()
+        for element in manifestRoot.iter():
+            name = GPFProductReader.localName(element.tag)
+            if name == "transmitterReceiverPolarisation" and element.text:
+                polarisations.append(element.text.strip())
+            elif name == "productType" and element.text:
+                productType = element.text.strip()
+        metadata["polarisations"] = polarisations
+
+        # Annotation files are named <mission>-<swath>-<product type>-<polarisation>-...
+        annotations = []
+        for annotationPath in annotationPaths:
+            parts = annotationPath.replace("\\", "/").split("/")[-1].split("-")
+            if len(parts) > 3:
+                annotations.append((parts[1].upper(), parts[3].upper(), annotationPath))
+        if not annotations:
+            return metadata
+
+        if productType == "GRD":
+            metadata["bands"] = []
+            for polarisation in polarisations:
+                metadata["bands"] += ["Amplitude_"+polarisation, "Intensity_"+polarisation]
+        elif productType == "SLC":
+            metadata["bands"] = []
+            for swath in sorted(set([swath for swath, _, _ in annotations])):
+                for polarisation in polarisations:
+                    suffix = swath+"_"+polarisation
+                    metadata["bands"] += ["i_"+suffix, "q_"+suffix, "Intensity_"+suffix]
+
+        with openFile(annotations[0][2]) as annotationFile:
+            imageInformation = GPFProductReader.readAnnotation(annotationFile)
+        if productType == "GRD":
+            metadata["width"] = imageInformation.get("numberOfSamples")
+            metadata["height"] = imageInformation.get("numberOfLines")
+        if "rangePixelSpacing" in imageInformation and "azimuthPixelSpacing" in imageInformation:
+            metadata["pixelSpacing"] = {"range_spacing": (imageInformation["rangePixelSpacing"], "m"),
+                                        "azimuth_spacing": (imageInformation["azimuthPixelSpacing"], "m")}
+        return metadata
+
+    # Image size and pixel spacing from S1 annotation file. The file is parsed
+    # only until these are found since the rest of it can be several MB.
+    @staticmethod
+    def readAnnotation(annotationFile):
+        wanted = {"rangePixelSpacing": float, "azimuthPixelSpacing": float,
+                  "numberOfSamples": int, "numberOfLines": int}
+        values = {}
+        for _, element in ET.iterparse(annotationFile):
+            name = GPFProductReader.localName(element.tag)
+            if name in wanted and name not in values and element.text:
+                values[name] = wanted[name](element.text)
+                if len(values) == len(wanted):
+                    break
+        return values
+
+    @staticmethod
+    def readS2(path):
+        metadata = GPFProductReader.emptyMetadata()
+        root = ET.parse(path).getroot()
+        bands = []
+        for element in root.iter():
+            name = GPFProductReader.localName(element.tag)
+            if name == "PRODUCT_URI" and element.text:
+                metadata["productName"] = os.path.splitext(element.text.strip())[0]
+            elif name == "Spectral_Information" and "physicalBand" in element.attrib:
+                bands.append(element.attrib["physicalBand"])
+        # Only the spectral bands are listed in the metadata file
+        metadata["bands"] = bands
+        metadata["partial"] = ["bands"]
+        return metadata
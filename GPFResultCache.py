@@ -0,0 +1,349 @@
+"""
+***************************************************************************
+    GPFResultCache.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import time
+import json
+import shutil
+import hashlib
+import tempfile
+from processing.tools.system import userFolder, mkdir
+from processing.core.ProcessingConfig import ProcessingConfig
+from processing.core.ProcessingLog import ProcessingLog
+from processing_gpf.GPFUtils import GPFUtils
+
+# Content-addressed cache of GPT results. The key of a graph is computed from the
+# operators and parameters of its nodes and the identity (path, size, modification
+# time) of the input files, but not from node IDs, which differ between runs, or
+# output paths. The outputs of the Write nodes of executed graphs are copied
+# to the cache folder and copied into place when a graph with the same key is
+# executed again. Entries are never hard-linked to output files since those can
+# be overwritten in place (e.g. by a rerun with the cache off) or edited, which
+# would silently change the cached entry and every output restored from it. Least recently used entries are
+# evicted when the cache grows over the size set in the provider settings.
+# The same folder also holds intermediate products of GPF model nodes.
+class GPFResultCache:
+
+    MANIFEST = "manifest.json"
+
+    @staticmethod
+    def isActivated():
+        return ProcessingConfig.getSetting(GPFUtils.GPF_CACHE_ACTIVATE) == True
+
+    @staticmethod
+    def cacheFolder():
+        folder = os.path.join(userFolder(), "gpf_cache")
+        mkdir(folder)
+        return folder
+
+    @staticmethod
+    def maxSize():
+        try:
+            return int(float(ProcessingConfig.getSetting(GPFUtils.GPF_CACHE_SIZE))) * 1024 * 1024
+        except:
+            return 20480 * 1024 * 1024
+
+    # Identity of an input file or directory (e.g. .SAFE) which changes when its
+    # contents are changed
+    @staticmethod
+    def fileIdentity(path):
+        if os.path.isdir(path):
+            size = 0
+            mtime = os.path.getmtime(path)
+            for dirpath, _, filenames in os.walk(path):
+                for filename in filenames:
+                    stat = os.stat(os.path.join(dirpath, filename))
+                    size += stat.st_size
+                    mtime = max(mtime, stat.st_mtime)
+        else:
+            stat = os.stat(path)
+            size = stat.st_size
+            mtime = stat.st_mtime
+        return "%s|%d|%f" % (os.path.abspath(path), size, mtime)
+
+    # Canonical text of a parameters element. Attributes added by the GPF modeler
+    # are left out since they don't influence the results.
+    @staticmethod
+    def canonicalElement(element):
+        attributes = sorted([(name, value) for name, value in element.attrib.items() if not name.startswith("qgisModel")])
+        text = (element.text or "").strip()
+        children = "".join([GPFResultCache.canonicalElement(child) for child in element])
+        return "<%s %s>%s%s</%s>" % (element.tag, attributes, text, children, element.tag)
+
+    # Hash of every node in the graph, computed from the node's operator and parameters
+    # and the hashes of its sources. Returns None if an input file doesn't exist.
+    @staticmethod
+    def nodeHashes(graph):
+        nodes = dict([(node.attrib["id"], node) for node in graph.findall("node")])
+        hashes = {}
+
+        def nodeHash(nodeId, visiting):
+            if nodeId in hashes:
+                return hashes[nodeId]
+            node = nodes.get(nodeId)
+            if node is None or nodeId in visiting:
+                return "missing:" + nodeId
+            visiting.add(nodeId)
+            operator = node.findtext("operator")
+            digest = hashlib.sha1(operator.encode("utf-8"))
+            parameters = node.find("parameters")
+            if parameters is not None:
+                for parameter in parameters:
+                    if operator == "Read" and parameter.tag == "file":
+                        if not parameter.text or not os.path.exists(parameter.text):
+                            raise IOError(parameter.text)
+                        digest.update(GPFResultCache.fileIdentity(parameter.text).encode("utf-8"))
+                    elif operator == "ProductSet-Reader" and parameter.tag == "fileList":
+                        for filename in (parameter.text or "").split(","):
+                            digest.update(GPFResultCache.fileIdentity(filename).encode("utf-8"))
+                    elif operator == "Write" and parameter.tag == "file":
+                        # the output location doesn't change the result
+                        continue
+                    else:
+                        digest.update(GPFResultCache.canonicalElement(parameter).encode("utf-8"))
+            sources = node.find("sources")
+            if sources is not None:
+                for source in sorted(sources, key = lambda s: s.tag):
+                    refid = source.attrib.get("refid", source.text or "")
+                    digest.update(("%s=%s" % (source.tag, nodeHash(refid.strip(), visiting))).encode("utf-8"))
+            visiting.discard(nodeId)
+            hashes[nodeId] = digest.hexdigest()
+            return hashes[nodeId]
+
+        try:
+            for nodeId in nodes:
+                nodeHash(nodeId, set())
+        except (IOError, OSError):
+            return None
+        return hashes
+
+    # Write nodes of the graph as a list of (hash, output file) tuples
+    @staticmethod
+    def writeNodes(graph, hashes):
+        writes = []
+        for node in graph.findall("node"):
+            if node.findtext("operator") == "Write" and node.findtext("parameters/file"):
+                writes.append((hashes[node.attrib["id"]], node.findtext("parameters/file")))
+        return writes
+
+    # Write nodes of the parsed graph (see GPFUtils.graphElement) or None if the 
+    # graph can't be cached. The input files are hashed only here, the result
+    # is passed to graphKey, restore and store.
+    @staticmethod
+    def graphWrites(graph):
+        if graph is None:
+            return None
+        hashes = GPFResultCache.nodeHashes(graph)
+        if hashes is None:
+            return None
+        return GPFResultCache.writeNodes(graph, hashes) or None
+
+    # Key of the graph with the given Write nodes (see graphWrites) or None if 
+    # the graph can't be cached
+    @staticmethod
+    def graphKey(writes):
+        if not writes:
+            return None
+        return hashlib.sha1(",".join(sorted([writeHash for writeHash, _ in writes]))).hexdigest()
+
+    # Files and directories written by GPT for the given output file, e.g. for
+    # BEAM-DIMAP the .dim file and .data directory. GPT adds the extension if missing.
+    @staticmethod
+    def outputFiles(outputFile):
+        base, ext = os.path.splitext(outputFile)
+        candidates = [outputFile]
+        if not ext:
+            candidates += [outputFile + ".dim", outputFile + ".tif", outputFile + ".hdr"]
+        candidates.append(base + ".data")
+        return [path for path in candidates if os.path.exists(path)]
+
+    # Copy a file or directory, replacing the target. The target is removed 
+    # first so that a hard link to another file is never written through.
+    @staticmethod
+    def copyOutput(source, target):
+        if os.path.isdir(source):
+            mkdir(target)
+            for name in os.listdir(source):
+                GPFResultCache.copyOutput(os.path.join(source, name), os.path.join(target, name))
+            return
+        if os.path.exists(target):
+            os.remove(target)
+        shutil.copy2(source, target)
+
+    @staticmethod
+    def treeSize(path):
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        size = 0
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                size += os.path.getsize(os.path.join(dirpath, filename))
+        return size
+
+    # Copy the cached outputs of the graph into place. Returns False if the graph
+    # is not in the cache.
+    @staticmethod
+    def restore(key, writes, loglines):
+        entry = os.path.join(GPFResultCache.cacheFolder(), key)
+        manifestPath = os.path.join(entry, GPFResultCache.MANIFEST)
+        if not os.path.exists(manifestPath):
+            return False
+        try:
+            with open(manifestPath) as manifestFile:
+                manifest = json.load(manifestFile)
+            if not all([writeHash in manifest["outputs"] for writeHash, _ in writes]):
+                return False
+            for writeHash, outputFile in writes:
+                output = manifest["outputs"][writeHash]
+                targetBase = os.path.splitext(outputFile)[0]
+                for suffix in output["suffixes"]:
+                    source = os.path.join(entry, writeHash, "output" + suffix)
+                    target = targetBase + suffix
+                    if os.path.isdir(target):
+                        shutil.rmtree(target)
+                    # BEAM-DIMAP header refers to the .data directory by name
+                    if suffix == ".dim":
+                        if os.path.exists(target):
+                            os.remove(target)
+                        with open(source) as dimFile:
+                            header = dimFile.read()
+                        header = header.replace(output["name"] + ".data", os.path.basename(targetBase) + ".data")
+                        with open(target, "w") as dimFile:
+                            dimFile.write(header)
+                    else:
+                        GPFResultCache.copyOutput(source, target)
+                loglines.append("Output restored from result cache: " + outputFile)
+            # Touch the manifest to mark the entry as recently used
+            os.utime(manifestPath, None)
+            return True
+        except Exception, e:
+            ProcessingLog.addToLog(ProcessingLog.LOG_WARNING, "Could not restore outputs from result cache: " + str(e))
+            return False
+
+    # Store outputs of the executed graph in the cache and evict old entries if needed
+    @staticmethod
+    def store(key, writes):
+        folder = GPFResultCache.cacheFolder()
+        entry = os.path.join(folder, key)
+        if os.path.exists(entry):
+            return
+        # Build the entry in a temporary folder and rename it at the end so that
+        # other QGIS sessions never see an incomplete entry
+        tempEntry = tempfile.mkdtemp(prefix = "tmp_", dir = folder)
+        try:
+            manifest = {"created": time.time(), "outputs": {}, "size": 0}
+            for writeHash, outputFile in writes:
+                files = GPFResultCache.outputFiles(outputFile)
+                if not files:
+                    return
+                base = os.path.splitext(outputFile)[0]
+                mkdir(os.path.join(tempEntry, writeHash))
+                suffixes = []
+                for path in files:
+                    suffix = path[len(base):]
+                    GPFResultCache.copyOutput(path, os.path.join(tempEntry, writeHash, "output" + suffix))
+                    manifest["size"] += GPFResultCache.treeSize(path)
+                    suffixes.append(suffix)
+                manifest["outputs"][writeHash] = {"name": os.path.basename(base), "suffixes": suffixes}
+            with open(os.path.join(tempEntry, GPFResultCache.MANIFEST), "w") as manifestFile:
+                json.dump(manifest, manifestFile)
+            os.rename(tempEntry, entry)
+        except Exception, e:
+            ProcessingLog.addToLog(ProcessingLog.LOG_WARNING, "Could not store outputs in result cache: " + str(e))
+        finally:
+            shutil.rmtree(tempEntry, ignore_errors = True)
+        GPFResultCache.evict()
+
+    # Intermediate products of GPF model nodes are kept in the cache folder as
+    # BEAM-DIMAP products, keyed by the hash of the node (see nodeHashes) and
+    # evicted together with the cached graph outputs.
+
+    # Path of the cached intermediate product of a node or None if it's not cached
+    @staticmethod
+    def intermediatePath(nodeHash):
+        entry = os.path.join(GPFResultCache.cacheFolder(), "i_" + nodeHash)
+        manifestPath = os.path.join(entry, GPFResultCache.MANIFEST)
+        if not os.path.exists(manifestPath):
+            return None
+        os.utime(manifestPath, None)
+        return os.path.join(entry, "output.dim")
+
+    # Path where GPT should write a new intermediate product. Once it is written
+    # it has to be passed to storeIntermediate or discardIntermediate.
+    @staticmethod
+    def newIntermediatePath():
+        return os.path.join(tempfile.mkdtemp(prefix = "tmp_", dir = GPFResultCache.cacheFolder()), "output.dim")
+
+    @staticmethod
+    def storeIntermediate(nodeHash, path):
+        tempEntry = os.path.dirname(path)
+        entry = os.path.join(GPFResultCache.cacheFolder(), "i_" + nodeHash)
+        if not os.path.exists(path) or os.path.exists(entry):
+            GPFResultCache.discardIntermediate(path)
+            return
+        try:
+            manifest = {"created": time.time(), "intermediate": True, "size": GPFResultCache.treeSize(tempEntry)}
+            with open(os.path.join(tempEntry, GPFResultCache.MANIFEST), "w") as manifestFile:
+                json.dump(manifest, manifestFile)
+            os.rename(tempEntry, entry)
+        except Exception, e:
+            ProcessingLog.addToLog(ProcessingLog.LOG_WARNING, "Could not store intermediate product in result cache: " + str(e))
+            GPFResultCache.discardIntermediate(path)
+        GPFResultCache.evict()
+
+    @staticmethod
+    def discardIntermediate(path):
+        shutil.rmtree(os.path.dirname(path), ignore_errors = True)
+
+    # Remove least recently used entries until the cache fits in its maximum size
+    @staticmethod
+    def evict():
+        folder = GPFResultCache.cacheFolder()
+        entries = []
+        total = 0
+        for name in os.listdir(folder):
+            manifestPath = os.path.join(folder, name, GPFResultCache.MANIFEST)
+            if not os.path.exists(manifestPath):
+                continue
+            try:
+                with open(manifestPath) as manifestFile:
+                    size = json.load(manifestFile)["size"]
+            except Exception:
+                size = 0
+            entries.append((os.path.getmtime(manifestPath), size, name))
+            total += size
+        maxSize = GPFResultCache.maxSize()
+        for _, size, name in sorted(entries):
+            if total <= maxSize:
+                break
+            shutil.rmtree(os.path.join(folder, name), ignore_errors = True)
+            total -= size
+
+    @staticmethod
+    def clear():
+        shutil.rmtree(GPFResultCache.cacheFolder(), ignore_errors = True)
@@ -0,0 +1,195 @@
+"""
+***************************************************************************
+    GPFRunReport.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import glob
+import json
+import time
+from osgeo import gdal
+from processing.tools.system import userFolder, mkdir
+
+# Structured report of one GPF graph execution. It records the wall time of the
+# execution phases (graph build, JVM start, processing, write), timestamps of the
+# progress printed by GPT and the size of the outputs. GPT doesn't report timings
+# of individual operators, so when the graph is executed in stages (see GPFStaging)
+# the phases are recorded per stage. The report is saved as JSON in the
+# gpf_reports folder of the user folder, together with a trace in Chrome trace
+# event format which can be opened in chrome://tracing or Perfetto.
+class GPFRunReport:
+
+    MAX_REPORTS = 100
+
+    def __init__(self, name = ""):
+        self.name = name
+        self.created = time.time()
+        self.status = None
+        self.cacheHit = False
+        self.operators = []
+        self.outputFiles = []
+        self.phases = []
+        self.progress = []
+        self.stage = ""
+        self.openPhases = {}
+
+    @staticmethod
+    def reportsFolder():
+        folder = os.path.join(userFolder(), "gpf_reports")
+        mkdir(folder)
+        return folder
+
+    # Operators and outputs of the parsed graph (see GPFUtils.graphElement)
+    def setGraph(self, graph):
+        if graph is None:
+            return
+        self.operators = [(node.attrib.get("id"), node.findtext("operator")) for node in graph.findall("node")]
+        self.outputFiles = [node.findtext("parameters/file") for node in graph.findall("node")
+                            if node.findtext("operator") == "Write" and node.findtext("parameters/file")]
+        if not self.name and self.outputFiles:
+            self.name = os.path.splitext(os.path.basename(self.outputFiles[0]))[0]
+
+    def begin(self, phase):
+        self.openPhases[self.stage + phase] = time.time()
+
+    def end(self, phase):
+        name = self.stage + phase
+        if name in self.openPhases:
+            self.phases.append((name, self.openPhases.pop(name), time.time()))
+
+    def endAll(self):
+        for name in sorted(self.openPhases.keys(), key = lambda name: self.openPhases[name]):
+            self.phases.append((name, self.openPhases.pop(name), time.time()))
+
+    # Called when GPT process is started. Until it starts executing the graph the
+    # JVM is starting, until it reports 100% it is processing and after that it
+    # finishes writing the outputs.
+    def gptStarted(self):
+        self.begin("jvm start")
+
+    def startProcessing(self):
+        if self.stage + "jvm start" in self.openPhases:
+            self.end("jvm start")
+            self.begin("processing")
+
+    def consoleLine(self, line):
+        if "Executing processing graph" in line:
+            self.startProcessing()
+
+    def addProgress(self, percentage):
+        if self.progress and self.progress[-1][1] == percentage:
+            return
+        self.startProcessing()
+        self.progress.append((time.time(), percentage))
+        if percentage >= 100 and self.stage + "processing" in self.openPhases:
+            self.end("processing")
+            self.begin("write")
+
+    def gptFinished(self):
+        for phase in ["jvm start", "processing", "write"]:
+            self.end(phase)
+
+    # Size in bytes and number of pixels (summed over bands) of an output
+    @staticmethod
+    def outputSize(outputFile):
+        base, ext = os.path.splitext(outputFile)
+        paths = [outputFile] if ext else [outputFile + ".dim", outputFile + ".tif"]
+        paths = [path for path in paths if os.path.exists(path)]
+        size = 0
+        pixels = 0
+        for path in paths:
+            size += os.path.getsize(path)
+            if path.endswith(".dim"):
+                dataFolder = os.path.splitext(path)[0] + ".data"
+                for dirpath, _, filenames in os.walk(dataFolder):
+                    for filename in filenames:
+                        size += os.path.getsize(os.path.join(dirpath, filename))
+                rasters = glob.glob(os.path.join(dataFolder, "*.img"))
+            else:
+                rasters = [path]
+            for raster in rasters:
+                dataset = gdal.Open(raster, gdal.GA_ReadOnly)
+                if dataset is not None:
+                    pixels += dataset.RasterXSize * dataset.RasterYSize * dataset.RasterCount
+                dataset = None
+        return size, pixels
+
+    def finish(self, status):
+        self.status = status
+        self.endAll()
+
+    def toDict(self):
+        outputs = []
+        totalPixels = 0
+        for outputFile in self.outputFiles:
+            size, pixels = GPFRunReport.outputSize(outputFile)
+            outputs.append({"file": outputFile, "bytes": size, "pixels": pixels})
+            totalPixels += pixels
+        phases = [{"name": name, "start": start - self.created, "seconds": end - start}
+                  for name, start, end in self.phases]
+        processingTime = sum([end - start for name, start, end in self.phases
+                              if name.endswith("processing") or name.endswith("write")])
+        wallTime = max([end for _, _, end in self.phases] or [self.created]) - self.created
+        return {"name": self.name,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.created)),
+                "status": self.status,
+                "cacheHit": self.cacheHit,
+                "wallTime": wallTime,
+                "nodes": [{"id": nodeId, "operator": operator} for nodeId, operator in self.operators],
+                "phases": phases,
+                "progress": [{"time": timestamp - self.created, "percentage": percentage}
+                             for timestamp, percentage in self.progress],
+                "outputs": outputs,
+                "pixelsPerSecond": totalPixels / processingTime if processingTime > 0 else None}
+
+    # Trace in Chrome trace event format (timestamps in microseconds)
+    def toChromeTrace(self):
+        events = []
+        for name, start, end in self.phases:
+            events.append({"name": name, "cat": "gpf", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": int((start - self.created) * 1e6), "dur": int((end - start) * 1e6)})
+        for timestamp, percentage in self.progress:
+            events.append({"name": "progress", "cat": "gpf", "ph": "C", "pid": 1,
+                           "ts": int((timestamp - self.created) * 1e6), "args": {"percentage": percentage}})
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"name": self.name}}
+
+    # Save the report and the trace. Returns the path of the report.
+    def save(self):
+        folder = GPFRunReport.reportsFolder()
+        baseName = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.created)) + "_" + (self.name or "gpf")
+        baseName = "".join([c if c.isalnum() or c in "-_." else "_" for c in baseName])
+        reportPath = os.path.join(folder, baseName + ".json")
+        with open(reportPath, "w") as reportFile:
+            json.dump(self.toDict(), reportFile, indent = 2)
+        with open(os.path.join(folder, baseName + ".trace.json"), "w") as traceFile:
+            json.dump(self.toChromeTrace(), traceFile)
+        # Keep only the most recent reports
+        reports = sorted(glob.glob(os.path.join(folder, "*.trace.json")))
+        for tracePath in reports[:-GPFRunReport.MAX_REPORTS]:
+            for path in [tracePath, tracePath[:-len(".trace.json")] + ".json"]:
+                if os.path.exists(path):
+                    os.remove(path)
+        return reportPath
@@ -0,0 +1,250 @@
+"""
+***************************************************************************
+    GPFStaging.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import re
+import copy
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from processing.core.ProcessingConfig import ProcessingConfig
+from processing_gpf.GPFUtils import GPFUtils
+
+# Staged execution of long graphs. The graph is cut after memory-heavy operators
+# (set in the provider settings) and every stage is executed by its own GPT
+# process, so that tiles of the operators of earlier stages don't stay in
+# memory. The product of a cut node is handed over to the following stages
+# as BEAM-DIMAP file in the job's working directory.
+class GPFStaging:
+
+    DEFAULT_CUT_OPERATORS = "Terrain-Correction,Terrain-Flattening,SAR-Simulation,Back-Geocoding,Speckle-Filter"
+
+    @staticmethod
+    def isActivated():
+        return ProcessingConfig.getSetting(GPFUtils.GPF_GRAPH_STAGING) == True
+
+    @staticmethod
+    def cutOperators():
+        operators = ProcessingConfig.getSetting(GPFUtils.GPF_STAGING_OPERATORS)
+        if operators is None:
+            operators = GPFStaging.DEFAULT_CUT_OPERATORS
+        return [operator.strip() for operator in operators.split(",") if operator.strip()]
+
+    @staticmethod
+    def sourceIds(node):
+        return [source.attrib.get("refid", source.text or "").strip() for source in node.findall("sources/*")]
+
+    # Node IDs in order in which every node comes after its sources
+    @staticmethod
+    def topologicalOrder(nodes):
+        order = []
+        visited = set()
+
+        def visit(nodeId):
+            if nodeId in visited or nodeId not in nodes:
+                return
+            visited.add(nodeId)
+            for sourceId in GPFStaging.sourceIds(nodes[nodeId]):
+                visit(sourceId)
+            order.append(nodeId)
+
+        for nodeId in nodes:
+            visit(nodeId)
+        return order
+
+    @staticmethod
+    def upstreamIds(nodes, nodeIds, stopIds):
+        upstream = set()
+        toVisit = list(nodeIds)
+        while toVisit:
+            nodeId = toVisit.pop()
+            if nodeId in upstream or nodeId not in nodes:
+                continue
+            upstream.add(nodeId)
+            if nodeId not in stopIds:
+                toVisit += GPFStaging.sourceIds(nodes[nodeId])
+        return upstream
+
+    # Graph of one stage: the nodes needed to compute nodeIds, with products of
+    # earlier stages read from their intermediate files
+    @staticmethod
+    def stageGraph(graph, nodes, nodeIds, intermediates):
+        stage = ET.Element("graph", {"id":"Graph"})
+        version = ET.SubElement(stage, "version")
+        version.text = graph.findtext("version") or "1.0"
+        needed = GPFStaging.upstreamIds(nodes, nodeIds, intermediates)
+        for nodeId in GPFStaging.topologicalOrder(nodes):
+            if nodeId not in needed:
+                continue
+            if nodeId in intermediates:
+                node = ET.SubElement(stage, "node", {"id":nodeId})
+                operator = ET.SubElement(node, "operator")
+                operator.text = "Read"
+                ET.SubElement(node, "sources")
+                parametersNode = ET.SubElement(node, "parameters")
+                parameter = ET.SubElement(parametersNode, "file")
+                parameter.text = intermediates[nodeId]
+            else:
+                stage.append(copy.deepcopy(nodes[nodeId]))
+        return stage
+
+    # Write node of a stage saving the product of nodeId to path
+    @staticmethod
+    def intermediateWriter(stage, nodeId, path):
+        node = ET.SubElement(stage, "node", {"id":nodeId+"_stage"})
+        operator = ET.SubElement(node, "operator")
+        operator.text = "Write"
+        sources = ET.SubElement(node, "sources")
+        ET.SubElement(sources, "sourceProduct", {"refid":nodeId})
+        parametersNode = ET.SubElement(node, "parameters")
+        parameter = ET.SubElement(parametersNode, "file")
+        parameter.text = path
+        parameter = ET.SubElement(parametersNode, "formatName")
+        parameter.text = "BEAM-DIMAP"
+
+    # Split the parsed graph (see GPFUtils.graphElement) into stages. Returns a list of (graph XML,
+    # description) tuples, or None if the graph has no cut points. Intermediate
+    # products are written to workDir.
+    #
+    # No node is computed in more than one stage: Write nodes are executed in the
+    # first stage which computes all their sources, and the products of other
+    # nodes needed by a later stage (except Read nodes) are handed over as 
+    # intermediate files like the products of the cut nodes.
+    @staticmethod
+    def stages(graph, workDir, cutOperators = None):
+        if cutOperators is None:
+            cutOperators = GPFStaging.cutOperators()
+        nodes = dict([(node.attrib["id"], node) for node in graph.findall("node")])
+        order = GPFStaging.topologicalOrder(nodes)
+        writeIds = [nodeId for nodeId in order if nodes[nodeId].findtext("operator") == "Write"]
+
+        # Cut after heavy operators whose products are processed further
+        cutIds = []
+        for nodeId in order:
+            if nodes[nodeId].findtext("operator") not in cutOperators:
+                continue
+            consumers = [node for node in nodes.values() if nodeId in GPFStaging.sourceIds(node)]
+            if any([consumer.findtext("operator") != "Write" for consumer in consumers]):
+                cutIds.append(nodeId)
+        if not cutIds:
+            return None
+
+        # Nodes each stage has to compute: the cut node and the Write nodes whose
+        # sources are all computed in the stage or earlier. The remaining Write 
+        # nodes are executed in the final stage.
+        targets = []
+        remainingWriteIds = list(writeIds)
+        cutsBefore = set()
+        for cutId in cutIds:
+            needed = GPFStaging.upstreamIds(nodes, [cutId], cutsBefore)
+            stageTargets = [cutId]
+            for writeId in list(remainingWriteIds):
+                sources = GPFStaging.upstreamIds(nodes, [writeId], cutsBefore) - set([writeId])
+                if sources <= needed:
+                    stageTargets.append(writeId)
+                    remainingWriteIds.remove(writeId)
+            targets.append(stageTargets)
+            cutsBefore.add(cutId)
+        if remainingWriteIds:
+            targets.append(remainingWriteIds)
+
+        # Products written to intermediate files by each stage, and the stage and 
+        # path of every intermediate product
+        outputs = [[] for _ in targets]
+        intermediates = {}
+        producedIn = {}
+        computedIn = {}
+        for i, stageTargets in enumerate(targets):
+            needed = GPFStaging.upstreamIds(nodes, stageTargets, intermediates)
+            shared = [nodeId for nodeId in order if nodeId in needed and nodeId in computedIn and 
+                      nodeId not in intermediates and nodes[nodeId].findtext("operator") != "Read"]
+            for nodeId in shared:
+                stageIndex = computedIn[nodeId]
+                outputs[stageIndex].append(nodeId)
+                producedIn[nodeId] = stageIndex
+                intermediates[nodeId] = os.path.join(workDir, "stage_%d_%s.dim" % (stageIndex+1, re.sub("[^\w]", "_", nodeId)))
+            if shared:
+                needed = GPFStaging.upstreamIds(nodes, stageTargets, intermediates)
+            for nodeId in needed:
+                if nodeId not in intermediates:
+                    computedIn.setdefault(nodeId, i)
+            if i < len(cutIds):
+                outputs[i].insert(0, cutIds[i])
+                producedIn[cutIds[i]] = i
+                intermediates[cutIds[i]] = os.path.join(workDir, "stage_%d.dim" % (i+1))
+
+        result = []
+        for i, stageTargets in enumerate(targets):
+            available = dict([(nodeId, path) for nodeId, path in intermediates.items() if producedIn[nodeId] < i])
+            stage = GPFStaging.stageGraph(graph, nodes, stageTargets + outputs[i], available)
+            for nodeId in outputs[i]:
+                GPFStaging.intermediateWriter(stage, nodeId, intermediates[nodeId])
+            description = ", ".join([nodeId + " -> " + os.path.basename(intermediates[nodeId]) for nodeId in outputs[i]] + 
+                                    [nodeId for nodeId in stageTargets if nodeId not in outputs[i]])
+            operators = [node.attrib["id"]+" ("+node.findtext("operator")+")" for node in stage.findall("node")]
+            GPFUtils.indentXML(stage)
+            result.append((ET.tostring(stage), ", ".join(operators) + ": " + description))
+        return result
+
+    # Execute the stages one after another, each with its own GPT process.
+    # Returns the exit status of the first failed stage or 0.
+    @staticmethod
+    def executeStages(key, stages, workDir, threads, progress, loglines, memory = None, report = None):
+        plan = ["GPF graph staging plan"]
+        for i, (_, description) in enumerate(stages):
+            plan.append("Stage %d: %s" % (i+1, description))
+        loglines += plan
+        for i, (gpf, _) in enumerate(stages):
+            gpfPath = os.path.join(workDir, "stage_%d.xml" % (i+1))
+            with open(gpfPath, "w") as gpfFile:
+                gpfFile.write(gpf)
+            loglines.append("Executing stage %d of %d" % (i+1, len(stages)))
+            progress.setInfo("Executing stage %d of %d" % (i+1, len(stages)))
+            if report is not None:
+                report.stage = "stage %d " % (i+1)
+            status = GPFUtils.runGpt(key, gpfPath, threads, GPFStageFeedback(progress, i, len(stages)), loglines, memory, report)
+            if status != 0:
+                loglines.append("Stage %d failed" % (i+1))
+                return status
+        return 0
+
+
+# Progress of one stage shown as part of the progress of the whole graph
+class GPFStageFeedback:
+
+    def __init__(self, progress, stage, stageCount):
+        self.progress = progress
+        self.stage = stage
+        self.stageCount = stageCount
+
+    def setPercentage(self, percentage):
+        self.progress.setPercentage(int((self.stage * 100 + percentage) / self.stageCount))
+
+    def __getattr__(self, name):
+        return getattr(self.progress, name)
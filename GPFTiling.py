@@ -0,0 +1,177 @@
+"""
+***************************************************************************
+    GPFTiling.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import math
+from osgeo import gdal, osr
+from processing.core.ProcessingConfig import ProcessingConfig
+from processing.core.GeoAlgorithmExecutionException import GeoAlgorithmExecutionException
+from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFGraph import GPFGraphNode
+
+# Spatial tiling of large-extent GPF jobs. The extent (in geographic coordinates,
+# as xmin, xmax, ymin, ymax tuple) is split into overlapping tiles, a Subset node
+# is injected after every Read node (or Resample node, see tileSubsetSources) of
+# the graph of each tile and the tile outputs
+# are assembled back into a VRT or GeoTIFF. The overlap is cut off again when
+# assembling so that edge effects of neighbourhood operators don't show.
+class GPFTiling:
+
+    # SNAP operators which compute each output pixel from a neighbourhood of
+    # input pixels only, so that tiles with overlap give the same result as the
+    # whole extent. Operators using statistics of the whole product (e.g.
+    # KMeansClusterAnalysis), metadata of the whole product (e.g. Apply-Orbit-File,
+    # Calibration of TOPS bursts) or several products are executed without tiling.
+    TILED_OPERATORS = ["BandMaths", "NdviOp", "BiophysicalOp", "LinearToFromdB", "Speckle-Filter",
+                       "Resample", "Reproject", "Terrain-Correction"]
+
+    # Operators with map projected outputs whatever the geocoding of their inputs.
+    # Other operators keep the geocoding of the input, which has to be map projected
+    # for the tiles to be assembled.
+    PROJECTING_OPERATORS = ["Reproject", "Terrain-Correction"]
+
+    @staticmethod
+    def tileSize():
+        try:
+            return float(ProcessingConfig.getSetting(GPFUtils.GPF_TILE_SIZE))
+        except:
+            return 0.0
+
+    @staticmethod
+    def canTile(key, operator):
+        return key != GPFUtils.beamKey() and operator in GPFTiling.TILED_OPERATORS
+
+    @staticmethod
+    def tileOverlap():
+        try:
+            return float(ProcessingConfig.getSetting(GPFUtils.GPF_TILE_OVERLAP))
+        except:
+            return 0.0
+
+    # Returns a list of (core extent, extent with overlap) tuples
+    @staticmethod
+    def tileExtents(extent, tileSize, overlap):
+        xmin, xmax, ymin, ymax = extent
+        cols = max(1, int(math.ceil((xmax - xmin) / tileSize)))
+        rows = max(1, int(math.ceil((ymax - ymin) / tileSize)))
+        width = (xmax - xmin) / cols
+        height = (ymax - ymin) / rows
+        tiles = []
+        for row in range(rows):
+            for col in range(cols):
+                core = (xmin + col * width, xmin + (col + 1) * width,
+                        ymin + row * height, ymin + (row + 1) * height)
+                withOverlap = (max(xmin, core[0] - overlap), min(xmax, core[1] + overlap),
+                               max(ymin, core[2] - overlap), min(ymax, core[3] + overlap))
+                tiles.append((core, withOverlap))
+        return tiles
+
+    @staticmethod
+    def intersectExtents(extent, other):
+        if other is None:
+            return extent
+        intersection = (max(extent[0], other[0]), min(extent[1], other[1]),
+                        max(extent[2], other[2]), min(extent[3], other[3]))
+        if intersection[0] >= intersection[1] or intersection[2] >= intersection[3]:
+            return None
+        return intersection
+
+    # Nodes after which the tile Subset nodes are inserted: the Read nodes, or the
+    # Resample nodes reading from them. Resample is only needed for multi-size
+    # products (e.g. Sentinel-2 L1C/L2A) and SNAP's Subset rejects those products,
+    # so they are subset only once resampled.
+    @staticmethod
+    def tileSubsetSources(graph):
+        sourceIds = []
+        for readNode in graph.nodes():
+            if readNode.operator != "Read":
+                continue
+            resampleIds = [node.nodeID for node in graph.nodes() 
+                           if node.operator == "Resample" and readNode.nodeID in node.sources.values()]
+            sourceIds += resampleIds or [readNode.nodeID]
+        return sourceIds
+
+    # Insert a Subset node with the given extent after each node returned by
+    # tileSubsetSources and make all the nodes reading from that node read from
+    # the Subset instead
+    @staticmethod
+    def addTileSubset(graph, extent):
+        for sourceId in GPFTiling.tileSubsetSources(graph):
+            subsetNodeId = sourceId + "_tile"
+            graph.replaceSource(sourceId, subsetNodeId)
+            node = graph.addNode(GPFGraphNode(subsetNodeId, "Subset"))
+            node.sources["sourceProduct"] = sourceId
+            node.setParameter("geoRegion", GPFUtils.extentToPolygon(extent))
+            node.setParameter("copyMetadata", "True")
+        return graph
+
+    # Bounding box of the geographic extent in the coordinates of the raster,
+    # as GDAL projWin (ulx, uly, lrx, lry)
+    @staticmethod
+    def projWin(extent, dataset):
+        wgs84 = osr.SpatialReference()
+        wgs84.ImportFromEPSG(4326)
+        target = osr.SpatialReference()
+        target.ImportFromWkt(dataset.GetProjection())
+        if hasattr(osr, "OAMS_TRADITIONAL_GIS_ORDER"):
+            wgs84.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            target.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        transform = osr.CoordinateTransformation(wgs84, target)
+        xs = []
+        ys = []
+        for x in (extent[0], extent[1]):
+            for y in (extent[2], extent[3]):
+                point = transform.TransformPoint(x, y)
+                xs.append(point[0])
+                ys.append(point[1])
+        return [min(xs), max(ys), max(xs), min(ys)]
+
+    # Assemble the tile rasters into outputPath. tiles is a list of (core extent, file)
+    # tuples. If outputPath is a VRT then the tile files have to be kept.
+    @staticmethod
+    def mosaic(tiles, outputPath, workDir):
+        coreFiles = []
+        for i, (core, tileFile) in enumerate(tiles):
+            dataset = gdal.Open(tileFile, gdal.GA_ReadOnly)
+            if dataset is None:
+                raise GeoAlgorithmExecutionException("Could not open tile output " + tileFile)
+            if not dataset.GetProjection():
+                # e.g. SAR geometry with GCPs only
+                dataset = None
+                raise GeoAlgorithmExecutionException("Tile output " + tileFile + " is not map projected and can't be assembled. Set the tile size to 0 to execute without tiling.")
+            coreFile = os.path.join(workDir, "core_%d.vrt" % i)
+            gdal.Translate(coreFile, dataset, format = "VRT", projWin = GPFTiling.projWin(core, dataset))
+            dataset = None
+            coreFiles.append(coreFile)
+        if outputPath.lower().endswith(".vrt"):
+            gdal.BuildVRT(outputPath, coreFiles)
+        else:
+            mosaicFile = os.path.join(workDir, "mosaic.vrt")
+            gdal.BuildVRT(mosaicFile, coreFiles)
+            gdal.Translate(outputPath, mosaicFile, format = "GTiff",
+                           creationOptions = ["TILED=YES", "BIGTIFF=IF_SAFER"])
@@ -30,26 +30,61 @@ import os
 import platform
 import re
 import tempfile
+import shutil
+import glob
+import time
 import subprocess
 import sys
+import imp
 import logging
-from osgeo import gdal
+import threading
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from osgeo import gdal, osr
 from decimal import Decimal 
 from processing.tools.system import userFolder, mkdir
 from processing.core.ProcessingConfig import ProcessingConfig
 from processing.core.ProcessingLog import ProcessingLog
 from processing.core.GeoAlgorithmExecutionException import GeoAlgorithmExecutionException
+from processing_gpf.GPFOutputReader import GPFOutputReader
+from processing_gpf.GPFMetadataCache import GPFMetadataCache
+from processing_gpf.GPFProductReader import GPFProductReader
 
 class GPFUtils:
     
     BEAM_FOLDER = "BEAM_FOLDER"
     BEAM_THREADS = "BEAM_THREADS"
+    BEAM_PARALLEL_JOBS = "BEAM_PARALLEL_JOBS"
     SNAP_FOLDER = "SNAP_FOLDER"
     SNAP_THREADS = "SNAP_THREADS"
     GPF_MODELS_FOLDER = "GPF_MODELS_FOLDER"
     S1TBX_ACTIVATE = "S1TBX_ACTIVATE"
     S2TBX_ACTIVATE = "S2TBX_ACTIVATE"
     S3TBX_ACTIVATE = "S3TBX_ACTIVATE"
+    SNAP_WORKER_ACTIVATE = "SNAP_WORKER_ACTIVATE"
+    SNAP_WORKER_PYTHON = "SNAP_WORKER_PYTHON"
+    SNAP_WARMUP = "SNAP_WARMUP"
+    GPF_PARALLEL_JOBS = "GPF_PARALLEL_JOBS"
+    SNAP_MAX_HEAP = "SNAP_MAX_HEAP"
+    SNAP_TILE_CACHE = "SNAP_TILE_CACHE"
+    SNAP_GC_OPTIONS = "SNAP_GC_OPTIONS"
+    GPF_TILE_SIZE = "GPF_TILE_SIZE"
+    GPF_TILE_OVERLAP = "GPF_TILE_OVERLAP"
+    GPF_CACHE_ACTIVATE = "GPF_CACHE_ACTIVATE"
+    GPF_CACHE_SIZE = "GPF_CACHE_SIZE"
+    GPF_GRAPH_STAGING = "GPF_GRAPH_STAGING"
+    GPF_STAGING_OPERATORS = "GPF_STAGING_OPERATORS"
+    GPF_GRAPH_OPTIMIZE = "GPF_GRAPH_OPTIMIZE"
+    GPF_SUBSET_MARGIN = "GPF_SUBSET_MARGIN"
+    
+    # Snappy is used from the GUI thread and from the metadata prefetcher thread
+    snappyLock = threading.RLock()
+    loggingLock = threading.Lock()
+    loggingDisabled = 0
+    # Imported snappy and jpy modules (see importSnappy)
+    _snappyModules = None
     
     @staticmethod
     def beamKey():
@@ -98,6 +133,16 @@ class GPFUtils:
             folder = ""
         return folder
     
+    # BEAM install directory contains the GPT launcher
+    @staticmethod
+    def beamInstalled():
+        folder = GPFUtils.programPath(GPFUtils.beamKey())
+        if platform.system() == "Windows":
+            batchFile = "gpt.bat"
+        else:
+            batchFile = "gpt.sh"
+        return folder != "" and os.path.isfile(os.path.join(folder, "bin", batchFile))
+    
     @staticmethod
     def gpfDescriptionPath(key):
         if key == GPFUtils.beamKey():
@@ -138,7 +183,98 @@ class GPFUtils:
         return os.path.abspath(folder)       
     
     @staticmethod
-    def executeGpf(key, gpf, progress):
+    def gptThreads(key):
+        if key == GPFUtils.beamKey():
+            setting = GPFUtils.BEAM_THREADS
+        else:
+            setting = GPFUtils.SNAP_THREADS
+        try:
+            threads = int(float(ProcessingConfig.getSetting(setting)))
+        except:
+            threads = 4
+        return threads
+
+    # Persistent GPT worker (see GPFWorker) shared by all SNAP executions. Jobs
+    # of GPFJobQueue run in several threads so it's created under a lock,
+    # otherwise two of them could each start a worker JVM.
+    _gptWorker = None
+    gptWorkerLock = threading.Lock()
+
+    @staticmethod
+    def gptWorkerActivated():
+        return ProcessingConfig.getSetting(GPFUtils.SNAP_WORKER_ACTIVATE) == True
+
+    @staticmethod
+    def gptWorker():
+        with GPFUtils.gptWorkerLock:
+            if GPFUtils._gptWorker is None:
+                from processing_gpf.GPFWorker import GPFWorker
+                python = ProcessingConfig.getSetting(GPFUtils.SNAP_WORKER_PYTHON) or "python"
+                GPFUtils._gptWorker = GPFWorker([python, "-u", GPFWorker.workerScript()])
+            return GPFUtils._gptWorker
+
+    @staticmethod
+    def stopGptWorker():
+        with GPFUtils.gptWorkerLock:
+            if GPFUtils._gptWorker is not None:
+                GPFUtils._gptWorker.stop()
+                GPFUtils._gptWorker = None
+
+    # Resident listBeamBands helper (see BEAMBandLister) shared by all band lookups
+    _beamBandLister = None
+
+    @staticmethod
+    def beamBandsFolder():
+        return os.path.join(os.path.dirname(__file__), "processing_beam_java")
+
+    # Command starting listBeamBands with the given arguments
+    @staticmethod
+    def beamBandsCommand(programKey, args):
+        folder = GPFUtils.beamBandsFolder()
+        if platform.system() == "Windows":
+            launcher = [os.path.join(folder, "listBeamBands.bat")]
+        else:
+            launcher = ["sh", os.path.join(folder, "listBeamBands.sh")]
+        return launcher + [GPFUtils.programPath(programKey)+os.sep] + args
+
+    @staticmethod
+    def beamBandLister(programKey):
+        from processing_gpf.BEAMBandLister import BEAMBandLister
+        command = GPFUtils.beamBandsCommand(programKey, ["-server", BEAMBandLister.BAND_DELIM])
+        # Restart the helper if BEAM install directory was changed
+        if GPFUtils._beamBandLister is not None and GPFUtils._beamBandLister.command != command:
+            GPFUtils.stopBeamBandLister()
+        if GPFUtils._beamBandLister is None:
+            GPFUtils._beamBandLister = BEAMBandLister(command, os.path.join(GPFUtils.beamBandsFolder(), "listBeamBands.class"))
+        return GPFUtils._beamBandLister
+
+    @staticmethod
+    def stopBeamBandLister():
+        if GPFUtils._beamBandLister is not None:
+            GPFUtils._beamBandLister.stop()
+            GPFUtils._beamBandLister = None
+
+    # Execute the GPF graph with GPT. Each execution gets its own private working
+    # directory so that several graphs can be executed at the same time (see GPFJobQueue).
+    # Returns the exit status of GPT (0 on success). Timings of the execution are 
+    # recorded in report (see GPFRunReport) which is saved at the end.
+    #
+    # parallelJobs is the number of executions the caller (e.g. GPFJobQueue) may
+    # run at the same time, which together with the GPT executions already running
+    # sets the share of the memory this execution gets (see jvmMemory).
+    #
+    # gpf is the graph as GPF XML or as GPFGraph. It is parsed (or serialized)
+    # only once here and the parsed graph is shared by the run report, the 
+    # result cache and the staging.
+    @staticmethod
+    def executeGpf(key, gpf, progress, threads = None, memory = None, useCache = True, report = None, parallelJobs = 1):
+        from processing_gpf.GPFRunReport import GPFRunReport
+        graph = GPFUtils.graphElement(gpf)
+        if not isinstance(gpf, basestring):
+            gpf = ET.tostring(graph)
+        if report is None:
+            report = GPFRunReport()
+        report.setGraph(graph)
         loglines = []
         if key == GPFUtils.beamKey():
             loglines.append("BEAM execution console output")
@@ -148,59 +284,306 @@ class GPFUtils:
             ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Unknown GPF algorithm provider")
             return    
         
-        # save gpf to temporary file
-        gpfFile = open(tempfile.gettempdir() + os.sep + "gpf.xml", 'w')
-        gpfFile.write(gpf)
-        gpfPath = gpfFile.name
-        gpfFile.close()  
-        
+        # reuse the outputs of an identical earlier execution if possible
+        cacheKey = None
+        if useCache:
+            from processing_gpf.GPFResultCache import GPFResultCache
+            if GPFResultCache.isActivated():
+                writes = GPFResultCache.graphWrites(graph)
+                cacheKey = GPFResultCache.graphKey(writes)
+                if cacheKey and GPFResultCache.restore(cacheKey, writes, loglines):
+                    report.cacheHit = True
+                    report.finish(0)
+                    try:
+                        loglines.append("Run report: " + report.save())
+                    except Exception, e:
+                        loglines.append("Could not save run report: " + str(e))
+                    ProcessingLog.addToLog(ProcessingLog.LOG_INFO, loglines)
+                    progress.setPercentage(100)
+                    return 0
         
-        # execute the gpf
-        if key == GPFUtils.beamKey():
-            # check if running on windows or other OS
-            if platform.system() == "Windows":
-                batchFile = "gpt.bat"
-            else:
-                batchFile = "gpt.sh"
+        # save gpf to a file in the job's working directory
+        jobDir = tempfile.mkdtemp(prefix="gpf_")
+        status = None
+        try:
+            gpfPath = os.path.join(jobDir, "gpf.xml")
+            gpfFile = open(gpfPath, 'w')
+            gpfFile.write(gpf)
+            gpfFile.close()
+            
+            if threads is None:
+                threads = GPFUtils.gptThreads(key)
+            runningJobs = GPFUtils.startedGpt()
             try:
-                threads = int(float(ProcessingConfig.getSetting(GPFUtils.BEAM_THREADS)))
-            except:
-                threads = 4
-            command = ''.join(["\"", GPFUtils.programPath(key), os.sep, "bin", os.sep, batchFile, "\" \"", gpfPath, "\" -e", " -q ",str(threads)])
-        elif key == GPFUtils.snapKey():
-            # check if running on windows or other OS
-            batchFile = os.path.join("bin", "gpt")
+                if key == GPFUtils.snapKey():
+                    memory = GPFUtils.jvmMemory(max(parallelJobs, runningJobs), memory)
+                else:
+                    memory = None
+                # split long graphs into stages executed one after another
+                from processing_gpf.GPFStaging import GPFStaging
+                stages = GPFStaging.stages(graph, jobDir) if graph is not None and GPFStaging.isActivated() else None
+                if stages:
+                    status = GPFStaging.executeStages(key, stages, jobDir, threads, progress, loglines, memory, report)
+                else:
+                    status = GPFUtils.runGpt(key, gpfPath, threads, progress, loglines, memory, report)
+            finally:
+                GPFUtils.finishedGpt()
+            if cacheKey and status == 0:
+                GPFResultCache.store(cacheKey, writes)
+        finally:
+            report.finish(status)
             try:
-                threads = int(float(ProcessingConfig.getSetting(GPFUtils.SNAP_THREADS)))
-            except:
-                threads = 4
-            command = ''.join(["\"", GPFUtils.programPath(key), os.sep, batchFile, "\" \"", gpfPath, "\" -e", " -q ",str(threads)])      
-        loglines.append(command)
-        proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True).stdout
-        line =""
-        for char in iter((lambda:proc.read(1)),''):
-            line += char
-            if "\n" in line:
-                loglines.append(line)
-                progress.setConsoleInfo(line)
-                # force refresh of the execution dialog 
-                try:
-                    progress.repaint()
-                except:
-                    pass
-                line = ""
-            # show progress during S1 Toolbox executions    
-            m = re.search("\.(\d{2,3})\%$", line)
-            if m:
-                progress.setPercentage(int(m.group(1)))
-                # force refresh of the execution dialog
-                try:
-                    progress.repaint()
-                except:
-                    pass
+                loglines.append("Run report: " + report.save())
+            except Exception, e:
+                loglines.append("Could not save run report: " + str(e))
+            ProcessingLog.addToLog(ProcessingLog.LOG_INFO, loglines)
+            shutil.rmtree(jobDir, ignore_errors = True)
                 
         progress.setPercentage(100)
-        ProcessingLog.addToLog(ProcessingLog.LOG_INFO, loglines)
+        return status
+    
+    # Parsed GPF graph (an ElementTree element) of a graph given as GPF XML or
+    # as GPFGraph, or None if the XML can't be parsed
+    @staticmethod
+    def graphElement(gpf):
+        if not isinstance(gpf, basestring):
+            return gpf.toElement()
+        try:
+            return ET.fromstring(gpf)
+        except Exception:
+            return None
+
+    @staticmethod
+    def runGpt(key, gpfPath, threads, progress, loglines, memory = None, report = None):
+        memory = memory or {}
+        if key == GPFUtils.snapKey() and GPFUtils.gptWorkerActivated():
+            loglines.append("Executing with persistent GPT worker: " + gpfPath)
+            # Heap size of the worker is set in snappy configuration (jvm_maxmem) 
+            # when it starts and can't be changed per job
+            loglines.append("Memory options: tile cache = %s MB, heap and GC options from snappy configuration" % 
+                            (memory.get("tileCache") or "default"))
+            status = GPFUtils.gptWorker().execute(gpfPath, threads, progress, loglines, memory.get("tileCache"), report)
+            if status != 0:
+                ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "GPT worker failed to execute the graph: " + gpfPath)
+                raise GeoAlgorithmExecutionException("GPT worker failed to execute the graph (exit status %s). See Processing log for more details." % status)
+            return status
+        else:
+            if key == GPFUtils.beamKey():
+                # check if running on windows or other OS
+                if platform.system() == "Windows":
+                    batchFile = "gpt.bat"
+                else:
+                    batchFile = "gpt.sh"
+                command = ''.join(["\"", GPFUtils.programPath(key), os.sep, "bin", os.sep, batchFile, "\" \"", gpfPath, "\" -e", " -q ",str(threads)])
+            else:
+                batchFile = os.path.join("bin", "gpt")
+                command = ''.join(["\"", GPFUtils.programPath(key), os.sep, batchFile, "\" \"", gpfPath, "\" -e", " -q ",str(threads)])      
+                command += GPFUtils.jvmMemoryArguments(memory)
+                loglines.append("Memory options: heap = %s MB, tile cache = %s MB, GC options = %s" % 
+                                (memory.get("heap") or "default", memory.get("tileCache") or "default", memory.get("gcOptions") or "default"))
+            loglines.append(command)
+            if report is not None:
+                report.gptStarted()
+            proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+            GPFOutputReader(proc.stdout, progress, loglines, report).readUntil()
+            status = proc.wait()
+            if report is not None:
+                report.gptFinished()
+            return status
+    
+    # Total physical memory of the host in MB, or None if it can't be determined
+    @staticmethod
+    def physicalMemory():
+        try:
+            if platform.system() == "Windows":
+                import ctypes
+                class MEMORYSTATUSEX(ctypes.Structure):
+                    _fields_ = [("dwLength", ctypes.c_ulong),
+                                ("dwMemoryLoad", ctypes.c_ulong),
+                                ("ullTotalPhys", ctypes.c_ulonglong),
+                                ("ullAvailPhys", ctypes.c_ulonglong),
+                                ("ullTotalPageFile", ctypes.c_ulonglong),
+                                ("ullAvailPageFile", ctypes.c_ulonglong),
+                                ("ullTotalVirtual", ctypes.c_ulonglong),
+                                ("ullAvailVirtual", ctypes.c_ulonglong),
+                                ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+                status = MEMORYSTATUSEX()
+                status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+                ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+                total = status.ullTotalPhys
+            elif platform.system() == "Darwin":
+                total = int(subprocess.check_output(["sysctl", "-n", "hw.memsize"]).strip())
+            else:
+                total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+            return int(total // (1024 * 1024))
+        except Exception:
+            return None
+    
+    @staticmethod
+    def _memorySetting(name):
+        try:
+            return int(float(ProcessingConfig.getSetting(name)))
+        except:
+            return 0
+    
+    # Number of GPT executions running in this process, see executeGpf
+    _runningGpt = 0
+    _runningGptLock = threading.Lock()
+
+    # Register the start of a GPT execution. Returns the number of executions
+    # running, including this one.
+    @staticmethod
+    def startedGpt():
+        with GPFUtils._runningGptLock:
+            GPFUtils._runningGpt += 1
+            return GPFUtils._runningGpt
+
+    @staticmethod
+    def finishedGpt():
+        with GPFUtils._runningGptLock:
+            GPFUtils._runningGpt -= 1
+
+    # Heap size (in MB) below which GPT executions are not run in parallel
+    MIN_PARALLEL_HEAP = 1024
+
+    # Maximum number of parallel GPT executions for which 75% of the host's physical
+    # memory gives each at least MIN_PARALLEL_HEAP of heap. None if the heap size
+    # is set in the provider settings or the physical memory can't be determined.
+    @staticmethod
+    def memoryParallelJobs():
+        if GPFUtils._memorySetting(GPFUtils.SNAP_MAX_HEAP):
+            return None
+        physical = GPFUtils.physicalMemory()
+        if not physical:
+            return None
+        return max(1, int(physical * 0.75 // GPFUtils.MIN_PARALLEL_HEAP))
+
+    # JVM heap size and tile cache size (in MB) and GC options for one GPT execution.
+    # Values which are not set in the memory dictionary (per-job override) or in the
+    # provider settings are computed from the host's physical memory, so that
+    # parallelJobs simultaneous executions fit in 75% of it (callers limit
+    # parallelJobs with memoryParallelJobs). The tile cache then takes half of the heap.
+    @staticmethod
+    def jvmMemory(parallelJobs = 1, memory = None):
+        memory = dict(memory or {})
+        if not memory.get("heap"):
+            memory["heap"] = GPFUtils._memorySetting(GPFUtils.SNAP_MAX_HEAP)
+        if not memory.get("heap"):
+            physical = GPFUtils.physicalMemory()
+            if physical:
+                memory["heap"] = int(physical * 0.75 / max(parallelJobs, 1))
+        if not memory.get("tileCache"):
+            memory["tileCache"] = GPFUtils._memorySetting(GPFUtils.SNAP_TILE_CACHE)
+        if not memory.get("tileCache") and memory.get("heap"):
+            memory["tileCache"] = int(memory["heap"] * 0.5)
+        if not memory.get("gcOptions"):
+            memory["gcOptions"] = ProcessingConfig.getSetting(GPFUtils.SNAP_GC_OPTIONS) or ""
+        return memory
+    
+    # SNAP gpt command line arguments setting the memory options. JVM options
+    # are passed with -J prefix.
+    @staticmethod
+    def jvmMemoryArguments(memory):
+        arguments = ""
+        if memory.get("tileCache"):
+            arguments += " -c " + str(memory["tileCache"]) + "M"
+        if memory.get("heap"):
+            arguments += " -J-Xmx" + str(memory["heap"]) + "M"
+        for option in (memory.get("gcOptions") or "").split():
+            arguments += " -J" + option
+        return arguments
+    
+    # Each provider has its own setting of the number of parallel GPT executions,
+    # as of the threads (see gptThreads)
+    @staticmethod
+    def maxParallelJobs(key = None):
+        if key == GPFUtils.beamKey():
+            setting = GPFUtils.BEAM_PARALLEL_JOBS
+        else:
+            setting = GPFUtils.GPF_PARALLEL_JOBS
+        try:
+            jobs = int(float(ProcessingConfig.getSetting(setting)))
+        except:
+            jobs = 2
+        return max(jobs, 1)
+    
+    # Expand a list (or a single string) of input paths and glob patterns used in batch
+    # processing into a sorted list of paths
+    @staticmethod
+    def expandBatchInputs(inputs):
+        if isinstance(inputs, basestring):
+            inputs = [inputs]
+        paths = []
+        for pattern in inputs:
+            matches = sorted(glob.glob(pattern))
+            if not matches and os.path.exists(pattern):
+                matches = [pattern]
+            for path in matches:
+                if path not in paths:
+                    paths.append(path)
+        if not paths:
+            raise GeoAlgorithmExecutionException("No input products found for batch processing")
+        return paths
+    
+    # Name the batch output of the given input product. The pattern can contain
+    # {name} (input product name without extension), {dir} (input product directory),
+    # {index} (position of the input in the batch) and {output} (output name) fields,
+    # e.g. "/data/out/{name}_TC.tif".
+    @staticmethod
+    def batchOutputPath(pattern, inputPath, index, outputName):
+        if not ("{name}" in pattern or "{index}" in pattern):
+            raise GeoAlgorithmExecutionException("Batch output pattern must contain {name} or {index}")
+        inputPath = os.path.normpath(inputPath)
+        name = os.path.basename(inputPath)
+        # Sentinel-1 products are often given as manifest.safe in .SAFE directory
+        if name.lower() == "manifest.safe":
+            inputPath = os.path.dirname(inputPath)
+            name = os.path.basename(inputPath)
+        name = os.path.splitext(name)[0]
+        return pattern.format(name = name, dir = os.path.dirname(inputPath), index = index,
+                              output = re.sub("[^\w]", "", outputName))
+    
+    # Execute a list of (name, gpf) tuples, gpf as in executeGpf, with up to parallelJobs GPT processes
+    # running at once. The SNAP_THREADS/BEAM_THREADS budget and the memory (see
+    # jvmMemory) is split between the parallel processes. Unless the heap size is
+    # given, no more processes run at once than the memory allows (see 
+    # memoryParallelJobs).
+    @staticmethod
+    def executeGpfBatch(key, graphs, progress, parallelJobs = None, memory = None):
+        from processing_gpf.GPFJobQueue import GPFJobQueue
+        if parallelJobs is None:
+            parallelJobs = GPFUtils.maxParallelJobs(key)
+        parallelJobs = max(1, min(parallelJobs, len(graphs)))
+        memoryJobs = GPFUtils.memoryParallelJobs()
+        if key == GPFUtils.snapKey() and memoryJobs is not None and not (memory and memory.get("heap")):
+            parallelJobs = min(parallelJobs, memoryJobs)
+        threads = max(1, GPFUtils.gptThreads(key) // parallelJobs)
+        if key == GPFUtils.snapKey():
+            memory = GPFUtils.jvmMemory(parallelJobs, memory)
+        progress.setInfo("Batch processing %d products with %d parallel jobs of %d threads" % (len(graphs), parallelJobs, threads))
+        
+        queue = GPFJobQueue(parallelJobs, key)
+        jobs = [queue.submit(key, gpf, name = name, threads = threads, memory = memory) for name, gpf in graphs]
+        
+        # Background jobs can't update the dialog so poll them from this thread
+        reported = set()
+        while len(reported) < len(jobs):
+            time.sleep(0.5)
+            percentage = 0
+            for job in jobs:
+                percentage += job.progress.getPercentage()
+                if job.isFinished() and job not in reported:
+                    reported.add(job)
+                    if job.error is None:
+                        progress.setInfo("Finished: " + job.name)
+                    else:
+                        progress.setInfo("Failed: " + job.name + " (" + str(job.error) + ")")
+            progress.setPercentage(percentage // len(jobs))
+        
+        failed = GPFJobQueue.waitAll(jobs)
+        if failed:
+            raise GeoAlgorithmExecutionException("Batch processing failed for %d of %d products: %s" % 
+                                                 (len(failed), len(jobs), ", ".join([job.name for job in failed])))
     
     # Get the bands names by calling a java program that uses BEAM functionality 
     @staticmethod
@@ -212,42 +595,231 @@ class GPFUtils:
         else:
             filename = str(filename)    # in case it's a QString
         if programKey == GPFUtils.beamKey():
+            cacheKind = "beamBands:" + str(appendProductName)
+            cachedBands = GPFMetadataCache.lookup(filename, cacheKind)
+            if cachedBands is not None:
+                return cachedBands
+            productMetadata = GPFProductReader.read(filename)
+            if productMetadata is not None and productMetadata["bands"] and "bands" not in productMetadata["partial"]:
+                bands = productMetadata["bands"]
+                if appendProductName:
+                    # Products without a dataset name are named after the file, as in BEAM
+                    productName = productMetadata["productName"] or os.path.splitext(os.path.basename(filename))[0]
+                    bands = [band+"::"+productName for band in bands]
+                GPFMetadataCache.store(filename, cacheKind, bands)
+                return bands
             if not os.path.exists(os.path.join(os.path.dirname(__file__), "processing_beam_java", "listBeamBands.class")):
                 bands = ['Missing Java class file', 'See '+os.path.join(os.path.dirname(__file__), "processing_beam_java", "README.txt")+' for more details']
             else:
-                command = "\""+os.path.dirname(__file__)+os.sep+"processing_beam_java"+os.sep+"listBeamBands.bat\" "+"\""+GPFUtils.programPath(programKey)+os.sep+"\" "+"\""+filename+"\" "+bandDelim+" "+str(appendProductName)
-                proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True).stdout
-                for line in iter(proc.readline, ""):
-                    if bandDelim in line:
-                        line = line[len(bandDelim):].strip()
-                        #if appendFilename:
-                        #    line +="::"+os.path.basename(filename)
-                        bands.append(line)
+                bands = GPFUtils.beamBandLister(programKey).listBands(filename, appendProductName)
+                if bands is None:
+                    # Helper can't run in server mode so start it just for this product
+                    bands = []
+                    command = GPFUtils.beamBandsCommand(programKey, [filename, bandDelim, str(appendProductName)])
+                    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True).stdout
+                    for line in iter(proc.readline, ""):
+                        if bandDelim in line:
+                            line = line[len(bandDelim):].strip()
+                            bands.append(line)
+                if bands:
+                    GPFMetadataCache.store(filename, cacheKind, bands)
         elif programKey == GPFUtils.snapKey():
             bands = GPFUtils.getSnapBandNames(filename)
         return bands
     
-    # Import snappy which should be located in the user's home directory
+    # Import snappy which should be located in the user's home directory.
+    # The modules are imported (and the JVM started) only once, so later
+    # calls, e.g. after warmUpSnappy, return them straight away.
     @staticmethod
     def importSnappy():
-        snappyPath = os.path.join(os.path.expanduser("~"), ".snap", "snap-python")
-        if not snappyPath in sys.path:
-            sys.path.append(snappyPath)
+        # Temporarily disable logging because otherwise
+        # snappy throws an IO error. The caller has to 
+        # call enableLogging() when done with snappy.
+        GPFUtils.disableLogging()
         
-        try:
-            # Temporarily disable logging because otherwise
-            # snappy throws an IO error.
-            logging.disable(logging.INFO)
+        with GPFUtils.snappyLock:
+            if GPFUtils._snappyModules is not None:
+                return GPFUtils._snappyModules
+            
+            snappyPath = os.path.join(os.path.expanduser("~"), ".snap", "snap-python")
+            if not snappyPath in sys.path:
+                sys.path.append(snappyPath)
             
-            import snappy
-            import jpy
-            return snappy, jpy
+            try:
+                snappy = GPFUtils.loadSnappyModule()
+                import jpy
+                GPFUtils._snappyModules = (snappy, jpy)
+                return GPFUtils._snappyModules
+            except:
+                ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, 'Python module snappy is not installed in the user directory. Please run SNAP installer')
+                return None, None
+    
+    # Importing snappy starts the JVM, which takes several seconds. An import 
+    # statement would hold Python's global import lock all that time so that 
+    # any import in another thread (e.g. the GUI thread) would block until the 
+    # JVM is up. imp.load_module runs the module without taking the import lock.
+    @staticmethod
+    def loadSnappyModule():
+        if "snappy" in sys.modules:
+            return sys.modules["snappy"]
+        moduleFile, pathname, description = imp.find_module("snappy")
+        try:
+            return imp.load_module("snappy", moduleFile, pathname, description)
         except:
-            ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, 'Python module snappy is not installed in the user directory. Please run SNAP installer')
-            return None, None
+            sys.modules.pop("snappy", None)
+            raise
+        finally:
+            if moduleFile is not None:
+                moduleFile.close()
+    
+    @staticmethod
+    def snappyWarmUpActivated():
+        return ProcessingConfig.getSetting(GPFUtils.SNAP_WARMUP) == True
+    
+    # Import snappy, which starts the JVM, in a background thread so that the
+    # first parameter panel using it doesn't have to wait for it. Imports in the
+    # GUI thread are not blocked meanwhile (see loadSnappyModule).
+    @staticmethod
+    def warmUpSnappy():
+        def warmUp():
+            start = time.time()
+            snappy, jpy = GPFUtils.importSnappy()
+            GPFUtils.enableLogging()
+            if snappy is not None:
+                ProcessingLog.addToLog(ProcessingLog.LOG_INFO, "Snappy started in background in %.1f s" % (time.time() - start))
+        thread = threading.Thread(target = warmUp, name = "snappy warm-up")
+        thread.daemon = True
+        thread.start()
+        return thread
+    
+    # Logging is disabled while snappy is used by any thread and enabled again
+    # once the last thread is done with it
+    @staticmethod
+    def disableLogging():
+        with GPFUtils.loggingLock:
+            if GPFUtils.loggingDisabled == 0:
+                logging.disable(logging.INFO)
+            GPFUtils.loggingDisabled += 1
+    
+    @staticmethod
+    def enableLogging():
+        with GPFUtils.loggingLock:
+            GPFUtils.loggingDisabled = max(GPFUtils.loggingDisabled - 1, 0)
+            if GPFUtils.loggingDisabled == 0:
+                logging.disable(logging.NOTSET)
+    
+    # Open the product with snappy once and read all the metadata used by the
+    # parameter panels (same keys as GPFProductReader.read plus geoCoding). The 
+    # product is disposed straight away to release the JVM memory and file handles.
+    # If the product can't be read then the "error" key holds the message to show.
+    @staticmethod
+    def probeProduct(productPath, secondAttempt = False):
+        with GPFUtils.snappyLock:
+            return GPFUtils.probeProductLocked(productPath, secondAttempt)
+    
+    @staticmethod
+    def probeProductLocked(productPath, secondAttempt):
+        metadata = GPFProductReader.emptyMetadata()
+        metadata["probed"] = True
+        metadata["geoCoding"] = None
+        
+        snappy, jpy = GPFUtils.importSnappy()
+        if snappy is None:
+            GPFUtils.enableLogging()
+            metadata["error"] = ['Python module snappy is not installed in the user directory', 'Please run SNAP installer']
+            return metadata
+        
+        product = None
+        try:
+            product = snappy.ProductIO.readProduct(productPath)
+            metadata["productName"] = product.getName()
+            metadata["bands"] = [band.getName() for band in product.getBands()]
+            metadata["width"] = product.getSceneRasterWidth()
+            metadata["height"] = product.getSceneRasterHeight()
+            
+            abstracted = jpy.get_type('org.esa.snap.engine_utilities.datamodel.AbstractMetadata').getAbstractedMetadata(product)
+            if abstracted is not None:
+                range_spacing = abstracted.getAttribute("range_spacing")
+                azimuth_spacing = abstracted.getAttribute("azimuth_spacing")
+                if range_spacing and azimuth_spacing:
+                    metadata["pixelSpacing"] = {"range_spacing": (range_spacing.getData().getElemDouble(), range_spacing.getUnit()),
+                                                "azimuth_spacing": (azimuth_spacing.getData().getElemDouble(), azimuth_spacing.getUnit())}
+                try:
+                    polarisations = jpy.get_type('org.esa.s1tbx.insar.gpf.support.Sentinel1Utils').getProductPolarizations(abstracted)
+                    metadata["polarisations"] = [str(polarisation) for polarisation in polarisations]
+                except Exception:
+                    # Not a SAR product or S1 Toolbox is not installed
+                    metadata["polarisations"] = []
+            
+            metadata["geoCoding"] = GPFUtils.geoCodingSummary(snappy, product, metadata["width"], metadata["height"])
+        except Exception, e:
+            # Snappy sometimes throws an error on first try but reads the product 
+            # on second try
+            if product is not None:
+                product.dispose()
+                product = None
+            if not secondAttempt:
+                return GPFUtils.probeProductLocked(productPath, True)
+            metadata["error"] = ['Snappy exception', 'See Processing log for more details']
+            ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Snappy exception: "+str(e))
+        finally:
+            if product is not None:
+                product.dispose()
+            GPFUtils.enableLogging()
+        return metadata
+    
+    # Type, CRS and extent of the geo-coding of a product opened with snappy, or 
+    # None if it has none. Some geo-codings (e.g. of products in satellite 
+    # geometry) have no usable map CRS or fail to compute the corner positions.
+    # Such failures leave out only this summary, the rest of the metadata such
+    # as the bands is still returned by probeProduct.
+    @staticmethod
+    def geoCodingSummary(snappy, product, width, height):
+        try:
+            geoCoding = product.getSceneGeoCoding()
+            if geoCoding is None:
+                return None
+            summary = {"type": geoCoding.getClass().getSimpleName(), "crs": None, "extent": None}
+            try:
+                summary["crs"] = geoCoding.getMapCRS().getName().toString()
+            except Exception, e:
+                ProcessingLog.addToLog(ProcessingLog.LOG_WARNING, "Could not read the CRS of "+product.getName()+": "+str(e))
+            lons = []
+            lats = []
+            for x, y in [(0.5, 0.5), (width-0.5, 0.5), (0.5, height-0.5), (width-0.5, height-0.5)]:
+                geoPos = geoCoding.getGeoPos(snappy.PixelPos(x, y), None)
+                lons.append(geoPos.lon)
+                lats.append(geoPos.lat)
+            summary["extent"] = (min(lons), max(lons), min(lats), max(lats))
+            return summary
+        except Exception, e:
+            ProcessingLog.addToLog(ProcessingLog.LOG_WARNING, "Could not read the geo-coding of "+product.getName()+": "+str(e))
+            return None
+
+    # Metadata of the product needed to show the given field (see probeProduct).
+    # It is read from the product header if possible (see GPFProductReader) and
+    # otherwise, or if the header lists only part of the field, by probing the
+    # product with snappy. Results are cached (see GPFMetadataCache).
+    @staticmethod
+    def productMetadata(productPath, field):
+        productPath, _ = GPFUtils.gdalPathToSnapPath(productPath)
+        if productPath == "":
+            return None
+        def complete(metadata):
+            return metadata.get(field) and field not in metadata.get("partial", [])
+        metadata = GPFMetadataCache.lookup(productPath, "product")
+        if metadata is not None and (complete(metadata) or metadata.get("probed")):
+            return metadata
+        if metadata is None:
+            metadata = GPFProductReader.read(productPath)
+        if metadata is None or not complete(metadata):
+            metadata = GPFUtils.probeProduct(productPath)
+        if not metadata.get("error"):
+            GPFMetadataCache.store(productPath, "product", metadata)
+        return metadata
     
     # Special functionality for S1 Toolbox terrain-correction
-    # Get the SAR image pixel sizes by using snappy functionality  
+    # Get the SAR image pixel sizes from the product metadata  
     @staticmethod
     def getS1TbxPixelSize(filename, programKey):
         
@@ -261,91 +833,41 @@ class GPFUtils:
         if filename == None:
             return pixelSpacingDict
         
-        snappy, jpy = GPFUtils.importSnappy()
-        if snappy is not None:
-            
-            def setSpacing(spacingName, spacingUnit, spacingData, spacingDict):
-                spacingDict[spacingName+" ("+spacingUnit+")"] = spacingData
-                if spacingUnit == "m":
-                    spacingDict[spacingName+" (deg)"] = str(Decimal(spacingData)/METERSPERDEGREE)
-                elif spacingUnit == "deg":
-                    spacingDict[spacingName+" (m)"] = str(Decimal(spacingData)*METERSPERDEGREE)
-                return spacingDict
-                    
-            product = snappy.ProductIO.readProduct(filename)
-            metadata = jpy.get_type('org.esa.snap.engine_utilities.datamodel.AbstractMetadata').getAbstractedMetadata(product)
-            range_spacing = metadata.getAttribute("range_spacing");
-            azimuth_spacing = metadata.getAttribute("azimuth_spacing")
-            if range_spacing and azimuth_spacing:
-                pixelSpacingDict = setSpacing("Range spacing", range_spacing.getUnit(), range_spacing.getData().getElemDouble(), pixelSpacingDict)
-                pixelSpacingDict = setSpacing("Azimuth spacing", azimuth_spacing.getUnit(), azimuth_spacing.getData().getElemDouble(), pixelSpacingDict)
+        def setSpacing(spacingName, spacingUnit, spacingData, spacingDict):
+            spacingDict[spacingName+" ("+spacingUnit+")"] = spacingData
+            if spacingUnit == "m":
+                spacingDict[spacingName+" (deg)"] = str(Decimal(spacingData)/METERSPERDEGREE)
+            elif spacingUnit == "deg":
+                spacingDict[spacingName+" (m)"] = str(Decimal(spacingData)*METERSPERDEGREE)
+            return spacingDict
         
-        else:
-            pixelSpacingDict['!'] = 'Python module snappy is not installed in the user directory. Please run SNAP installer'
-        
-        logging.disable(logging.NOTSET)
+        metadata = GPFUtils.productMetadata(filename, "pixelSpacing")
+        if metadata is None:
+            return pixelSpacingDict
+        if metadata.get("error"):
+            pixelSpacingDict['!'] = '. '.join(metadata["error"])
+        elif metadata["pixelSpacing"]:
+            rangeSpacing, rangeUnit = metadata["pixelSpacing"]["range_spacing"]
+            azimuthSpacing, azimuthUnit = metadata["pixelSpacing"]["azimuth_spacing"]
+            pixelSpacingDict = setSpacing("Range spacing", rangeUnit, rangeSpacing, pixelSpacingDict)
+            pixelSpacingDict = setSpacing("Azimuth spacing", azimuthUnit, azimuthSpacing, pixelSpacingDict)
         return pixelSpacingDict
     
-    # Use snappy to get a list of band names of a given raster
+    # Get a list of band names of a given raster
     @staticmethod
-    def getSnapBandNames(productPath, secondAttempt = False):
-        bands = []
-        
-        productPath, _ = GPFUtils.gdalPathToSnapPath(productPath)
-        
-        if productPath == "":
-            return bands
-        
-        snappy, _ = GPFUtils.importSnappy()
-        if snappy is not None:
-            try:
-                product = snappy.ProductIO.readProduct(productPath)
-                for band in product.getBands():
-                    bands.append(band.getName())
-            except Exception, e:
-                # Snappy sometimes throws an error on first try but returns band names 
-                # on second try
-                if not secondAttempt:
-                    bands = GPFUtils.getSnapBandNames(productPath, secondAttempt = True)
-                else:
-                    bands = ['Snappy exception', 'See Processing log for more details']
-                    ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Snappy exception: "+str(e))
-        else:
-            bands = ['Python module snappy is not installed in the user directory', 'Please run SNAP installer'] 
-        
-        logging.disable(logging.NOTSET)
-        return bands
+    def getSnapBandNames(productPath):
+        metadata = GPFUtils.productMetadata(productPath, "bands")
+        if metadata is None:
+            return []
+        return metadata.get("error") or metadata["bands"] or []
     
-    # Use snappy to get a list of polarisations names of a given (S1) raster
+    # Get a list of polarisations names of a given (S1) raster
     @staticmethod
-    def getPolarisations(productPath, secondAttempt = False):
-        polarisations = []
-        
-        productPath, _ = GPFUtils.gdalPathToSnapPath(productPath)
-        
-        if productPath == "":
-            return polarisations
-        
-        snappy, jpy = GPFUtils.importSnappy()
-        if snappy is not None:
-            try:
-                product = snappy.ProductIO.readProduct(productPath)
-                metadata = jpy.get_type('org.esa.snap.engine_utilities.datamodel.AbstractMetadata').getAbstractedMetadata(product)
-                polarisations = \
-                    jpy.get_type('org.esa.s1tbx.insar.gpf.support.Sentinel1Utils').getProductPolarizations(metadata)
-            except Exception, e:
-                # Snappy sometimes throws an error on first try but returns band names 
-                # on second try
-                if not secondAttempt:
-                    polarisations = GPFUtils.getPolarisations(productPath, secondAttempt = True)
-                else:
-                    polarisations = ['Snappy exception', 'See Processing log for more details']
-                    ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Snappy exception: "+str(e))
-        else:
-            polarisations = ['Python module snappy is not installed in the user directory', 'Please run SNAP installer'] 
-        
-        logging.disable(logging.NOTSET)
-        return polarisations
+    def getPolarisations(productPath):
+        metadata = GPFUtils.productMetadata(productPath, "polarisations")
+        if metadata is None:
+            return []
+        return metadata.get("error") or metadata["polarisations"] or []
     
     @staticmethod
     def indentXML(elem, level=0):
@@ -363,6 +885,50 @@ class GPFUtils:
             if level and (not elem.tail or not elem.tail.strip()):
                 elem.tail = i
     
+    # WKT polygon of the (xmin, xmax, ymin, ymax) extent, as used in geoRegion
+    # parameter of the Subset operator
+    @staticmethod
+    def extentToPolygon(extent):
+        xmin, xmax, ymin, ymax = [str(value) for value in extent]
+        polygon = "POLYGON(("
+        polygon += xmin + ' ' + ymin +", "
+        polygon += xmin + ' ' + ymax +", "
+        polygon += xmax + ' ' + ymax +", "
+        polygon += xmax + ' ' + ymin +", "
+        polygon += xmin + ' ' + ymin +"))"
+        return polygon
+    
+    # Geographic (WGS84) extent of a raster which can be opened by GDAL, as
+    # (xmin, xmax, ymin, ymax) tuple, or None if it can't be determined
+    @staticmethod
+    def rasterGeoExtent(path):
+        try:
+            dataset = gdal.Open(path, gdal.GA_ReadOnly)
+        except Exception:
+            return None
+        if dataset is None or not dataset.GetProjection():
+            return None
+        geoTransform = dataset.GetGeoTransform()
+        source = osr.SpatialReference()
+        source.ImportFromWkt(dataset.GetProjection())
+        wgs84 = osr.SpatialReference()
+        wgs84.ImportFromEPSG(4326)
+        if hasattr(osr, "OAMS_TRADITIONAL_GIS_ORDER"):
+            source.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            wgs84.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        transform = osr.CoordinateTransformation(source, wgs84)
+        xs = []
+        ys = []
+        for pixel in (0, dataset.RasterXSize):
+            for line in (0, dataset.RasterYSize):
+                x = geoTransform[0] + pixel * geoTransform[1] + line * geoTransform[2]
+                y = geoTransform[3] + pixel * geoTransform[4] + line * geoTransform[5]
+                point = transform.TransformPoint(x, y)
+                xs.append(point[0])
+                ys.append(point[1])
+        dataset = None
+        return (min(xs), max(xs), min(ys), max(ys))
+    
     # GDAL has ability to open S1 and S2 data since version 2.1. However, GDAL has
     # different opening options than SNAP (e.g. SNAP can open S1 manifest.safe files and
     # zipped S1 files, while GDAL can open manifest.safe and .SAFE directory), and sometimes
@@ -376,8 +942,14 @@ class GPFUtils:
         
         # Sentinel-1 data
         # SNAP can't open .SAFE directories
-        if gdalPath.endswith(".SAFE") and not gdalPath.endswith("manifest.safe") and os.path.exists(gdalPath):
-                snapPath = os.path.join(gdalPath, "manifest.safe")
+        safePath = gdalPath.rstrip("/\\")
+        if safePath.upper().endswith(".SAFE") and os.path.isdir(safePath):
+            snapPath = os.path.join(safePath, "manifest.safe")
+        # Zipped (Sentinel-1) data, possibly a file inside the zip opened by GDAL 
+        # through /vsizip/. SNAP opens the zip archive itself.
+        elif gdalPath.startswith("/vsizip/") or gdalPath.lower().endswith(".zip"):
+            zipPath = gdalPath[len("/vsizip/"):] if gdalPath.startswith("/vsizip/") else gdalPath
+            snapPath = zipPath[:zipPath.lower().find(".zip") + len(".zip")]
         # Sentinel-2 data
         # The path to S2 XML file and data format has to be extracted from GDAL path string.
         else:
@@ -0,0 +1,113 @@
+"""
+***************************************************************************
+    GPFWorker.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import subprocess
+import threading
+from processing.core.GeoAlgorithmExecutionException import GeoAlgorithmExecutionException
+from processing_gpf.GPFOutputReader import GPFOutputReader
+
+# Client of a long-lived GPT worker process (see processing_gpt_worker/README.txt).
+# The worker loads the GPF operator registry once and then executes graph files
+# sent to it through its stdin, so that JVM start-up and operator registry
+# loading is paid only once per QGIS session.
+#
+# The protocol is line oriented:
+#  - worker prints READY once it is able to accept jobs,
+#  - client sends "RUN<tab>graph file<tab>number of threads[<tab>tile cache size in MB]",
+#  - worker prints the GPT console output of the job followed by DONE<exit status>,
+#  - client sends "QUIT" to stop the worker.
+class GPFWorker:
+
+    READY = "__gpf_worker_ready"
+    DONE = "__gpf_worker_done:"
+
+    def __init__(self, command):
+        self.command = command
+        self.proc = None
+        self.reader = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def workerScript():
+        return os.path.join(os.path.dirname(__file__), "processing_gpt_worker", "gptWorker.py")
+
+    def isRunning(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self):
+        if self.isRunning():
+            return []
+        self.proc = subprocess.Popen(self.command, stdout=subprocess.PIPE, stdin=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT, universal_newlines=True)
+        self.reader = GPFOutputReader(self.proc.stdout)
+        # Keep the start-up output since it is the only clue if the worker fails to start
+        startupLines = []
+        for line in iter(self.reader.readLine, None):
+            if line.startswith(GPFWorker.READY):
+                return startupLines
+            startupLines.append(line)
+        self.proc = None
+        raise GeoAlgorithmExecutionException("GPT worker could not be started:\n" + "".join(startupLines))
+
+    def stop(self):
+        with self.lock:
+            if self.isRunning():
+                try:
+                    self.proc.stdin.write("QUIT\n")
+                    self.proc.stdin.flush()
+                    self.proc.wait()
+                except (IOError, OSError):
+                    self.proc.kill()
+            self.proc = None
+
+    # Execute the graph saved in gpfPath. The worker executes one graph at a time
+    # so concurrent callers are serialized.
+    def execute(self, gpfPath, threads, progress, loglines, tileCache = None, report = None):
+        with self.lock:
+            loglines.extend(self.start())
+            request = "RUN\t" + gpfPath + "\t" + str(threads)
+            if tileCache:
+                request += "\t" + str(tileCache)
+            try:
+                self.proc.stdin.write(request + "\n")
+                self.proc.stdin.flush()
+            except (IOError, OSError):
+                self.proc = None
+                raise GeoAlgorithmExecutionException("GPT worker is not responding")
+            if report is not None:
+                report.gptStarted()
+            self.reader.setTarget(progress, loglines, report)
+            doneLine = self.reader.readUntil(GPFWorker.DONE)
+            if report is not None:
+                report.gptFinished()
+            if doneLine is None:
+                # Worker died during the execution, it will be restarted with the next job
+                self.proc = None
+                raise GeoAlgorithmExecutionException("GPT worker terminated unexpectedly. See Processing log for more details.")
+            return int(doneLine[len(GPFWorker.DONE):].strip() or 0)
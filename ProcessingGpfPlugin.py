@@ -27,11 +27,13 @@
 """
 
 from qgis.core import *
+from PyQt4.QtCore import QTimer
 import os, sys
 import inspect
 from processing.core.Processing import Processing
 from processing_gpf.BEAMAlgorithmProvider import BEAMAlgorithmProvider 
 from processing_gpf.SNAPAlgorithmProvider import SNAPAlgorithmProvider
+from processing_gpf.GPFUtils import GPFUtils
 
 cmd_folder = os.path.split(inspect.getfile( inspect.currentframe() ))[0]
 if cmd_folder not in sys.path:
@@ -49,6 +51,11 @@ class ProcessingGpfPlugin:
         Processing.addProvider(self.BeamProvider, True)
         Processing.addProvider(self.SNAPProvider, True)
         #Processing.addProvider(self.S1tbx, True)
+        
+        # Snappy is started only once QGIS has finished starting up (when 
+        # the event loop runs) so that the warm-up doesn't delay it
+        if GPFUtils.snappyWarmUpActivated():
+            QTimer.singleShot(0, GPFUtils.warmUpSnappy)
 
     def unload(self):
         Processing.removeProvider(self.BeamProvider)
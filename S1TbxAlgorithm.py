@@ -36,10 +36,5 @@ class S1TbxAlgorithm(SNAPAlgorithm):
                        
     def getIcon(self):
         return  QIcon(os.path.dirname(__file__) + "/images/s1tbx.png")
-    
-    def getCopy(self):
-        newone = S1TbxAlgorithm(self.descriptionFile)
-        newone.provider = self.provider
-        return newone
                 
         
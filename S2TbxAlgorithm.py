@@ -36,8 +36,3 @@ class S2TbxAlgorithm(SNAPAlgorithm):
                        
     def getIcon(self):
         return  QIcon(os.path.dirname(__file__) + "/images/s2tbx.png")
-    
-    def getCopy(self):
-        newone = S2TbxAlgorithm(self.descriptionFile)
-        newone.provider = self.provider
-        return newone
@@ -36,8 +36,3 @@ class S3TbxAlgorithm(SNAPAlgorithm):
                        
     def getIcon(self):
         return  QIcon(os.path.dirname(__file__) + "/images/s3tbx.png")
-    
-    def getCopy(self):
-        newone = S3TbxAlgorithm(self.descriptionFile)
-        newone.provider = self.provider
-        return newone
@@ -46,11 +46,17 @@ class SNAPAlgorithm(GPFAlgorithm):
         
     def processAlgorithm(self, progress):
         GPFAlgorithm.processAlgorithm(self, GPFUtils.snapKey(), progress)
+
+    def processBatch(self, inputs, outputPattern, progress, parallelJobs = None, memory = None):
+        GPFAlgorithm.processBatch(self, GPFUtils.snapKey(), inputs, outputPattern, progress, parallelJobs, memory)
         
     def addGPFNode(self, graph):
         graph = GPFAlgorithm.addGPFNode(self, graph)
+        # Only the parameters of the node just added need to be converted, 
+        # the nodes of previous algorithms have been converted already
+        parameters = graph.node(self.nodeID).parameters
         # split band element with multiple bands into multiple elements
-        for parent in graph.findall(".//band/.."):
+        for parent in list(parameters.iter()):
             for element in parent.findall("band"):
                 bands = element.text.split(',')
                 parent.remove(element)
@@ -58,7 +64,7 @@ class SNAPAlgorithm(GPFAlgorithm):
                     if len(band) > 0:
                         newElement = SubElement(parent, "band")
                         newElement.text = band
-        for parent in graph.findall(".//mapProjection/.."):
+        for parent in list(parameters.iter()):
             for element in parent.findall("mapProjection"):
                 crs = element.text
                 try:
@@ -86,10 +92,5 @@ class SNAPAlgorithm(GPFAlgorithm):
         
     def getIcon(self):
         return  QIcon(os.path.dirname(__file__) + "/images/snap.png")
-    
-    def getCopy(self):
-        newone = SNAPAlgorithm(self.descriptionFile)
-        newone.provider = self.provider
-        return newone
                 
         
\ No newline at end of file
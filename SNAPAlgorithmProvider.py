@@ -1,10 +1,17 @@
 import os
+import time
+from multiprocessing.pool import ThreadPool
 from PyQt4.QtGui import *
+from PyQt4.QtCore import QFileSystemWatcher, QTimer
 from processing.core.ProcessingConfig import ProcessingConfig, Setting
 from processing.core.AlgorithmProvider import AlgorithmProvider
 from processing.core.ProcessingLog import ProcessingLog
 from processing.modeler.WrongModelException import WrongModelException
 from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFStaging import GPFStaging
+from processing_gpf.GPFGraphOptimizer import GPFGraphOptimizer
+from processing_gpf.GPFDescriptionIndex import GPFDescriptionIndex
+from processing_gpf.GPFAlgorithmRegistry import GPFAlgorithmRegistry
 from processing_gpf.GPFModelerAlgorithm import GPFModelerAlgorithm
 from processing_gpf.S1TbxAlgorithm import S1TbxAlgorithm
 from processing_gpf.S2TbxAlgorithm import S2TbxAlgorithm
@@ -21,6 +28,20 @@ class SNAPAlgorithmProvider(AlgorithmProvider):
         self.actions = [CreateNewGpfModelAction(self)]
         self.contextMenuActions = [EditGpfModelAction(), DeleteGpfModelAction()]
         self.activate = False
+        # Shared with the BEAM provider so that operators are resolved across providers
+        self.registry = GPFAlgorithmRegistry.instance()
+        # Models from the last load by path: (mtime, size, model or None if it
+        # could not be loaded), and listings of the models folders by path: 
+        # (mtime, model files, subfolders). See loadGpfModels.
+        self.modelCache = {}
+        self.modelCacheToolboxes = None
+        self.modelFolderCache = {}
+        self.modelsWatcher = None
+        # Model files written or deleted by the plugin itself (modeler, delete
+        # action) since the last load, by path: (mtime, size) or None if deleted.
+        # The actions reload the provider themselves, see modelChangedByPlugin.
+        self.pluginModelChanges = {}
+        self.modelsReloadTimer = None
         
         #self.createAlgsList() #preloading algorithms to speed up
 
@@ -28,55 +49,241 @@ class SNAPAlgorithmProvider(AlgorithmProvider):
         AlgorithmProvider.initializeSettings(self)
         ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.SNAP_FOLDER, "SNAP install directory", GPFUtils.programPath(GPFUtils.snapKey())))
         ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.SNAP_THREADS, "Maximum number of parallel (native) threads", 4))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.GPF_PARALLEL_JOBS, "Maximum number of parallel GPT executions", 2))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.SNAP_MAX_HEAP, "Maximum Java heap size per GPT execution in MB (0 - automatic)", 0))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.SNAP_TILE_CACHE, "GPT tile cache size in MB (0 - automatic)", 0))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.SNAP_GC_OPTIONS, "Java garbage collector options for GPT (e.g. -XX:+UseG1GC)", ""))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.GPF_TILE_SIZE, "Tile size in degrees for tiled processing of large extents (0 - no tiling)", 0.0))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.GPF_TILE_OVERLAP, "Overlap of tiles in degrees", 0.01))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.GPF_CACHE_ACTIVATE, "Reuse outputs of identical graph executions (result cache)", False))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.GPF_CACHE_SIZE, "Maximum size of result cache in MB", 20480))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.GPF_GRAPH_STAGING, "Execute long graphs in stages to limit memory use", False))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.GPF_STAGING_OPERATORS, "Operators after which graphs are split into stages (comma separated)", GPFStaging.DEFAULT_CUT_OPERATORS))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.GPF_GRAPH_OPTIMIZE, "Optimize graphs before execution (merge Read nodes, remove unused nodes)", True))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.GPF_SUBSET_MARGIN, "Margin in degrees of subsets moved upstream by graph optimization", GPFGraphOptimizer.DEFAULT_SUBSET_MARGIN))
         ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.GPF_MODELS_FOLDER, "GPF models' directory", GPFUtils.modelsFolder()))
         ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.S1TBX_ACTIVATE, "Activate Sentinel-1 toolbox", False))
         ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.S2TBX_ACTIVATE, "Activate Sentinel-2 toolbox", False))
         ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.S3TBX_ACTIVATE, "Activate Sentinel-3 toolbox", False))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.SNAP_WORKER_ACTIVATE, "Use persistent GPT worker (experimental)", False))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.SNAP_WORKER_PYTHON, "Python interpreter for GPT worker (with snappy configured)", "python"))
+        ProcessingConfig.addSetting(Setting(self.getDescription(), GPFUtils.SNAP_WARMUP, "Start snappy in the background when QGIS starts", False))
 
     def unload(self):
         AlgorithmProvider.unload(self)
         ProcessingConfig.removeSetting(GPFUtils.SNAP_FOLDER)
         ProcessingConfig.removeSetting(GPFUtils.SNAP_THREADS)
+        ProcessingConfig.removeSetting(GPFUtils.GPF_PARALLEL_JOBS)
+        ProcessingConfig.removeSetting(GPFUtils.SNAP_MAX_HEAP)
+        ProcessingConfig.removeSetting(GPFUtils.SNAP_TILE_CACHE)
+        ProcessingConfig.removeSetting(GPFUtils.SNAP_GC_OPTIONS)
+        ProcessingConfig.removeSetting(GPFUtils.GPF_TILE_SIZE)
+        ProcessingConfig.removeSetting(GPFUtils.GPF_TILE_OVERLAP)
+        ProcessingConfig.removeSetting(GPFUtils.GPF_CACHE_ACTIVATE)
+        ProcessingConfig.removeSetting(GPFUtils.GPF_CACHE_SIZE)
+        ProcessingConfig.removeSetting(GPFUtils.GPF_GRAPH_STAGING)
+        ProcessingConfig.removeSetting(GPFUtils.GPF_STAGING_OPERATORS)
+        ProcessingConfig.removeSetting(GPFUtils.GPF_GRAPH_OPTIMIZE)
+        ProcessingConfig.removeSetting(GPFUtils.GPF_SUBSET_MARGIN)
         ProcessingConfig.removeSetting(GPFUtils.GPF_MODELS_FOLDER)
         ProcessingConfig.removeSetting(GPFUtils.S1TBX_ACTIVATE)
         ProcessingConfig.removeSetting(GPFUtils.S2TBX_ACTIVATE)
         ProcessingConfig.removeSetting(GPFUtils.S3TBX_ACTIVATE)
+        ProcessingConfig.removeSetting(GPFUtils.SNAP_WORKER_ACTIVATE)
+        ProcessingConfig.removeSetting(GPFUtils.SNAP_WORKER_PYTHON)
+        ProcessingConfig.removeSetting(GPFUtils.SNAP_WARMUP)
+        GPFUtils.stopGptWorker()
+        if self.modelsWatcher is not None:
+            self.modelsReloadTimer.stop()
+            watched = self.modelsWatcher.directories() + self.modelsWatcher.files()
+            if watched:
+                self.modelsWatcher.removePaths(watched)
  
     def createAlgsList(self, key, gpfAlgorithm):
         self.preloadedAlgs = []
         folder = GPFUtils.gpfDescriptionPath(key)
-        for descriptionFile in os.listdir(folder):
-            if descriptionFile.endswith("txt"):
-                try:
-                    alg = gpfAlgorithm(os.path.join(folder, descriptionFile))
-                    if alg.name.strip() != "":
-                        alg.provider = self
-                        self.preloadedAlgs.append(alg)
-                    else:
-                        ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Could not open " + key + " SNAP generic algorithm: " + descriptionFile)
-                except Exception,e:
-                    ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, str(e))
-                    ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Could not open " + key + " generic algorithm: " + descriptionFile)
+        # Reads the index of description files, the algorithms then get their
+        # descriptions from it
+        for descriptionPath, _ in GPFDescriptionIndex.descriptions(folder):
+            descriptionFile = os.path.basename(descriptionPath)
+            try:
+                alg = gpfAlgorithm(descriptionPath)
+                if alg.name.strip() != "":
+                    alg.provider = self
+                    self.preloadedAlgs.append(alg)
+                    self.registry.add(self.getName(), alg, key)
+                else:
+                    ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Could not open " + key + " SNAP generic algorithm: " + descriptionFile)
+            except Exception,e:
+                ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, str(e))
+                ProcessingLog.addToLog(ProcessingLog.LOG_ERROR, "Could not open " + key + " generic algorithm: " + descriptionFile)
     
+    # Models are loaded incrementally: folders are listed again only if their
+    # modification time changed and only new or changed model files are parsed,
+    # the rest come from the previous load. The XML of the files to parse is read
+    # in parallel since the models folder is often on a network drive.
     def loadGpfModels(self, folder):
         if not os.path.exists(folder):
             return
-        for path, subdirs, files in os.walk(folder):
-            for descriptionFile in files:
-                if descriptionFile.endswith('xml'):
-                    try:
-                        fullpath = os.path.join(path, descriptionFile)
-                        alg = GPFModelerAlgorithm.fromFile(fullpath, self)
-                        if alg and alg.name:
-                            #alg.provider = self
-                            alg.descriptionFile = fullpath
-                            self.algs.append(alg)
-                        else:
-                            ProcessingLog.addToLog(ProcessingLog.LOG_ERROR,
-                                self.tr('Could not load model %s', 'ModelerAlgorithmProvider') % descriptionFile)
-                    except WrongModelException, e:
-                        ProcessingLog.addToLog(ProcessingLog.LOG_ERROR,
-                            self.tr('Could not load model %s\n%s', 'ModelerAlgorithmProvider') % (descriptionFile, e.msg))
+        # Models which referred to operators of a toolbox that was activated or
+        # deactivated have to be parsed again
+        toolboxes = (ProcessingConfig.getSetting(GPFUtils.S1TBX_ACTIVATE), ProcessingConfig.getSetting(GPFUtils.S2TBX_ACTIVATE),
+                     ProcessingConfig.getSetting(GPFUtils.S3TBX_ACTIVATE))
+        if toolboxes != self.modelCacheToolboxes:
+            self.modelCache = {}
+            self.modelCacheToolboxes = toolboxes
+        
+        modelFiles = self.modelFiles(folder)
+        self.pluginModelChanges = {}
+        
+        changedFiles = [fullpath for fullpath, identity in modelFiles.items() 
+                        if self.modelCache.get(fullpath, (None, None))[:2] != identity]
+        xmlRoots = self.readModels(changedFiles)
+        modelCache = {}
+        for fullpath in sorted(modelFiles.keys()):
+            if fullpath in xmlRoots:
+                modelCache[fullpath] = modelFiles[fullpath] + (self.parseModel(fullpath, xmlRoots[fullpath]),)
+            else:
+                modelCache[fullpath] = self.modelCache[fullpath]
+            alg = modelCache[fullpath][2]
+            if alg is not None:
+                self.algs.append(alg)
+                self.registry.add(self.getName(), alg)
+        self.modelCache = modelCache
+    
+    # (mtime, size) of the model files in the folder and its subfolders by path.
+    # The folders and files are then watched for changes.
+    def modelFiles(self, folder):
+        folders = {}
+        modelFiles = {}
+        for fullpath in self.listModelsFolder(folder, folders):
+            try:
+                stat = os.stat(fullpath)
+            except OSError:
+                continue
+            modelFiles[fullpath] = (stat.st_mtime, stat.st_size)
+        self.modelFolderCache = folders
+        self.watchModelsFolder(folders.keys(), modelFiles.keys())
+        return modelFiles
+    
+    # Model files in the folder and its subfolders. Listings of the folders are 
+    # kept in folders.
+    def listModelsFolder(self, folder, folders):
+        try:
+            mtime = os.stat(folder).st_mtime
+        except OSError:
+            return []
+        listing = self.modelFolderCache.get(folder)
+        # Modification time might have too coarse resolution to notice recent changes
+        if listing is None or listing[0] != mtime or time.time() - mtime < 2:
+            names = os.listdir(folder)
+            modelFiles = [os.path.join(folder, name) for name in names if name.endswith('xml')]
+            subfolders = [os.path.join(folder, name) for name in names if os.path.isdir(os.path.join(folder, name))]
+            listing = (mtime, modelFiles, subfolders)
+        folders[folder] = listing
+        modelFiles = list(listing[1])
+        for subfolder in listing[2]:
+            modelFiles.extend(self.listModelsFolder(subfolder, folders))
+        return modelFiles
+    
+    # Parsed XML of model files by path, or the WrongModelException of the files
+    # which couldn't be read
+    def readModels(self, modelFiles):
+        def readModel(fullpath):
+            try:
+                return GPFModelerAlgorithm.readXml(fullpath)
+            except WrongModelException, e:
+                return e
+        if len(modelFiles) < 2:
+            return dict([(fullpath, readModel(fullpath)) for fullpath in modelFiles])
+        pool = ThreadPool(min(len(modelFiles), 8))
+        try:
+            return dict(zip(modelFiles, pool.map(readModel, modelFiles)))
+        finally:
+            pool.close()
+    
+    # Model created from the parsed XML or None if it can't be loaded
+    def parseModel(self, fullpath, xmlRoot):
+        descriptionFile = os.path.basename(fullpath)
+        try:
+            if isinstance(xmlRoot, WrongModelException):
+                raise xmlRoot
+            alg = GPFModelerAlgorithm.fromXml(xmlRoot, fullpath, self)
+            if alg and alg.name:
+                #alg.provider = self
+                alg.descriptionFile = fullpath
+                return alg
+            else:
+                ProcessingLog.addToLog(ProcessingLog.LOG_ERROR,
+                    self.tr('Could not load model %s', 'ModelerAlgorithmProvider') % descriptionFile)
+        except WrongModelException, e:
+            ProcessingLog.addToLog(ProcessingLog.LOG_ERROR,
+                self.tr('Could not load model %s\n%s', 'ModelerAlgorithmProvider') % (descriptionFile, e.msg))
+        return None
+    
+    # Watch the models folders and files so that the models are reloaded when 
+    # they change. Changes often come in bursts (e.g. copying many models) so 
+    # the reload is delayed until there are no changes for a while.
+    def watchModelsFolder(self, folders, modelFiles):
+        if self.modelsWatcher is None:
+            self.modelsReloadTimer = QTimer()
+            self.modelsReloadTimer.setSingleShot(True)
+            self.modelsReloadTimer.setInterval(1000)
+            self.modelsReloadTimer.timeout.connect(self.reloadModels)
+            self.modelsWatcher = QFileSystemWatcher()
+            self.modelsWatcher.directoryChanged.connect(lambda path: self.modelsReloadTimer.start())
+            self.modelsWatcher.fileChanged.connect(lambda path: self.modelsReloadTimer.start())
+        watched = set(self.modelsWatcher.directories() + self.modelsWatcher.files())
+        paths = set(folders) | set(modelFiles)
+        removed = [path for path in watched if path not in paths]
+        added = [path for path in paths if path not in watched]
+        if removed:
+            self.modelsWatcher.removePaths(removed)
+        if added:
+            self.modelsWatcher.addPaths(added)
+    
+    # Record a model file the plugin has just written or deleted so that the
+    # change seen by the models watcher doesn't reload it once more
+    def modelChangedByPlugin(self, fullpath):
+        try:
+            stat = os.stat(fullpath)
+            self.pluginModelChanges[fullpath] = (stat.st_mtime, stat.st_size)
+        except OSError:
+            self.pluginModelChanges[fullpath] = None
+    
+    # Refresh only the models whose files were changed, added or deleted by
+    # others than the plugin, without loading the provider's algorithms again
+    def reloadModels(self):
+        folder = GPFUtils.modelsFolder()
+        modelFiles = self.modelFiles(folder) if os.path.exists(folder) else {}
+        changedFiles = [fullpath for fullpath, identity in modelFiles.items() 
+                        if self.modelCache.get(fullpath, (None, None))[:2] != identity and 
+                        self.pluginModelChanges.get(fullpath, False) != identity]
+        removedFiles = [fullpath for fullpath in self.modelCache if fullpath not in modelFiles and
+                        self.pluginModelChanges.get(fullpath, False) is not None]
+        if not changedFiles and not removedFiles:
+            return
+        xmlRoots = self.readModels(changedFiles)
+        for fullpath in changedFiles + removedFiles:
+            oldAlg = self.modelCache.pop(fullpath, (None, None, None))[2]
+            if oldAlg in self.algs:
+                self.algs.remove(oldAlg)
+                self.registry.remove(self.getName(), oldAlg)
+            if fullpath in xmlRoots:
+                alg = self.parseModel(fullpath, xmlRoots[fullpath])
+                self.modelCache[fullpath] = modelFiles[fullpath] + (alg,)
+                if alg is not None:
+                    self.algs.append(alg)
+                    self.registry.add(self.getName(), alg)
+        try:
+            # QGIS 2.16 (and up?) Processing implementation
+            from processing.core.alglist import algList
+            algList.algs[self.getName()] = dict([(alg.commandLineName(), alg) for alg in self.algs])
+            algList.providerUpdated.emit(self.getName())
+        except ImportError:
+            # QGIS 2.14 Processing implementation
+            from processing.core.Processing import Processing
+            Processing.updateAlgsList()
                     
     def getDescription(self):
         return GPFUtils.providerDescription()
@@ -87,11 +294,20 @@ class SNAPAlgorithmProvider(AlgorithmProvider):
     def getIcon(self):
         return QIcon(os.path.dirname(__file__) + "/images/snap.png")
     
+    # Registry of the loaded algorithms. The algorithms are loaded again if
+    # they are not valid anymore since toolboxes were (de)activated.
+    def algorithmRegistry(self):
+        if not self.registry.isValid(self.getName()):
+            self.loadAlgorithms()
+        return self.registry
+    
     def getAlgorithmFromOperator(self, operatorName):
-        for alg in self.algs:
-            if alg.operator == operatorName:
-                return alg
-        return None
+        return self.algorithmRegistry().algorithmFromOperator(self.getName(), operatorName)
+
+    def loadAlgorithms(self):
+        # Algorithms of a deactivated provider are not used to resolve operators
+        self.registry.clear(self.getName())
+        AlgorithmProvider.loadAlgorithms(self)
 
     def _loadAlgorithms(self):
         self.createAlgsList(GPFUtils.snapKey(), SNAPAlgorithm)
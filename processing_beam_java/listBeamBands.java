@@ -26,7 +26,9 @@
 ***************************************************************************
 */
 
+import java.io.BufferedReader;
 import java.io.IOException;
+import java.io.InputStreamReader;
 import org.esa.beam.framework.dataio.ProductIO;
 import org.esa.beam.framework.datamodel.Band;
 import org.esa.beam.framework.datamodel.Product;
@@ -34,14 +36,29 @@ import org.esa.beam.framework.datamodel.Product;
 // Display all the bands names of the input image using BEAM to extract them.
 // main takes two argument - the filename of the image and delimiter to prepend
 // to band names to distinguish it from other output
+//
+// With -server as the first argument (and the delimiter as the second) it instead
+// reads "filename<tab>appendProductName" requests from stdin, one per line, and
+// answers each with the band names followed by a __bands_done line. This way the
+// JVM is started only once per QGIS session. __bands_ready is printed once it is
+// able to accept requests and QUIT stops it.
 class listBeamBands {
-    private static Product product;
+    private static final String READY = "__bands_ready";
+    private static final String DONE = "__bands_done";
  
     public static void main(String[] args) {
 
-        if (args.length >= 1) {
+        if (args.length >= 1 && args[0].equals("-server")) {
+            String bandDelim = "";
+            if (args.length >= 2)
+                bandDelim = args[1];
+            try {
+                serve(bandDelim);
+            } catch (IOException e) {
+                // stdin was closed
+            }
+        } else if (args.length >= 1) {
         	try{	
-        		product = ProductIO.readProduct(args[0]);
         		String bandDelim;
         		String appendProductName = "";
         		if (args.length >= 2)
@@ -50,17 +67,46 @@ class listBeamBands {
         			bandDelim = "";
         		if (args.length >= 3)
         			appendProductName = args[2];
-        		Band[] bands = product.getBands();
-                for (Band band : bands) {
-                	if (appendProductName.equals("True"))
-                		System.out.println(bandDelim+band.getName()+"::"+product.getName());
-                	else
-                		System.out.println(bandDelim+band.getName());
-                }
-                product.closeIO();
+        		printBands(args[0], bandDelim, appendProductName);
         	} catch (IOException e) {
         		// if the file can't be found just do nothing
         	}
         }
     }
+    
+    private static void serve(String bandDelim) throws IOException {
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, "UTF-8"));
+        System.out.println(READY);
+        System.out.flush();
+        String line;
+        while ((line = in.readLine()) != null) {
+            String[] request = line.split("\t");
+            if (request[0].equals("QUIT"))
+                break;
+            try {
+                printBands(request[0], bandDelim, request.length >= 2 ? request[1] : "");
+            } catch (Exception e) {
+                // if the file can't be read answer with no bands and keep serving
+            }
+            System.out.println(DONE);
+            System.out.flush();
+        }
+    }
+    
+    private static void printBands(String filename, String bandDelim, String appendProductName) throws IOException {
+        Product product = ProductIO.readProduct(filename);
+        if (product == null)
+            return;
+        try {
+            Band[] bands = product.getBands();
+            for (Band band : bands) {
+                if (appendProductName.equals("True"))
+                    System.out.println(bandDelim+band.getName()+"::"+product.getName());
+                else
+                    System.out.println(bandDelim+band.getName());
+            }
+        } finally {
+            product.dispose();
+        }
+    }
 }
\ No newline at end of file
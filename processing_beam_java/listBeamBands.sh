@@ -0,0 +1,19 @@
+#!/bin/sh
+
+BEAM4_HOME="$1"
+CODE_HOME="$(cd "$(dirname "$0")" && pwd)"
+shift
+
+cd "$CODE_HOME"
+
+JAVA="$BEAM4_HOME/jre/bin/java"
+if [ ! -x "$JAVA" ]; then
+    JAVA=java
+fi
+
+exec "$JAVA" \
+-Xmx1024M \
+-cp \
+"$BEAM4_HOME/lib/*:\
+$BEAM4_HOME/bin/*:\
+$BEAM4_HOME/modules/*:." listBeamBands "$@"
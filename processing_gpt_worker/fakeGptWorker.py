@@ -0,0 +1,84 @@
+"""
+***************************************************************************
+    fakeGptWorker.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+# Stand-in for gptWorker.py which speaks the same protocol but does not need
+# SNAP. It prints GPT-like console output and creates empty files for all
+# Write nodes of the graph, so the worker protocol (and everything built on
+# top of it) can be tried out without SNAP installation.
+
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+READY = "__gpf_worker_ready"
+DONE = "__gpf_worker_done:"
+
+
+def writeLine(line):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+def executeGraph(graphPath, threads, tileCache = None):
+    graph = ET.parse(graphPath).getroot()
+    writeLine("Executing processing graph (fake worker, %d threads, tile cache %s MB)" % (threads, tileCache))
+    for percentage in range(10, 101, 10):
+        sys.stdout.write("...." + str(percentage) + "%")
+        sys.stdout.flush()
+        time.sleep(0.05)
+    writeLine(" done.")
+    for node in graph.findall("node"):
+        operator = node.find("operator")
+        if operator is not None and operator.text == "Write":
+            outputFile = node.find("parameters/file")
+            if outputFile is not None and outputFile.text:
+                open(outputFile.text, "w").close()
+
+
+def main():
+    writeLine(READY)
+    for request in iter(sys.stdin.readline, ""):
+        request = request.rstrip("\n").split("\t")
+        if request[0] == "QUIT":
+            break
+        elif request[0] == "RUN" and len(request) in (3, 4):
+            status = 0
+            try:
+                tileCache = int(request[3]) if len(request) == 4 else None
+                executeGraph(request[1], int(request[2]), tileCache)
+            except Exception as e:
+                writeLine("Error: " + str(e))
+                status = 1
+            writeLine(DONE + str(status))
+        else:
+            writeLine("Unknown request: " + "\t".join(request))
+            writeLine(DONE + "1")
+
+
+if __name__ == "__main__":
+    main()
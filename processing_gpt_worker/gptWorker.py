@@ -0,0 +1,99 @@
+"""
+***************************************************************************
+    gptWorker.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+# Long-lived GPT worker. It has to be run with a Python interpreter which has
+# snappy configured (see README.txt). It is started by GPFWorker and it
+# communicates with it through stdin and stdout.
+
+import os
+import sys
+import traceback
+
+READY = "__gpf_worker_ready"
+DONE = "__gpf_worker_done:"
+
+snappyPath = os.path.join(os.path.expanduser("~"), ".snap", "snap-python")
+if snappyPath not in sys.path:
+    sys.path.append(snappyPath)
+
+import snappy
+from snappy import jpy
+
+GPF = jpy.get_type('org.esa.snap.core.gpf.GPF')
+GraphIO = jpy.get_type('org.esa.snap.core.gpf.graph.GraphIO')
+GraphProcessor = jpy.get_type('org.esa.snap.core.gpf.graph.GraphProcessor')
+ProgressMonitor = jpy.get_type('com.bc.ceres.core.PrintWriterConciseProgressMonitor')
+JAI = jpy.get_type('javax.media.jai.JAI')
+FileReader = jpy.get_type('java.io.FileReader')
+System = jpy.get_type('java.lang.System')
+
+
+def writeLine(line):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+def executeGraph(graphPath, threads, tileCache = None):
+    JAI.getDefaultInstance().getTileScheduler().setParallelism(threads)
+    if tileCache:
+        JAI.getDefaultInstance().getTileCache().setMemoryCapacity(tileCache * 1024 * 1024)
+    reader = FileReader(graphPath)
+    try:
+        graph = GraphIO.read(reader)
+    finally:
+        reader.close()
+    writeLine("Executing processing graph")
+    GraphProcessor().executeGraph(graph, ProgressMonitor(System.out))
+    System.out.flush()
+    writeLine("")
+
+
+def main():
+    # Loading the operator registry is the expensive part which is done only once
+    GPF.getDefaultInstance().getOperatorSpiRegistry().loadOperatorSpis()
+    writeLine(READY)
+    for request in iter(sys.stdin.readline, ""):
+        request = request.rstrip("\n").split("\t")
+        if request[0] == "QUIT":
+            break
+        elif request[0] == "RUN" and len(request) in (3, 4):
+            status = 0
+            try:
+                tileCache = int(request[3]) if len(request) == 4 else None
+                executeGraph(request[1], int(request[2]), tileCache)
+            except Exception:
+                writeLine(traceback.format_exc())
+                status = 1
+            writeLine(DONE + str(status))
+        else:
+            writeLine("Unknown request: " + "\t".join(request))
+            writeLine(DONE + "1")
+
+
+if __name__ == "__main__":
+    main()
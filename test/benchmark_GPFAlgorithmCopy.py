@@ -0,0 +1,95 @@
+"""
+***************************************************************************
+    benchmark_GPFAlgorithmCopy.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+# Compares the ways of getting a new SNAP algorithm for every description file
+# of the SNAP toolboxes: creating it from the description file, copying the 
+# provider's prototype with shallow copies of parameters and outputs only 
+# (getCopy before) and with copies of their list, dict and set attributes and 
+# without the link to the prototype's graph (getCopy now). It also counts the
+# copies which still share mutable attributes with their prototype. GPFAlgorithm
+# needs QGIS' Processing framework and PyQt4, so run it with QGIS' Python
+# environment (e.g. from the OSGeo4W shell):
+#   python test/benchmark_GPFAlgorithmCopy.py
+
+import os
+import sys
+import copy
+import glob
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import utilities
+from processing_gpf.GPFAlgorithm import GPFAlgorithm
+from processing_gpf.SNAPAlgorithm import SNAPAlgorithm
+
+REPEAT = 20
+
+DESCRIPTIONS = sorted(glob.glob(os.path.join(utilities.PLUGIN_FOLDER, "s[123]tbx_description", "*.txt")) + 
+                      glob.glob(os.path.join(utilities.PLUGIN_FOLDER, "snap_generic_description", "*.txt")))
+
+
+def shallowCopy(alg):
+    newone = copy.copy(alg)
+    newone.parameters = [copy.copy(param) for param in alg.parameters]
+    newone.outputs = [copy.copy(output) for output in alg.outputs]
+    newone.nodeID = ""+alg.operator+"_"+str(GPFAlgorithm.nodeIDNum)
+    GPFAlgorithm.nodeIDNum +=1
+    newone.previousAlgInGraph = None
+    return newone
+
+
+# Number of list, dict and set attributes the copy shares with the prototype
+def sharedContainers(prototype, newone):
+    pairs = [(prototype, newone)] + zip(prototype.parameters, newone.parameters) + zip(prototype.outputs, newone.outputs)
+    shared = 0
+    for original, copied in pairs:
+        for name, value in original.__dict__.items():
+            if isinstance(value, (list, dict, set)) and copied.__dict__.get(name) is value:
+                shared += 1
+    return shared
+
+
+def measure(function, prototypes):
+    start = time.time()
+    for _ in range(REPEAT):
+        for prototype in prototypes:
+            function(prototype)
+    return (time.time() - start) / REPEAT * 1000
+
+
+if __name__ == "__main__":
+    prototypes = []
+    for descriptionFile in DESCRIPTIONS:
+        alg = SNAPAlgorithm(descriptionFile)
+        alg.parameters
+        prototypes.append(alg)
+    print "%d algorithms" % len(prototypes)
+    print "from description file: %8.2f ms" % measure(lambda alg: SNAPAlgorithm(alg.descriptionFile).parameters, prototypes)
+    for name, function in [("getCopy before", shallowCopy), ("getCopy now", GPFAlgorithm.getCopy)]:
+        shared = sum([sharedContainers(prototype, function(prototype)) for prototype in prototypes])
+        print "%-22s %8.2f ms, %d shared attributes" % (name + ":", measure(function, prototypes), shared)
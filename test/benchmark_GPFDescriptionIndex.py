@@ -0,0 +1,86 @@
+"""
+***************************************************************************
+    benchmark_GPFDescriptionIndex.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+# Compares loading the algorithm descriptions of all toolboxes as the providers
+# do (descriptions of every folder and then the lines of every algorithm)
+# by reading the description files directly, from a warm GPFDescriptionIndex,
+# i.e. the index saved in a previous session, and from the index already
+# loaded in the session (provider refresh, algorithm copies):
+#   python test/benchmark_GPFDescriptionIndex.py
+
+import os
+import sys
+import glob
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import utilities
+from processing_gpf.GPFDescriptionIndex import GPFDescriptionIndex
+
+REPEAT = 500
+
+FOLDERS = sorted(glob.glob(os.path.join(utilities.PLUGIN_FOLDER, "*_description")))
+
+
+def loadDirectly():
+    for folder in FOLDERS:
+        for fileName in sorted(os.listdir(folder)):
+            if fileName.endswith("txt"):
+                GPFDescriptionIndex.readLines(os.path.join(folder, fileName))
+
+
+def loadFromIndex():
+    # New session with the index saved by the previous one
+    GPFDescriptionIndex._index = None
+    GPFDescriptionIndex._checked = set()
+    GPFDescriptionIndex._byPath = {}
+    loadInSession()
+
+
+def loadInSession():
+    for folder in FOLDERS:
+        for descriptionFile, _ in GPFDescriptionIndex.descriptions(folder):
+            GPFDescriptionIndex.lines(descriptionFile)
+
+
+def measure(function):
+    start = time.time()
+    for _ in range(REPEAT):
+        function()
+    return (time.time() - start) / REPEAT * 1000
+
+
+if __name__ == "__main__":
+    GPFDescriptionIndex.clear()
+    loadFromIndex()
+    files = sum([len(GPFDescriptionIndex.descriptions(folder)) for folder in FOLDERS])
+    print "%d description files in %d folders" % (files, len(FOLDERS))
+    print "read directly: %.3f ms" % measure(loadDirectly)
+    print "warm index:    %.3f ms" % measure(loadFromIndex)
+    print "in session:    %.3f ms" % measure(loadInSession)
@@ -0,0 +1,122 @@
+"""
+***************************************************************************
+    benchmark_GPFGraph.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+# Compares the graph handling of GPFUtils.executeGpf on generated models of 
+# 100 to 1000 nodes before and after the parsed graph was passed to its
+# consumers. Before, the model was serialized to GPF XML and parsed again by
+# the incremental model execution, the run report, GPFResultCache (graph key,
+# restore and store) and GPFStaging. Now the GPFGraph is serialized once and
+# the parsed graph is shared. GPT itself is not run:
+#   python test/benchmark_GPFGraph.py
+
+import os
+import sys
+import shutil
+import tempfile
+import time
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import utilities
+from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFGraph import GPFGraph, GPFGraphNode
+from processing_gpf.GPFResultCache import GPFResultCache
+from processing_gpf.GPFRunReport import GPFRunReport
+from processing_gpf.GPFStaging import GPFStaging
+
+REPEAT = 20
+SIZES = [100, 300, 1000]
+CHAIN = ["Read", "Calibration", "Speckle-Filter", "Terrain-Correction", "BandMaths", 
+         "BandMaths", "LinearToFromdB", "BandMaths", "Subset", "Write"]
+
+
+# Model of chains of CHAIN operators, each reading the same input product
+def model(size, inputPath, workDir):
+    graph = GPFGraph("Graph")
+    for chain in range(size // len(CHAIN)):
+        sourceID = None
+        for i, operator in enumerate(CHAIN):
+            node = graph.addNode(GPFGraphNode("%s_%d_%d" % (operator, chain, i), operator))
+            if sourceID:
+                node.sources["sourceProduct"] = sourceID
+            if operator == "Read":
+                node.setParameter("file", inputPath)
+            elif operator == "Write":
+                node.setParameter("file", os.path.join(workDir, "output_%d.tif" % chain))
+                node.setParameter("formatName", "GeoTIFF")
+            elif operator == "BandMaths":
+                targetBand = node.setParameter("targetBand", None)
+                ET.SubElement(targetBand, "expression").text = "Sigma0_VV * %d" % i
+            sourceID = node.nodeID
+    return graph
+
+
+def before(graph, workDir):
+    gpf = graph.toXml()
+    # incremental model execution
+    incremental = ET.fromstring(gpf)
+    GPFResultCache.nodeHashes(incremental)
+    gpf = ET.tostring(incremental)
+    GPFRunReport().setGraph(ET.fromstring(gpf))
+    # graph key, restore and store
+    for _ in range(3):
+        GPFResultCache.graphWrites(ET.fromstring(gpf))
+    GPFStaging.stages(ET.fromstring(gpf), workDir, ["Terrain-Correction"])
+
+
+def after(graph, workDir):
+    GPFResultCache.nodeHashes(graph.toElement())
+    parsed = GPFUtils.graphElement(graph)
+    ET.tostring(parsed)
+    GPFRunReport().setGraph(parsed)
+    GPFResultCache.graphWrites(parsed)
+    GPFStaging.stages(parsed, workDir, ["Terrain-Correction"])
+
+
+def measure(function, graph, workDir):
+    start = time.time()
+    for _ in range(REPEAT):
+        function(graph, workDir)
+    return (time.time() - start) / REPEAT * 1000
+
+
+if __name__ == "__main__":
+    workDir = tempfile.mkdtemp()
+    try:
+        inputPath = os.path.join(workDir, "input.tif")
+        with open(inputPath, "w") as inputFile:
+            inputFile.write("input")
+        for size in SIZES:
+            graph = model(size, inputPath, workDir)
+            print "%4d nodes: before %7.2f ms, after %7.2f ms" % (len(graph), measure(before, graph, workDir), 
+                                                               measure(after, graph, workDir))
+    finally:
+        shutil.rmtree(workDir, ignore_errors = True)
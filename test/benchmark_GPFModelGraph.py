@@ -0,0 +1,174 @@
+"""
+***************************************************************************
+    benchmark_GPFModelGraph.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+# Compares building the graph of GPF models of 100 to 1000 nodes as 
+# GPFModelerAlgorithm.toXml did before, with an ElementTree graph in which the
+# nodes are looked up with XPath (graph.find('node[@id=...]/parameters/...'))
+# for every model output and input, and as GPFModelerAlgorithm.toGraph does 
+# now, with a GPFGraph whose nodes are indexed by ID. Both end with the GPF XML
+# of the model. GPFModelerAlgorithm and GPFAlgorithm need QGIS and PyQt4, so 
+# the steps of toXml/toGraph and addGPFNode are repeated here for models of
+# Read -> Speckle-Filter -> BandMaths -> Write chains, with the parameters 
+# from the algorithm description files:
+#   python test/benchmark_GPFModelGraph.py
+
+import os
+import sys
+import time
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import utilities
+from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFGraph import GPFGraph, GPFGraphNode
+from processing_gpf.GPFDescriptionIndex import GPFDescriptionIndex
+
+REPEAT = 20
+SIZES = [100, 300, 1000]
+CHAIN = [("Read", None), ("Speckle-Filter", "s1tbx_description/Speckle-Filter.txt"),
+         ("BandMaths", "snap_generic_description/BandMath.txt"), ("Write", None)]
+
+
+# Names of the non-raster parameters in the description file
+def parameterNames(descriptionFile):
+    if descriptionFile is None:
+        return []
+    names = []
+    for line in GPFDescriptionIndex.readLines(os.path.join(utilities.PLUGIN_FOLDER, descriptionFile)):
+        fields = line.lstrip("*").split("|")
+        if fields[0].startswith("Parameter") and fields[0] != "ParameterRaster":
+            names.append(fields[1])
+    return names
+
+
+# Nodes of the model as (node ID, operator, source node ID, parameter names) tuples
+def model(size):
+    nodes = []
+    for chain in range(size // len(CHAIN)):
+        sourceID = None
+        for operator, descriptionFile in CHAIN:
+            nodeID = "%s_%d" % (operator, chain)
+            nodes.append((nodeID, operator, sourceID, parameterNames(descriptionFile)))
+            sourceID = nodeID
+    return nodes
+
+
+# Parameter elements of GPFAlgorithm.addGPFNode, with nested tags
+def addParameters(parametersNode, names):
+    for name in names:
+        tagList = name.split(">")
+        parentElement = parametersNode
+        for tag in tagList:
+            if tag == tagList[-1]:
+                if len(parentElement.findall(tag)) > 0:
+                    parameter = parentElement.findall(tag)[0]
+                else:
+                    parameter = ET.SubElement(parentElement, tag)
+            elif tag.startswith("!"):
+                parentElement = ET.SubElement(parentElement, tag[1:])
+            else:
+                if len(parentElement.findall(tag)) > 0:
+                    parentElement = (parentElement.findall(tag))[-1]
+                else:
+                    parentElement = ET.SubElement(parentElement, tag)
+        parameter.text = "1"
+
+
+def buildXml(nodes):
+    graph = ET.Element("graph", {'id':"Graph"})
+    ET.SubElement(graph, "version").text = "1.0"
+    for nodeID, operator, sourceID, names in nodes:
+        node = ET.Element("node", {"id":nodeID})
+        ET.SubElement(node, "operator").text = operator
+        sources = ET.SubElement(node, "sources")
+        if sourceID:
+            ET.SubElement(sources, "sourceProduct", {"refid":sourceID})
+        parametersNode = ET.SubElement(node, "parameters")
+        addParameters(parametersNode, names)
+        if operator in ("Read", "Write"):
+            ET.SubElement(parametersNode, "file").text = nodeID + ".dim"
+        graph.append(node)
+        # model output names and model input positions
+        outTag = graph.find('node[@id="'+nodeID+'"]/parameters/file')
+        if outTag is not None:
+            outTag.attrib["qgisModelOutputName"] = nodeID
+        paramTag = graph.find('node[@id="'+nodeID+'"]/parameters/'+(names[0] if names else "file"))
+        if paramTag is not None:
+            paramTag.attrib["qgisModelInputPos"] = "0,0"
+    presentation = ET.SubElement(graph, "applicationData", {"id":"Presentation", "name":"Model", "group":"Models"})
+    ET.SubElement(presentation, "Description")
+    for nodeID, _, _, _ in nodes:
+        node = ET.SubElement(presentation, "node", {"id":nodeID})
+        ET.SubElement(node, "displayPosition", {"x":"0", "y":"0"})
+    GPFUtils.indentXML(graph)
+    return ET.tostring(graph)
+
+
+def buildGraph(nodes):
+    graph = GPFGraph("Graph")
+    for nodeID, operator, sourceID, names in nodes:
+        node = GPFGraphNode(nodeID, operator)
+        if sourceID:
+            node.sources["sourceProduct"] = sourceID
+        addParameters(node.parameters, names)
+        if operator in ("Read", "Write"):
+            node.setParameter("file", nodeID + ".dim")
+        graph.addNode(node)
+        # model output names and model input positions
+        node = graph.node(nodeID)
+        outTag = node.parameter("file")
+        if outTag is not None:
+            outTag.attrib["qgisModelOutputName"] = nodeID
+        paramTag = node.parameter(names[0] if names else "file")
+        if paramTag is not None:
+            paramTag.attrib["qgisModelInputPos"] = "0,0"
+    presentation = graph.addApplicationData({"id":"Presentation", "name":"Model", "group":"Models"})
+    ET.SubElement(presentation, "Description")
+    for nodeID, _, _, _ in nodes:
+        node = ET.SubElement(presentation, "node", {"id":nodeID})
+        ET.SubElement(node, "displayPosition", {"x":"0", "y":"0"})
+    return graph.toXml()
+
+
+def measure(function, nodes):
+    start = time.time()
+    for _ in range(REPEAT):
+        function(nodes)
+    return (time.time() - start) / REPEAT * 1000
+
+
+if __name__ == "__main__":
+    for size in SIZES:
+        nodes = model(size)
+        # Both give the same GPF XML
+        assert buildXml(nodes) == buildGraph(nodes)
+        print "%4d nodes: ElementTree with XPath %8.2f ms, GPFGraph %8.2f ms" % (len(nodes), measure(buildXml, nodes), 
+                                                                              measure(buildGraph, nodes))
@@ -0,0 +1,119 @@
+"""
+***************************************************************************
+    benchmark_GPFOutputReader.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+# Compares reading GPT console output character by character, updating the 
+# progress dialog for every line (as GPFUtils.runGpt did before 
+# GPFOutputReader), with GPFOutputReader. The output is read from a file with
+# the console output of a long SNAP graph execution and the progress dialog
+# only counts the updates:
+#   python test/benchmark_GPFOutputReader.py
+
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import utilities
+from processing_gpf.GPFOutputReader import GPFOutputReader
+
+REPEAT = 5
+LINES = 20000
+
+
+class Progress:
+
+    def __init__(self):
+        self.consoleLines = 0
+        self.percentages = 0
+        self.repaints = 0
+
+    def setConsoleInfo(self, text):
+        self.consoleLines += 1
+
+    def setPercentage(self, percentage):
+        self.percentages += 1
+
+    def repaint(self):
+        self.repaints += 1
+
+
+def consoleOutput():
+    lines = ["INFO: org.esa.snap.core.gpf.operators.tooladapter.ToolAdapterIO: Initializing external tool adapters\n",
+             "Executing processing graph\n"]
+    for i in range(LINES):
+        lines.append("WARNING: org.esa.s1tbx.sar.gpf.geometric.TerrainCorrectionOp: tile %d is outside of the DEM\n" % i)
+    lines.append("".join(["....%d%%" % percentage for percentage in range(10, 101, 10)]) + " done.\n")
+    return "".join(lines)
+
+
+def readByCharacter(path):
+    progress = Progress()
+    loglines = []
+    with open(path) as stream:
+        line = ""
+        for char in iter((lambda: stream.read(1)), ''):
+            line += char
+            if "\n" in line:
+                loglines.append(line)
+                progress.setConsoleInfo(line)
+                progress.repaint()
+                line = ""
+            m = re.search("\.(\d{2,3})\%$", line)
+            if m:
+                progress.setPercentage(int(m.group(1)))
+    return progress, loglines
+
+
+def readInBlocks(path):
+    progress = Progress()
+    loglines = []
+    with open(path) as stream:
+        GPFOutputReader(stream, progress, loglines).readUntil()
+    return progress, loglines
+
+
+def measure(function, path):
+    start = time.time()
+    for _ in range(REPEAT):
+        progress, loglines = function(path)
+    return (time.time() - start) / REPEAT * 1000, progress, loglines
+
+
+if __name__ == "__main__":
+    handle, path = tempfile.mkstemp(suffix = ".txt")
+    try:
+        with os.fdopen(handle, "w") as outputFile:
+            outputFile.write(consoleOutput())
+        for name, function in [("by character", readByCharacter), ("in blocks   ", readInBlocks)]:
+            duration, progress, loglines = measure(function, path)
+            print "%s: %8.2f ms, %d log lines, %d console lines, %d percentages, %d repaints" % (
+                name, duration, len(loglines), progress.consoleLines, progress.percentages, progress.repaints)
+    finally:
+        os.remove(path)
@@ -0,0 +1,91 @@
+"""
+***************************************************************************
+    benchmark_snappyWarmUp.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+# Measures how long the GUI thread is blocked while snappy is warmed up in the
+# background, before (snappy imported with an import statement, which holds the
+# global import lock while the JVM starts) and after (GPFUtils.warmUpSnappy).
+# snappy is replaced by a package whose import takes JVM_START seconds, so 
+# neither SNAP nor QGIS are needed:
+#   python test/benchmark_snappyWarmUp.py
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+
+JVM_START = 3.0
+
+
+def createFakeSnappy(folder):
+    os.makedirs(os.path.join(folder, "snappy"))
+    with open(os.path.join(folder, "snappy", "__init__.py"), "w") as init:
+        init.write("import time\nimport jpy\ntime.sleep(%f)  # jpy.create_jvm\n" % JVM_START)
+    with open(os.path.join(folder, "jpy.py"), "w") as jpy:
+        jpy.write("")
+    # module imported by the "GUI thread" during the warm-up
+    with open(os.path.join(folder, "guimodule.py"), "w") as guiModule:
+        guiModule.write("")
+
+
+def measure(mode, folder):
+    sys.path.insert(0, folder)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import utilities
+    from processing_gpf.GPFUtils import GPFUtils
+    start = time.time()
+    if mode == "before":
+        def warmUp():
+            import snappy
+        thread = threading.Thread(target = warmUp)
+        thread.start()
+    else:
+        thread = GPFUtils.warmUpSnappy()
+    # QGIS keeps starting up in the GUI thread
+    time.sleep(0.1)
+    importStart = time.time()
+    import guimodule
+    blocked = time.time() - importStart
+    thread.join()
+    print "%s: GUI thread import blocked %.2f s, snappy ready after %.2f s" % (mode, blocked, time.time() - start)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        measure(sys.argv[1], sys.argv[2])
+    else:
+        folder = tempfile.mkdtemp(prefix = "gpf_benchmark_")
+        try:
+            createFakeSnappy(folder)
+            for mode in ["before", "after"]:
+                subprocess.check_call([sys.executable, os.path.abspath(__file__), mode, folder])
+        finally:
+            shutil.rmtree(folder, ignore_errors = True)
@@ -0,0 +1,110 @@
+"""
+***************************************************************************
+    test_BEAMBandLister.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import utilities
+from processing_gpf.BEAMBandLister import BEAMBandLister
+
+# Stand-in for listBeamBands in server mode, listing two bands of every product
+FAKE_HELPER = """
+import sys
+print '__bands_ready'
+sys.stdout.flush()
+for request in iter(sys.stdin.readline, ''):
+    if request.strip() == 'QUIT':
+        break
+    filename = request.split('\\t')[0]
+    for band in ['band_1', 'band_2']:
+        print '__band:' + band + '::' + filename
+    print '__bands_done'
+    sys.stdout.flush()
+"""
+
+
+class TestBEAMBandLister(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix = "gpf_test_bands_")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors = True)
+
+    def classFile(self, content):
+        path = os.path.join(self.folder, "listBeamBands.class")
+        with open(path, "wb") as classFile:
+            classFile.write(content)
+        return path
+
+    def testServerModeDetection(self):
+        self.assertTrue(BEAMBandLister.supportsServerMode(self.classFile("\xca\xfe\xba\xbe..__bands_ready..")))
+        self.assertFalse(BEAMBandLister.supportsServerMode(self.classFile("\xca\xfe\xba\xbe.....")))
+        self.assertFalse(BEAMBandLister.supportsServerMode(os.path.join(self.folder, "missing.class")))
+
+    def testOldClassFileIsNotStarted(self):
+        lister = BEAMBandLister(["no-such-command"], self.classFile("\xca\xfe\xba\xbe....."))
+        self.assertTrue(lister.unsupported)
+        self.assertEqual(lister.listBands("product.dim"), None)
+        self.assertEqual(lister.proc, None)
+
+    def testListBands(self):
+        lister = BEAMBandLister([sys.executable, "-c", FAKE_HELPER], self.classFile("__bands_ready"))
+        try:
+            self.assertEqual(lister.listBands("a.dim"), ["band_1::a.dim", "band_2::a.dim"])
+            pid = lister.proc.pid
+            self.assertEqual(lister.listBands(u"b.dim"), ["band_1::b.dim", "band_2::b.dim"])
+            self.assertEqual(lister.proc.pid, pid)
+        finally:
+            lister.stop()
+        self.assertFalse(lister.isRunning())
+
+    def testHelperIsRestarted(self):
+        lister = BEAMBandLister([sys.executable, "-c", FAKE_HELPER])
+        try:
+            lister.listBands("a.dim")
+            lister.proc.kill()
+            lister.proc.wait()
+            self.assertEqual(lister.listBands("c.dim"), ["band_1::c.dim", "band_2::c.dim"])
+        finally:
+            lister.stop()
+
+    def testShippedClassFile(self):
+        # The shipped class file has to be checked, not started, when it predates server mode
+        classFile = os.path.join(utilities.PLUGIN_FOLDER, "processing_beam_java", "listBeamBands.class")
+        if os.path.exists(classFile):
+            lister = BEAMBandLister(["no-such-command"], classFile)
+            self.assertEqual(lister.unsupported, not BEAMBandLister.supportsServerMode(classFile))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+***************************************************************************
+    test_GPFAlgorithmRegistry.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+import unittest
+
+import utilities
+from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFAlgorithmRegistry import GPFAlgorithmRegistry
+
+
+# Stand-in for the GPF algorithms, only the attributes used by the registry
+class FakeAlgorithm:
+
+    def __init__(self, providerName, operator, group = "Raster", name = None):
+        self.providerName = providerName
+        self.operator = operator
+        self.group = group
+        self.name = name or operator
+
+    def commandLineName(self):
+        return self.providerName + ":" + self.operator.lower()
+
+
+class TestGPFAlgorithmRegistry(unittest.TestCase):
+
+    def setUp(self):
+        for setting in [GPFUtils.S1TBX_ACTIVATE, GPFUtils.S2TBX_ACTIVATE, GPFUtils.S3TBX_ACTIVATE]:
+            utilities.setSetting(setting, False)
+        self.registry = GPFAlgorithmRegistry()
+        self.beamSst = FakeAlgorithm("beam", "Aatsr.SST")
+        self.beamSubset = FakeAlgorithm("beam", "Subset")
+        self.beamLakes = FakeAlgorithm("beam", "Meris.Lakes")
+        self.s1Subset = FakeAlgorithm("snap", "Subset", "Sentinel-1")
+        self.snapSubset = FakeAlgorithm("snap", "Subset")
+        self.s3Sst = FakeAlgorithm("snap", "Aatsr.SST", "Sentinel-3")
+
+    def loadBeam(self):
+        self.registry.clear("beam")
+        self.registry.add("beam", self.beamSst, GPFUtils.beamKey())
+        self.registry.add("beam", self.beamSubset, GPFUtils.beamKey())
+        self.registry.add("beam", self.beamLakes, GPFUtils.beamKey())
+
+    def loadSnap(self):
+        self.registry.clear("snap")
+        self.registry.add("snap", self.snapSubset, GPFUtils.snapKey())
+        if utilities.processingConfig().getSetting(GPFUtils.S1TBX_ACTIVATE):
+            self.registry.add("snap", self.s1Subset, GPFUtils.s1tbxKey())
+        if utilities.processingConfig().getSetting(GPFUtils.S3TBX_ACTIVATE):
+            self.registry.add("snap", self.s3Sst, GPFUtils.s3tbxKey())
+
+    def testPrecedenceAcrossToolboxes(self):
+        utilities.setSetting(GPFUtils.S1TBX_ACTIVATE, True)
+        utilities.setSetting(GPFUtils.S3TBX_ACTIVATE, True)
+        self.loadBeam()
+        self.loadSnap()
+        self.assertIs(self.registry.algorithmFromOperator("snap", "Aatsr.SST"), self.s3Sst)
+        self.assertIs(self.registry.algorithmFromOperator("snap", "Subset"), self.s1Subset)
+        self.assertIs(self.registry.algorithmFromOperator("beam", "Subset"), self.beamSubset)
+        # Independent of the load order
+        self.registry = GPFAlgorithmRegistry()
+        self.loadSnap()
+        self.loadBeam()
+        self.assertIs(self.registry.algorithmFromOperator("snap", "Aatsr.SST"), self.s3Sst)
+        self.assertIs(self.registry.algorithmFromOperator("snap", "Subset"), self.s1Subset)
+
+    # A SNAP model must not be bound to algorithms executed by BEAM's gpt
+    def testNoFallbackToOtherProvider(self):
+        self.loadBeam()
+        self.loadSnap()
+        self.assertIs(self.registry.algorithmFromOperator("snap", "Meris.Lakes"), None)
+        self.assertIs(self.registry.algorithmFromOperator("snap", "Aatsr.SST"), None)
+        self.assertIs(self.registry.algorithmFromOperator("beam", "Aatsr.SST"), self.beamSst)
+        self.assertIs(self.registry.algorithmFromOperator("snap", "Unknown"), None)
+
+    def testClearKeepsOtherProvider(self):
+        utilities.setSetting(GPFUtils.S3TBX_ACTIVATE, True)
+        self.loadBeam()
+        self.loadSnap()
+        self.registry.clear("snap")
+        self.assertIs(self.registry.algorithmFromOperator("snap", "Aatsr.SST"), None)
+        self.assertIs(self.registry.algorithmFromOperator("beam", "Aatsr.SST"), self.beamSst)
+        self.assertIs(self.registry.algorithmFromOperator("beam", "Subset"), self.beamSubset)
+        self.assertIs(self.registry.algorithmFromCommandLineName("snap:subset"), None)
+        self.assertIs(self.registry.algorithmFromCommandLineName("beam:subset"), self.beamSubset)
+
+    def testInvalidatedByToolboxActivation(self):
+        self.loadSnap()
+        self.assertTrue(self.registry.isValid("snap"))
+        self.assertFalse(self.registry.isValid("beam"))
+        utilities.setSetting(GPFUtils.S3TBX_ACTIVATE, True)
+        self.assertFalse(self.registry.isValid("snap"))
+        self.loadSnap()
+        self.assertTrue(self.registry.isValid("snap"))
+
+    def testGroupsOfProvider(self):
+        utilities.setSetting(GPFUtils.S3TBX_ACTIVATE, True)
+        self.loadBeam()
+        self.loadSnap()
+        groups = self.registry.groups("snap")
+        self.assertEqual(sorted(groups.keys()), ["Raster", "Sentinel-3"])
+        self.assertEqual(groups["Raster"], [self.snapSubset])
+        self.assertEqual(self.registry.groups("snap", "sst"), {"Sentinel-3": [self.s3Sst]})
+        self.assertEqual(self.registry.groups("beam", "SUB"), {"Raster": [self.beamSubset]})
+
+    def testSharedInstance(self):
+        self.assertIs(GPFAlgorithmRegistry.instance(), GPFAlgorithmRegistry.instance())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+***************************************************************************
+    test_GPFDescriptionIndex.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import utilities
+from processing_gpf.GPFDescriptionIndex import GPFDescriptionIndex
+
+
+class TestGPFDescriptionIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix = "gpf_test_descriptions_")
+        GPFDescriptionIndex.clear()
+        self.write("Subset.txt", "Subset\nCreate a subset\nSubset\nRaster\nParameterRaster|sourceProduct|Source|False\n\nignored\n")
+
+    def tearDown(self):
+        GPFDescriptionIndex.clear()
+        shutil.rmtree(self.folder, ignore_errors = True)
+
+    def write(self, fileName, content, folderMtime = 1000):
+        with open(os.path.join(self.folder, fileName), "w") as descriptionFile:
+            descriptionFile.write(content)
+        os.utime(self.folder, (folderMtime, folderMtime))
+
+    def newSession(self):
+        GPFDescriptionIndex._index = None
+        GPFDescriptionIndex._checked = set()
+        GPFDescriptionIndex._byPath = {}
+
+    def testLines(self):
+        descriptions = GPFDescriptionIndex.descriptions(self.folder)
+        self.assertEqual(descriptions, [(os.path.join(self.folder, "Subset.txt"), 
+                                         ["Subset", "Create a subset", "Subset", "Raster", "ParameterRaster|sourceProduct|Source|False"])])
+        self.assertEqual(GPFDescriptionIndex.lines(os.path.join(self.folder, "Subset.txt"))[0], "Subset")
+
+    def testWarmLoadDoesNotReadFiles(self):
+        GPFDescriptionIndex.descriptions(self.folder)
+        self.newSession()
+        readLines = GPFDescriptionIndex.readLines
+        try:
+            GPFDescriptionIndex.readLines = staticmethod(lambda descriptionFile: self.fail("read " + descriptionFile))
+            descriptions = GPFDescriptionIndex.descriptions(self.folder)
+        finally:
+            GPFDescriptionIndex.readLines = staticmethod(readLines)
+        self.assertEqual(descriptions[0][1][0], "Subset")
+
+    def testChangedFolderIsUpdated(self):
+        GPFDescriptionIndex.descriptions(self.folder)
+        self.newSession()
+        self.write("BandMaths.txt", "BandMaths\nBand maths\nBand Maths\nRaster\n", folderMtime = 2000)
+        os.remove(os.path.join(self.folder, "Subset.txt"))
+        os.utime(self.folder, (2000, 2000))
+        descriptions = GPFDescriptionIndex.descriptions(self.folder)
+        self.assertEqual([lines[0] for _, lines in descriptions], ["BandMaths"])
+
+    def testEditedFileIsUpdated(self):
+        GPFDescriptionIndex.descriptions(self.folder)
+        self.newSession()
+        # Editing the file in place doesn't change the folder's modification time
+        self.write("Subset.txt", "Subset\nCreate a spatial subset\nSubset\nRaster\n")
+        os.utime(os.path.join(self.folder, "Subset.txt"), (3000, 3000))
+        descriptions = GPFDescriptionIndex.descriptions(self.folder)
+        self.assertEqual(descriptions[0][1][1], "Create a spatial subset")
+
+    def testFolderCheckedOncePerSession(self):
+        GPFDescriptionIndex.descriptions(self.folder)
+        self.write("BandMaths.txt", "BandMaths\nBand maths\nBand Maths\nRaster\n", folderMtime = 2000)
+        self.assertEqual(len(GPFDescriptionIndex.descriptions(self.folder)), 1)
+        self.newSession()
+        self.assertEqual(len(GPFDescriptionIndex.descriptions(self.folder)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
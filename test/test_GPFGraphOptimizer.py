@@ -0,0 +1,139 @@
+"""
+***************************************************************************
+    test_GPFGraphOptimizer.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+import unittest
+
+import utilities
+from processing_gpf.GPFGraph import GPFGraph, GPFGraphNode
+from processing_gpf.GPFGraphOptimizer import GPFGraphOptimizer
+
+
+# GPF graph of (node ID, operator, source node IDs, parameters) tuples
+def buildGraph(nodes):
+    graph = GPFGraph("Graph")
+    for nodeID, operator, sourceIDs, parameters in nodes:
+        node = graph.addNode(GPFGraphNode(nodeID, operator))
+        for i, sourceID in enumerate(sourceIDs):
+            node.sources["sourceProduct" + (".%d" % i if i else "")] = sourceID
+        for name, value in parameters:
+            node.setParameter(name, value)
+    return graph
+
+
+def nodeIDs(graph):
+    return [node.nodeID for node in graph.nodes()]
+
+
+class TestGPFGraphOptimizer(unittest.TestCase):
+
+    def testMergeReads(self):
+        graph = buildGraph([("Read", "Read", [], [("file", "a.dim")]), ("Read(2)", "Read", [], [("file", "a.dim")]),
+                            ("Merge", "BandMerge", ["Read", "Read(2)"], []), ("Write", "Write", ["Merge"], [("file", "out.dim")])])
+        GPFGraphOptimizer.optimize(graph)
+        self.assertEqual(nodeIDs(graph), ["Read", "Merge", "Write"])
+        self.assertEqual(graph.node("Merge").sources.values(), ["Read", "Read"])
+
+    def testCollapseNoOpSubset(self):
+        graph = buildGraph([("Read", "Read", [], [("file", "a.dim")]), 
+                            ("Subset", "Subset", ["Read"], [("region", ""), ("copyMetadata", "true")]),
+                            ("Write", "Write", ["Subset"], [("file", "out.dim")])])
+        GPFGraphOptimizer.optimize(graph)
+        self.assertEqual(nodeIDs(graph), ["Read", "Write"])
+        self.assertEqual(graph.node("Write").sources.values(), ["Read"])
+
+    def testPruneDeadBranches(self):
+        graph = buildGraph([("Read", "Read", [], [("file", "a.dim")]), ("Read(2)", "Read", [], [("file", "b.dim")]),
+                            ("BandMaths", "BandMaths", ["Read(2)"], []),
+                            ("Write", "Write", ["Read"], [("file", "out.dim")])])
+        GPFGraphOptimizer.optimize(graph)
+        self.assertEqual(nodeIDs(graph), ["Read", "Write"])
+
+    def testKeepOperatorsWritingFiles(self):
+        # StatisticsOp writes outputAsciiFile and PixEx its own output files,
+        # their products don't reach the Write node
+        graph = buildGraph([("Read", "Read", [], [("file", "a.dim")]), ("Read(2)", "Read", [], [("file", "b.dim")]),
+                            ("Calibration", "Calibration", ["Read(2)"], []),
+                            ("StatisticsOp", "StatisticsOp", ["Calibration"], [("outputAsciiFile", "stats.txt")]),
+                            ("PixEx", "PixEx", ["Read"], [("outputDir", "pixex")]),
+                            ("Write", "Write", ["Read"], [("file", "out.dim")])])
+        GPFGraphOptimizer.optimize(graph)
+        self.assertEqual(nodeIDs(graph), ["Read", "Read(2)", "Calibration", "StatisticsOp", "PixEx", "Write"])
+
+    def testKeepNodes(self):
+        graph = buildGraph([("Read", "Read", [], [("file", "a.dim")]), ("BandMaths", "BandMaths", ["Read"], []),
+                            ("Write", "Write", ["Read"], [("file", "out.dim")])])
+        GPFGraphOptimizer.optimize(graph, keep = ["BandMaths"])
+        self.assertEqual(nodeIDs(graph), ["Read", "BandMaths", "Write"])
+
+    def subsetChain(self, productFile, geoRegion, operators = ["Calibration"]):
+        nodes = [("Read", "Read", [], [("file", productFile)])]
+        for operator in operators:
+            nodes.append((operator, operator, [nodes[-1][0]], []))
+        nodes.append(("Subset", "Subset", [nodes[-1][0]], [("geoRegion", geoRegion), ("copyMetadata", "true")]))
+        nodes.append(("Write", "Write", ["Subset"], [("file", "out.dim")]))
+        return GPFGraphOptimizer.optimize(buildGraph(nodes))
+
+    def testSubsetPushedBeforeCalibrationOfGrd(self):
+        graph = self.subsetChain("S1A_IW_GRDH_1SDV_20170101T000000.zip", "POLYGON((10 50, 10 51, 11 51, 11 50, 10 50))")
+        self.assertEqual(graph.node("Calibration").sources.values(), ["Subset_pushdown"])
+        self.assertEqual(graph.node("Subset_pushdown").sources.values(), ["Read"])
+        self.assertEqual(GPFGraphOptimizer.polygonExtent(graph.node("Subset_pushdown").parameter("geoRegion").text),
+                         (9.99, 11.01, 49.99, 51.01))
+
+    def testSubsetNotPushedBeforeCalibrationOfSlc(self):
+        graph = self.subsetChain("S1A_IW_SLC__1SDV_20170101T000000.SAFE/manifest.safe", "POLYGON((10 50, 10 51, 11 51, 11 50, 10 50))",
+                                 ["Calibration", "BandMaths"])
+        self.assertEqual(graph.node("Calibration").sources.values(), ["Read"])
+        self.assertEqual(graph.node("BandMaths").sources.values(), ["Subset_pushdown"])
+        self.assertEqual(graph.node("Subset_pushdown").sources.values(), ["Calibration"])
+
+    def testSubsetNotPushedBeforeCalibrationOfUnknownProduct(self):
+        graph = self.subsetChain("", "POLYGON((10 50, 10 51, 11 51, 11 50, 10 50))")
+        self.assertEqual(graph.node("Subset_pushdown"), None)
+
+    def testPushedSubsetClampedToValidLongitudes(self):
+        graph = self.subsetChain("product.dim", "POLYGON((179 50, 179 51, 179.995 51, 179.995 50, 179 50))", ["BandMaths"])
+        self.assertEqual(GPFGraphOptimizer.polygonExtent(graph.node("Subset_pushdown").parameter("geoRegion").text),
+                         (178.99, 180.0, 49.99, 51.01))
+
+    def testSubsetCrossingAntimeridianNotPushed(self):
+        for geoRegion in ["POLYGON((179 50, 179 51, -179 51, -179 50, 179 50))",
+                          "POLYGON((179 50, 179 51, 181 51, 181 50, 179 50))"]:
+            graph = self.subsetChain("product.dim", geoRegion, ["BandMaths"])
+            self.assertEqual(graph.node("Subset_pushdown"), None)
+            self.assertEqual(graph.node("BandMaths").sources.values(), ["Read"])
+
+    def testGraphWithoutWriteIsNotPruned(self):
+        graph = buildGraph([("Read", "Read", [], [("file", "a.dim")]), ("BandMaths", "BandMaths", ["Read"], [])])
+        GPFGraphOptimizer.optimize(graph)
+        self.assertEqual(nodeIDs(graph), ["Read", "BandMaths"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+***************************************************************************
+    test_GPFJobQueue.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+import unittest
+
+import utilities
+from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFJobQueue import GPFJobQueue, GPFJobFeedback
+
+
+class TestGPFJobQueue(unittest.TestCase):
+
+    PHYSICAL = 4096
+
+    def setUp(self):
+        utilities.setSetting(GPFUtils.SNAP_MAX_HEAP, 0)
+        utilities.setSetting(GPFUtils.SNAP_TILE_CACHE, 0)
+        utilities.setSetting(GPFUtils.GPF_PARALLEL_JOBS, 4)
+        self.physicalMemory = GPFUtils.physicalMemory
+        self.runGpt = GPFUtils.runGpt
+        GPFUtils.physicalMemory = staticmethod(lambda: TestGPFJobQueue.PHYSICAL)
+        self.memories = []
+        def runGpt(key, gpfPath, threads, progress, loglines, memory = None, report = None):
+            self.memories.append(memory)
+            return 0
+        GPFUtils.runGpt = staticmethod(runGpt)
+
+    def tearDown(self):
+        GPFUtils.physicalMemory = staticmethod(self.physicalMemory)
+        GPFUtils.runGpt = staticmethod(self.runGpt)
+        utilities.setSetting(GPFUtils.GPF_PARALLEL_JOBS, None)
+
+    def testHeapIsSplitBetweenParallelJobs(self):
+        self.assertEqual(GPFUtils.jvmMemory(1)["heap"], 3072)
+        self.assertEqual(GPFUtils.jvmMemory(3)["heap"], 1024)
+        self.assertEqual(GPFUtils.jvmMemory(3)["tileCache"], 512)
+
+    def testParallelJobsLimitedByMemory(self):
+        self.assertEqual(GPFUtils.memoryParallelJobs(), 3)
+        self.assertEqual(GPFJobQueue().concurrency(), 3)
+        TestGPFJobQueue.PHYSICAL = 1024
+        try:
+            self.assertEqual(GPFUtils.memoryParallelJobs(), 1)
+            self.assertEqual(GPFUtils.jvmMemory(GPFJobQueue().concurrency())["heap"], 768)
+        finally:
+            TestGPFJobQueue.PHYSICAL = 4096
+        # Heap size given in the settings
+        utilities.setSetting(GPFUtils.SNAP_MAX_HEAP, 2048)
+        self.assertEqual(GPFUtils.memoryParallelJobs(), None)
+        self.assertEqual(GPFJobQueue().concurrency(), 4)
+
+    def testParallelJobsPerProvider(self):
+        utilities.setSetting(GPFUtils.BEAM_PARALLEL_JOBS, 3)
+        try:
+            self.assertEqual(GPFUtils.maxParallelJobs(GPFUtils.beamKey()), 3)
+            self.assertEqual(GPFUtils.maxParallelJobs(GPFUtils.snapKey()), 4)
+        finally:
+            utilities.setSetting(GPFUtils.BEAM_PARALLEL_JOBS, None)
+        # Default of a provider whose setting isn't registered
+        self.assertEqual(GPFUtils.maxParallelJobs(GPFUtils.beamKey()), 2)
+
+    def testQueueUsesProviderSetting(self):
+        utilities.setSetting(GPFUtils.BEAM_PARALLEL_JOBS, 6)
+        try:
+            # BEAM jobs aren't limited by the SNAP memory settings
+            self.assertEqual(GPFJobQueue(key = GPFUtils.beamKey()).concurrency(), 6)
+            self.assertEqual(GPFJobQueue(key = GPFUtils.snapKey()).concurrency(), 3)
+        finally:
+            utilities.setSetting(GPFUtils.BEAM_PARALLEL_JOBS, None)
+
+    def testQueuedJobsShareMemory(self):
+        job = GPFJobQueue().submit(GPFUtils.snapKey(), "<graph/>", GPFJobFeedback())
+        job.wait()
+        self.assertEqual(self.memories[0]["heap"], 1024)
+
+    def testRunningExecutionsShareMemory(self):
+        GPFUtils.executeGpf(GPFUtils.snapKey(), "<graph/>", GPFJobFeedback(), useCache = False)
+        self.assertEqual(self.memories[-1]["heap"], 3072)
+        # Another GPT execution is already running
+        GPFUtils.startedGpt()
+        try:
+            GPFUtils.executeGpf(GPFUtils.snapKey(), "<graph/>", GPFJobFeedback(), useCache = False)
+        finally:
+            GPFUtils.finishedGpt()
+        self.assertEqual(self.memories[-1]["heap"], 1536)
+
+
+if __name__ == "__main__":
+    unittest.main()
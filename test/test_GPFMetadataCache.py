@@ -0,0 +1,72 @@
+"""
+***************************************************************************
+    test_GPFMetadataCache.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import utilities
+from processing_gpf.GPFMetadataCache import GPFMetadataCache
+
+
+class TestGPFMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix = "gpf_test_cache_")
+        self.product = os.path.join(self.folder, "product.dim")
+        with open(self.product, "w") as f:
+            f.write("<Dimap_Document/>")
+        GPFMetadataCache.clear()
+
+    def tearDown(self):
+        GPFMetadataCache.clear()
+        shutil.rmtree(self.folder, ignore_errors = True)
+
+    def testLookup(self):
+        self.assertEqual(GPFMetadataCache.lookup(self.product, "product"), None)
+        GPFMetadataCache.store(self.product, "product", {"bands": ["B1"]})
+        self.assertEqual(GPFMetadataCache.lookup(self.product, "product"), {"bands": ["B1"]})
+        # Product changed
+        os.utime(self.product, (1000, 1000))
+        self.assertEqual(GPFMetadataCache.lookup(self.product, "product"), None)
+
+    def testCallersCanModifyValues(self):
+        value = {"bands": ["B1"]}
+        GPFMetadataCache.store(self.product, "product", value)
+        value["bands"].append("stored")
+        GPFMetadataCache.lookup(self.product, "product")["bands"].append("memory")
+        self.assertEqual(GPFMetadataCache.lookup(self.product, "product"), {"bands": ["B1"]})
+        # Read from the database
+        GPFMetadataCache._memory.clear()
+        GPFMetadataCache.lookup(self.product, "product")["bands"].append("database")
+        self.assertEqual(GPFMetadataCache.lookup(self.product, "product"), {"bands": ["B1"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+***************************************************************************
+    test_GPFOutputReader.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import threading
+import time
+import unittest
+
+import utilities
+from processing_gpf.GPFOutputReader import GPFOutputReader
+
+
+class Progress:
+
+    def __init__(self):
+        self.percentages = []
+        self.console = []
+
+    def setPercentage(self, percentage):
+        self.percentages.append(percentage)
+
+    def setConsoleInfo(self, text):
+        self.console.append(text)
+
+
+class TestGPFOutputReader(unittest.TestCase):
+
+    def read(self, output, endMarker = None):
+        readFd, writeFd = os.pipe()
+        os.write(writeFd, output)
+        os.close(writeFd)
+        progress = Progress()
+        loglines = []
+        with os.fdopen(readFd) as stream:
+            line = GPFOutputReader(stream, progress, loglines).readUntil(endMarker)
+        return progress, loglines, line
+
+    def testConsoleLinesPassedOneByOne(self):
+        progress, loglines, _ = self.read("INFO: first\r\nWARNING: second\nExecuting processing graph\n")
+        self.assertEqual(loglines, ["INFO: first\n", "WARNING: second\n", "Executing processing graph\n"])
+        self.assertEqual(progress.console, loglines)
+
+    def testProgressOfUnfinishedLine(self):
+        progress, loglines, _ = self.read("Executing processing graph\n....10%....20%....30%")
+        self.assertEqual(progress.percentages[-1], 30)
+        self.assertEqual(loglines[-1], "....10%....20%....30%\n")
+
+    def testProgressOnlyFromEndOfLine(self):
+        progress, _, _ = self.read("....10%....20%\nWARNING: 1.25% of the tiles are outside of the DEM\n")
+        self.assertEqual(progress.percentages, [20])
+        progress, _, _ = self.read("....10%....20%....30%....40%....50%....60%....70%....80%....90% done.\n")
+        self.assertEqual(progress.percentages, [90])
+
+    def testOutputPassedBeforeWaiting(self):
+        readFd, writeFd = os.pipe()
+        progress = Progress()
+        interval = GPFOutputReader.UPDATE_INTERVAL
+        GPFOutputReader.UPDATE_INTERVAL = 60
+        try:
+            with os.fdopen(readFd) as stream:
+                reader = threading.Thread(target = GPFOutputReader(stream, progress).readUntil)
+                reader.start()
+                try:
+                    os.write(writeFd, "first\n")
+                    self.assertTrue(self.waitFor(lambda: progress.console == ["first\n"]))
+                    # Throttled, but GPT doesn't print anything else for a while
+                    os.write(writeFd, "second\n....10%")
+                    self.assertTrue(self.waitFor(lambda: progress.percentages == [10]))
+                    self.assertEqual(progress.console, ["first\n", "second\n"])
+                finally:
+                    os.close(writeFd)
+                    reader.join()
+        finally:
+            GPFOutputReader.UPDATE_INTERVAL = interval
+
+    def waitFor(self, condition, timeout = 5):
+        end = time.time() + timeout
+        while not condition() and time.time() < end:
+            time.sleep(0.01)
+        return condition()
+
+    def testEndMarker(self):
+        progress, loglines, line = self.read("first\nDONE0\nsecond\n", "DONE")
+        self.assertEqual(line, "DONE0\n")
+        self.assertEqual(progress.console, ["first\n"])
+
+
+if __name__ == "__main__":
+    unittest.main()
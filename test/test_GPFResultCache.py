@@ -0,0 +1,243 @@
+"""
+***************************************************************************
+    test_GPFResultCache.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+import utilities
+from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFGraph import GPFGraph, GPFGraphNode
+from processing_gpf.GPFResultCache import GPFResultCache
+from processing_gpf.GPFRunReport import GPFRunReport
+from processing_gpf.GPFJobQueue import GPFJobFeedback
+
+
+class TestGPFResultCache(unittest.TestCase):
+
+    def setUp(self):
+        utilities.clearUserFolder()
+        utilities.setSetting(GPFUtils.GPF_CACHE_ACTIVATE, True)
+        utilities.setSetting(GPFUtils.GPF_GRAPH_STAGING, False)
+        self.folder = tempfile.mkdtemp()
+        self.inputPath = os.path.join(self.folder, "input.tif")
+        with open(self.inputPath, "w") as inputFile:
+            inputFile.write("input")
+        # GPT writes the Write node outputs of the executed graph
+        self.runGpt = GPFUtils.runGpt
+        self.executed = []
+        def runGpt(key, gpfPath, threads, progress, loglines, memory = None, report = None):
+            graph = ET.parse(gpfPath).getroot()
+            self.executed.append(graph)
+            for node in graph.findall("node"):
+                if node.findtext("operator") == "Write":
+                    with open(node.findtext("parameters/file"), "w") as outputFile:
+                        outputFile.write("output of " + node.attrib["id"])
+            return 0
+        GPFUtils.runGpt = staticmethod(runGpt)
+
+    def tearDown(self):
+        GPFUtils.runGpt = staticmethod(self.runGpt)
+        utilities.setSetting(GPFUtils.GPF_CACHE_ACTIVATE, None)
+        utilities.setSetting(GPFUtils.GPF_GRAPH_STAGING, None)
+        shutil.rmtree(self.folder, ignore_errors = True)
+        utilities.clearUserFolder()
+
+    def graph(self, outputName = "output.tif", expression = "B1"):
+        graph = GPFGraph("Graph")
+        node = graph.addNode(GPFGraphNode("Read", "Read"))
+        node.setParameter("file", self.inputPath)
+        node = graph.addNode(GPFGraphNode("BandMaths", "BandMaths"))
+        node.sources["sourceProduct"] = "Read"
+        node.setParameter("expression", expression)
+        node = graph.addNode(GPFGraphNode("Write", "Write"))
+        node.sources["sourceProduct"] = "BandMaths"
+        node.setParameter("file", os.path.join(self.folder, outputName))
+        node.setParameter("formatName", "GeoTIFF")
+        return graph
+
+    def testGraphElement(self):
+        graph = self.graph()
+        self.assertEqual(ET.tostring(GPFUtils.graphElement(graph)), graph.toXml())
+        self.assertEqual(GPFUtils.graphElement(graph.toXml()).findtext("node/operator"), "Read")
+        self.assertEqual(GPFUtils.graphElement("<graph"), None)
+
+    def testGraphWritesAndKey(self):
+        writes = GPFResultCache.graphWrites(GPFUtils.graphElement(self.graph()))
+        self.assertEqual([outputFile for _, outputFile in writes], [os.path.join(self.folder, "output.tif")])
+        # The output location doesn't change the key but the parameters do
+        otherOutput = GPFResultCache.graphWrites(GPFUtils.graphElement(self.graph("other.tif")))
+        otherExpression = GPFResultCache.graphWrites(GPFUtils.graphElement(self.graph(expression = "B2")))
+        self.assertEqual(GPFResultCache.graphKey(writes), GPFResultCache.graphKey(otherOutput))
+        self.assertNotEqual(GPFResultCache.graphKey(writes), GPFResultCache.graphKey(otherExpression))
+        # Graphs which can't be cached
+        self.assertEqual(GPFResultCache.graphWrites(None), None)
+        self.assertEqual(GPFResultCache.graphKey(None), None)
+        os.remove(self.inputPath)
+        self.assertEqual(GPFResultCache.graphWrites(GPFUtils.graphElement(self.graph())), None)
+
+    def testExecutedGraphIsRestored(self):
+        report = GPFRunReport()
+        self.assertEqual(GPFUtils.executeGpf(GPFUtils.snapKey(), self.graph(), GPFJobFeedback(), report = report), 0)
+        self.assertEqual(len(self.executed), 1)
+        self.assertEqual([operator for _, operator in report.operators], ["Read", "BandMaths", "Write"])
+        self.assertFalse(report.cacheHit)
+        # Same graph given as GPF XML, written to another file
+        report = GPFRunReport()
+        self.assertEqual(GPFUtils.executeGpf(GPFUtils.snapKey(), self.graph("other.tif").toXml(), GPFJobFeedback(), report = report), 0)
+        self.assertEqual(len(self.executed), 1)
+        self.assertTrue(report.cacheHit)
+        with open(os.path.join(self.folder, "other.tif")) as outputFile:
+            self.assertEqual(outputFile.read(), "output of Write")
+
+    def hashes(self, graph):
+        return GPFResultCache.nodeHashes(GPFUtils.graphElement(graph))
+
+    def testNodeHashesIgnoreNodeIDsAndModelAttributes(self):
+        hashes = self.hashes(self.graph())
+        graph = GPFGraph("Graph")
+        node = graph.addNode(GPFGraphNode("Read_2", "Read"))
+        node.setParameter("file", self.inputPath)
+        node = graph.addNode(GPFGraphNode("BandMaths_7", "BandMaths"))
+        node.sources["sourceProduct"] = "Read_2"
+        node.setParameter("expression", "B1").attrib["qgisModelInputPos"] = "10,20"
+        self.assertEqual(self.hashes(graph)["BandMaths_7"], hashes["BandMaths"])
+
+    def testNodeHashesFollowInputFiles(self):
+        hashes = self.hashes(self.graph())
+        # The same input with another modification time
+        os.utime(self.inputPath, (0, 0))
+        changed = self.hashes(self.graph())
+        self.assertNotEqual(changed["Read"], hashes["Read"])
+        self.assertNotEqual(changed["Write"], hashes["Write"])
+        with open(self.inputPath, "w") as inputFile:
+            inputFile.write("other input")
+        self.assertNotEqual(self.hashes(self.graph())["Read"], changed["Read"])
+        # Sources are hashed by content, not by node ID
+        graph = self.graph()
+        graph.node("BandMaths").sources["sourceProduct"] = "Missing"
+        self.assertNotEqual(self.hashes(graph)["BandMaths"], self.hashes(self.graph())["BandMaths"])
+
+    def testCachedEntryIsCopy(self):
+        GPFUtils.executeGpf(GPFUtils.snapKey(), self.graph(), GPFJobFeedback())
+        # Output overwritten in place after it was stored
+        outputPath = os.path.join(self.folder, "output.tif")
+        with open(outputPath, "w") as outputFile:
+            outputFile.write("edited")
+        GPFUtils.executeGpf(GPFUtils.snapKey(), self.graph("restored.tif"), GPFJobFeedback())
+        restoredPath = os.path.join(self.folder, "restored.tif")
+        with open(restoredPath) as restoredFile:
+            self.assertEqual(restoredFile.read(), "output of Write")
+        # Restored output edited in place doesn't change the entry either
+        with open(restoredPath, "w") as restoredFile:
+            restoredFile.write("edited")
+        GPFUtils.executeGpf(GPFUtils.snapKey(), self.graph("again.tif"), GPFJobFeedback())
+        with open(os.path.join(self.folder, "again.tif")) as againFile:
+            self.assertEqual(againFile.read(), "output of Write")
+        self.assertEqual(len(self.executed), 1)
+
+    def testCopyOutputDoesNotWriteThroughLinks(self):
+        if not hasattr(os, "link"):
+            return
+        source = os.path.join(self.folder, "source.tif")
+        target = os.path.join(self.folder, "target.tif")
+        linked = os.path.join(self.folder, "linked.tif")
+        with open(source, "w") as sourceFile:
+            sourceFile.write("new")
+        with open(target, "w") as targetFile:
+            targetFile.write("old")
+        os.link(target, linked)
+        GPFResultCache.copyOutput(source, target)
+        with open(target) as targetFile:
+            self.assertEqual(targetFile.read(), "new")
+        with open(linked) as linkedFile:
+            self.assertEqual(linkedFile.read(), "old")
+
+    def testRestoredDimapHeaderRefersToItsDataFolder(self):
+        def runGpt(key, gpfPath, threads, progress, loglines, memory = None, report = None):
+            self.executed.append(gpfPath)
+            base = os.path.join(self.folder, "output")
+            os.mkdir(base + ".data")
+            with open(base + ".data" + os.sep + "band.img", "w") as bandFile:
+                bandFile.write("band")
+            with open(base + ".dim", "w") as dimFile:
+                dimFile.write("<DATA_FILE_PATH href=\"output.data/band.hdr\"/>")
+            return 0
+        GPFUtils.runGpt = staticmethod(runGpt)
+        GPFUtils.executeGpf(GPFUtils.snapKey(), self.graph("output.dim"), GPFJobFeedback())
+        GPFUtils.executeGpf(GPFUtils.snapKey(), self.graph("restored.dim"), GPFJobFeedback())
+        self.assertEqual(len(self.executed), 1)
+        with open(os.path.join(self.folder, "restored.dim")) as dimFile:
+            self.assertEqual(dimFile.read(), "<DATA_FILE_PATH href=\"restored.data/band.hdr\"/>")
+        self.assertTrue(os.path.exists(os.path.join(self.folder, "restored.data", "band.img")))
+
+    def testIntermediates(self):
+        path = GPFResultCache.newIntermediatePath()
+        self.assertEqual(GPFResultCache.intermediatePath("abc"), None)
+        with open(path, "w") as dimFile:
+            dimFile.write("intermediate")
+        GPFResultCache.storeIntermediate("abc", path)
+        self.assertFalse(os.path.exists(path))
+        with open(GPFResultCache.intermediatePath("abc")) as dimFile:
+            self.assertEqual(dimFile.read(), "intermediate")
+        # Failed executions leave nothing behind
+        path = GPFResultCache.newIntermediatePath()
+        GPFResultCache.discardIntermediate(path)
+        self.assertFalse(os.path.exists(os.path.dirname(path)))
+
+    def testEviction(self):
+        utilities.setSetting(GPFUtils.GPF_CACHE_SIZE, 0)
+        try:
+            GPFUtils.executeGpf(GPFUtils.snapKey(), self.graph(), GPFJobFeedback())
+            GPFUtils.executeGpf(GPFUtils.snapKey(), self.graph("other.tif"), GPFJobFeedback())
+            self.assertEqual(len(self.executed), 2)
+        finally:
+            utilities.setSetting(GPFUtils.GPF_CACHE_SIZE, None)
+
+    def testStagedGraph(self):
+        utilities.setSetting(GPFUtils.GPF_GRAPH_STAGING, True)
+        utilities.setSetting(GPFUtils.GPF_STAGING_OPERATORS, "BandMaths")
+        try:
+            graph = self.graph()
+            node = graph.addNode(GPFGraphNode("Filter", "Image-Filter"))
+            node.sources["sourceProduct"] = "BandMaths"
+            graph.node("Write").sources["sourceProduct"] = "Filter"
+            self.assertEqual(GPFUtils.executeGpf(GPFUtils.snapKey(), graph, GPFJobFeedback()), 0)
+            self.assertEqual(len(self.executed), 2)
+            self.assertEqual(self.executed[1].findtext("node/operator"), "Read")
+        finally:
+            utilities.setSetting(GPFUtils.GPF_STAGING_OPERATORS, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
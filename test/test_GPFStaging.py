@@ -0,0 +1,110 @@
+"""
+***************************************************************************
+    test_GPFStaging.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+import unittest
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+import utilities
+from processing_gpf.GPFStaging import GPFStaging
+
+
+# Parsed GPF graph of (node ID, operator, source node IDs) tuples
+def parsedGraph(nodes):
+    graph = ET.Element("graph", {"id":"Graph"})
+    ET.SubElement(graph, "version").text = "1.0"
+    for nodeId, operator, sourceIds in nodes:
+        node = ET.SubElement(graph, "node", {"id":nodeId})
+        ET.SubElement(node, "operator").text = operator
+        sources = ET.SubElement(node, "sources")
+        for i, sourceId in enumerate(sourceIds):
+            ET.SubElement(sources, "sourceProduct" + (".%d" % i if i else ""), {"refid":sourceId})
+        parameters = ET.SubElement(node, "parameters")
+        if operator in ("Read", "Write"):
+            ET.SubElement(parameters, "file").text = nodeId + ".dim"
+    return graph
+
+
+class TestGPFStaging(unittest.TestCase):
+
+    def stages(self, nodes):
+        stages = GPFStaging.stages(parsedGraph(nodes), "work", ["Terrain-Correction"])
+        if stages is None:
+            return None
+        return [dict([(node.attrib["id"], node) for node in ET.fromstring(gpf).findall("node")]) for gpf, _ in stages]
+
+    def computed(self, stages, nodeId):
+        return [i for i, stage in enumerate(stages) if nodeId in stage and stage[nodeId].findtext("operator") != "Read"]
+
+    def testGraphWithoutCut(self):
+        self.assertEqual(self.stages([("Read", "Read", []), ("Cal", "Calibration", ["Read"]), 
+                                      ("Write", "Write", ["Cal"])]), None)
+
+    def testChain(self):
+        stages = self.stages([("Read", "Read", []), ("TC", "Terrain-Correction", ["Read"]),
+                              ("dB", "LinearToFromdB", ["TC"]), ("Write", "Write", ["dB"])])
+        self.assertEqual(len(stages), 2)
+        self.assertEqual(sorted(stages[0].keys()), ["Read", "TC", "TC_stage"])
+        self.assertEqual(stages[1]["TC"].findtext("operator"), "Read")
+        self.assertEqual(stages[1]["TC"].findtext("parameters/file"), stages[0]["TC_stage"].findtext("parameters/file"))
+        self.assertEqual(sorted(stages[1].keys()), ["TC", "Write", "dB"])
+
+    def testWriteOfSharedNodeInEarlierStage(self):
+        stages = self.stages([("Read", "Read", []), ("Cal", "Calibration", ["Read"]), ("Write1", "Write", ["Cal"]),
+                              ("TC", "Terrain-Correction", ["Cal"]), ("dB", "LinearToFromdB", ["TC"]),
+                              ("Write2", "Write", ["dB"])])
+        self.assertEqual(len(stages), 2)
+        self.assertEqual(self.computed(stages, "Cal"), [0])
+        self.assertEqual(self.computed(stages, "Write1"), [0])
+        self.assertEqual(self.computed(stages, "Write2"), [1])
+        self.assertEqual(self.computed(stages, "TC"), [0])
+
+    def testSharedNodeReadFromIntermediate(self):
+        stages = self.stages([("Read", "Read", []), ("Cal", "Calibration", ["Read"]),
+                              ("TC", "Terrain-Correction", ["Cal"]), ("Merge", "BandMerge", ["TC", "Cal"]),
+                              ("Write", "Write", ["Merge"])])
+        self.assertEqual(len(stages), 2)
+        self.assertEqual(self.computed(stages, "Cal"), [0])
+        self.assertIn("Cal_stage", stages[0])
+        self.assertEqual(stages[1]["Cal"].findtext("operator"), "Read")
+        self.assertEqual(stages[1]["Cal"].findtext("parameters/file"), stages[0]["Cal_stage"].findtext("parameters/file"))
+        self.assertNotIn("Read", stages[1])
+
+    def testReadNodesAreReadAgain(self):
+        stages = self.stages([("Read", "Read", []), ("TC", "Terrain-Correction", ["Read"]),
+                              ("Merge", "BandMerge", ["TC", "Read"]), ("Write", "Write", ["Merge"])])
+        self.assertEqual(len(stages), 2)
+        self.assertEqual(sorted(stages[0].keys()), ["Read", "TC", "TC_stage"])
+        self.assertEqual(stages[1]["Read"].findtext("parameters/file"), "Read.dim")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+***************************************************************************
+    test_GPFTiling.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+import unittest
+
+import utilities
+from processing.core.GeoAlgorithmExecutionException import GeoAlgorithmExecutionException
+from processing_gpf import GPFTiling as tilingModule
+from processing_gpf.GPFTiling import GPFTiling
+from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFGraph import GPFGraph, GPFGraphNode
+
+
+# Stand-in for GDAL opening tile outputs with the given projection
+class FakeGdal:
+
+    GA_ReadOnly = 0
+
+    class Dataset:
+        def __init__(self, projection):
+            self.projection = projection
+
+        def GetProjection(self):
+            return self.projection
+
+    def __init__(self, projection):
+        self.projection = projection
+
+    def Open(self, path, access):
+        return FakeGdal.Dataset(self.projection)
+
+
+class TestGPFTiling(unittest.TestCase):
+
+    def testCanTile(self):
+        self.assertTrue(GPFTiling.canTile(GPFUtils.snapKey(), "BandMaths"))
+        self.assertTrue(GPFTiling.canTile(GPFUtils.s1tbxKey(), "Terrain-Correction"))
+        # Global statistics, whole product metadata and BEAM
+        self.assertFalse(GPFTiling.canTile(GPFUtils.snapKey(), "KMeansClusterAnalysis"))
+        self.assertFalse(GPFTiling.canTile(GPFUtils.s1tbxKey(), "Apply-Orbit-File"))
+        self.assertFalse(GPFTiling.canTile(GPFUtils.s1tbxKey(), "Calibration"))
+        self.assertFalse(GPFTiling.canTile(GPFUtils.beamKey(), "BandMaths"))
+        self.assertFalse(GPFTiling.canTile(GPFUtils.snapKey(), "Write"))
+
+    def testTileExtents(self):
+        tiles = GPFTiling.tileExtents((0.0, 2.0, 0.0, 1.0), 1.0, 0.1)
+        self.assertEqual([core for core, _ in tiles], [(0.0, 1.0, 0.0, 1.0), (1.0, 2.0, 0.0, 1.0)])
+        self.assertEqual([extent for _, extent in tiles], [(0.0, 1.1, 0.0, 1.0), (0.9, 2.0, 0.0, 1.0)])
+
+    def testAddTileSubset(self):
+        graph = GPFGraph("Graph")
+        graph.addNode(GPFGraphNode("Read", "Read"))
+        node = graph.addNode(GPFGraphNode("BandMaths", "BandMaths"))
+        node.sources["sourceProduct"] = "Read"
+        GPFTiling.addTileSubset(graph, (0.0, 1.0, 0.0, 1.0))
+        self.assertEqual(graph.node("BandMaths").sources["sourceProduct"], "Read_tile")
+        self.assertEqual(graph.node("Read_tile").sources["sourceProduct"], "Read")
+        self.assertEqual(graph.node("Read_tile").operator, "Subset")
+
+    # Multi-size products are subset only once they are resampled
+    def testTileSubsetAfterResample(self):
+        graph = GPFGraph("Graph")
+        graph.addNode(GPFGraphNode("Read", "Read"))
+        node = graph.addNode(GPFGraphNode("Resample", "Resample"))
+        node.sources["sourceProduct"] = "Read"
+        node = graph.addNode(GPFGraphNode("Write", "Write"))
+        node.sources["sourceProduct"] = "Resample"
+        GPFTiling.addTileSubset(graph, (0.0, 1.0, 0.0, 1.0))
+        self.assertEqual(graph.node("Resample").sources["sourceProduct"], "Read")
+        self.assertEqual(graph.node("Resample_tile").sources["sourceProduct"], "Resample")
+        self.assertEqual(graph.node("Write").sources["sourceProduct"], "Resample_tile")
+        self.assertEqual(graph.node("Read_tile"), None)
+
+    def testMosaicRejectsOutputsWithoutProjection(self):
+        gdal = tilingModule.gdal
+        tilingModule.gdal = FakeGdal("")
+        try:
+            self.assertRaises(GeoAlgorithmExecutionException, GPFTiling.mosaic, 
+                              [((0.0, 1.0, 0.0, 1.0), "tile_0.tif")], "output.tif", "work")
+        finally:
+            tilingModule.gdal = gdal
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+***************************************************************************
+    test_GPFUtils.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import utilities
+from processing_gpf.GPFUtils import GPFUtils
+from processing_gpf.GPFMetadataCache import GPFMetadataCache
+
+
+# Minimal stand-ins for the snappy objects read by GPFUtils.probeProduct
+class FakeObject:
+
+    def __init__(self, **methods):
+        for name, value in methods.items():
+            setattr(self, name, value)
+
+
+def fakeSnappy(mapCRS, bands = ["Amplitude_VV", "Intensity_VV"]):
+    def getMapCRS():
+        if mapCRS is None:
+            raise RuntimeError("no map CRS")
+        return FakeObject(getName = lambda: FakeObject(toString = lambda: mapCRS))
+    geoCoding = FakeObject(getClass = lambda: FakeObject(getSimpleName = lambda: "TiePointGeoCoding"),
+                           getMapCRS = getMapCRS,
+                           getGeoPos = lambda pixelPos, geoPos: FakeObject(lon = pixelPos[0], lat = -pixelPos[1]))
+    product = FakeObject(getName = lambda: "product", 
+                         getBands = lambda: [FakeObject(getName = lambda name = name: name) for name in bands],
+                         getSceneRasterWidth = lambda: 10, getSceneRasterHeight = lambda: 20,
+                         getSceneGeoCoding = lambda: geoCoding, dispose = lambda: None)
+    snappy = FakeObject(ProductIO = FakeObject(readProduct = lambda path: product),
+                        PixelPos = lambda x, y: (x, y))
+    abstractedMetadata = FakeObject(getAbstractedMetadata = lambda product: None)
+    jpy = FakeObject(get_type = lambda name: abstractedMetadata)
+    return snappy, jpy
+
+
+class TestGPFUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.importSnappy = GPFUtils.importSnappy
+
+    def tearDown(self):
+        GPFUtils.importSnappy = staticmethod(self.importSnappy)
+
+    def probe(self, mapCRS):
+        snappy, jpy = fakeSnappy(mapCRS)
+        GPFUtils.importSnappy = staticmethod(lambda: (snappy, jpy))
+        return GPFUtils.probeProduct("product.dim")
+
+    def testProbeProduct(self):
+        metadata = self.probe("WGS84(DD)")
+        self.assertEqual(metadata["bands"], ["Amplitude_VV", "Intensity_VV"])
+        self.assertEqual(metadata["geoCoding"], {"type": "TiePointGeoCoding", "crs": "WGS84(DD)", 
+                                                 "extent": (0.5, 9.5, -19.5, -0.5)})
+
+    def testBandsReturnedWithoutMapCRS(self):
+        metadata = self.probe(None)
+        self.assertFalse(metadata.get("error"))
+        self.assertEqual(metadata["bands"], ["Amplitude_VV", "Intensity_VV"])
+        self.assertEqual(metadata["geoCoding"]["crs"], None)
+        self.assertEqual(metadata["geoCoding"]["extent"], (0.5, 9.5, -19.5, -0.5))
+
+    def testSentinel2BandsProbedWithSnappy(self):
+        folder = tempfile.mkdtemp(prefix = "gpf_test_s2_")
+        try:
+            GPFMetadataCache.clear()
+            metadataFile = os.path.join(folder, "MTD_MSIL2A.xml")
+            with open(metadataFile, "w") as f:
+                f.write('<Level-2A_User_Product><Product_Image_Characteristics>'
+                        '<Spectral_Information physicalBand="B1"/><Spectral_Information physicalBand="B2"/>'
+                        '</Product_Image_Characteristics></Level-2A_User_Product>')
+            # The metadata file lists only the spectral bands
+            snappy, jpy = fakeSnappy(None, ["B1", "B2", "view_zenith_mean", "quality_scene_classification"])
+            GPFUtils.importSnappy = staticmethod(lambda: (snappy, jpy))
+            self.assertEqual(GPFUtils.getSnapBandNames(metadataFile), ["B1", "B2", "view_zenith_mean", "quality_scene_classification"])
+        finally:
+            GPFMetadataCache.clear()
+            shutil.rmtree(folder, ignore_errors = True)
+
+
+if __name__ == "__main__":
+    unittest.main()
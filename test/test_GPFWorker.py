@@ -0,0 +1,166 @@
+"""
+***************************************************************************
+    test_GPFWorker.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import utilities
+from processing.core.GeoAlgorithmExecutionException import GeoAlgorithmExecutionException
+from processing_gpf.GPFWorker import GPFWorker
+from processing_gpf.GPFUtils import GPFUtils
+
+FAKE_WORKER = os.path.join(utilities.PLUGIN_FOLDER, "processing_gpt_worker", "fakeGptWorker.py")
+
+GRAPH = """<graph id="Graph">
+  <version>1.0</version>
+  <node id="read"><operator>Read</operator><sources/><parameters><file>in.dim</file></parameters></node>
+  <node id="write"><operator>Write</operator><sources><sourceProduct refid="read"/></sources>
+    <parameters><file>%s</file><formatName>GeoTIFF</formatName></parameters></node>
+</graph>"""
+
+
+class Progress:
+
+    def __init__(self):
+        self.percentages = []
+        self.console = []
+
+    def setPercentage(self, percentage):
+        self.percentages.append(percentage)
+
+    def setConsoleInfo(self, text):
+        self.console.append(text)
+
+
+# The worker protocol, run against the stand-in worker which needs no SNAP
+class TestGPFWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix = "gpf_test_worker_")
+        self.worker = GPFWorker([sys.executable, FAKE_WORKER])
+
+    def tearDown(self):
+        self.worker.stop()
+        shutil.rmtree(self.folder, ignore_errors = True)
+
+    def graphFile(self, name, content):
+        path = os.path.join(self.folder, name)
+        with open(path, "w") as graphFile:
+            graphFile.write(content)
+        return path
+
+    def testExecuteGraph(self):
+        output = os.path.join(self.folder, "out.tif")
+        progress = Progress()
+        loglines = []
+        status = self.worker.execute(self.graphFile("gpf.xml", GRAPH % output), 2, progress, loglines, tileCache = 512)
+        self.assertEqual(status, 0)
+        self.assertTrue(os.path.exists(output))
+        self.assertTrue(any(["2 threads, tile cache 512 MB" in line for line in loglines]))
+        self.assertFalse(any([line.startswith(GPFWorker.DONE) for line in loglines]))
+        self.assertEqual(progress.percentages[-1], 100)
+
+    def testWorkerIsReused(self):
+        self.worker.execute(self.graphFile("a.xml", GRAPH % os.path.join(self.folder, "a.tif")), 1, Progress(), [])
+        pid = self.worker.proc.pid
+        self.worker.execute(self.graphFile("b.xml", GRAPH % os.path.join(self.folder, "b.tif")), 1, Progress(), [])
+        self.assertEqual(self.worker.proc.pid, pid)
+
+    def testFailedGraphStatus(self):
+        loglines = []
+        status = self.worker.execute(self.graphFile("bad.xml", "<graph"), 1, Progress(), loglines)
+        self.assertEqual(status, 1)
+        self.assertTrue(any([line.startswith("Error:") for line in loglines]))
+        # the worker stays usable after a failed job
+        self.assertEqual(self.worker.execute(self.graphFile("good.xml", GRAPH % os.path.join(self.folder, "c.tif")), 1, Progress(), []), 0)
+
+    def testRunGptRaisesOnFailedGraph(self):
+        utilities.setSetting(GPFUtils.SNAP_WORKER_ACTIVATE, True)
+        GPFUtils._gptWorker = self.worker
+        try:
+            self.assertEqual(GPFUtils.runGpt(GPFUtils.snapKey(), self.graphFile("good.xml", GRAPH % os.path.join(self.folder, "f.tif")), 
+                                             1, Progress(), []), 0)
+            self.assertRaises(GeoAlgorithmExecutionException, GPFUtils.runGpt, GPFUtils.snapKey(), 
+                              self.graphFile("bad.xml", "<graph"), 1, Progress(), [])
+        finally:
+            GPFUtils._gptWorker = None
+            utilities.setSetting(GPFUtils.SNAP_WORKER_ACTIVATE, None)
+
+    def testSingleWorkerForParallelJobs(self):
+        # Worker creation slow enough for the jobs to overlap
+        init = GPFWorker.__init__
+        def slowInit(worker, command):
+            time.sleep(0.05)
+            init(worker, command)
+        GPFWorker.__init__ = slowInit
+        workers = []
+        try:
+            threads = [threading.Thread(target = lambda: workers.append(GPFUtils.gptWorker())) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            GPFWorker.__init__ = init
+            GPFUtils._gptWorker = None
+        self.assertEqual(len(workers), 4)
+        self.assertTrue(all([worker is workers[0] for worker in workers]))
+
+    def testDeadWorkerIsRestarted(self):
+        self.worker.start()
+        self.worker.proc.kill()
+        self.worker.proc.wait()
+        self.assertEqual(self.worker.execute(self.graphFile("gpf.xml", GRAPH % os.path.join(self.folder, "d.tif")), 1, Progress(), []), 0)
+
+    def testWorkerTerminatedDuringJob(self):
+        # worker which exits as soon as it gets a job
+        worker = GPFWorker([sys.executable, "-c", "import sys; print '%s'; sys.stdout.flush(); sys.stdin.readline()" % GPFWorker.READY])
+        self.assertRaises(GeoAlgorithmExecutionException, worker.execute,
+                          self.graphFile("gpf.xml", GRAPH % os.path.join(self.folder, "e.tif")), 1, Progress(), [])
+        self.assertFalse(worker.isRunning())
+
+    def testWorkerFailsToStart(self):
+        worker = GPFWorker([sys.executable, "-c", "print 'no snappy'"])
+        self.assertRaises(GeoAlgorithmExecutionException, worker.start)
+
+    def testStop(self):
+        self.worker.start()
+        proc = self.worker.proc
+        self.worker.stop()
+        self.assertFalse(self.worker.isRunning())
+        self.assertEqual(proc.returncode, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
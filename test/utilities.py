@@ -0,0 +1,164 @@
+"""
+***************************************************************************
+    utilities.py
+-------------------------------------
+    Copyright (C) 2014 TIGER-NET (www.tiger-net.org)
+
+***************************************************************************
+* This plugin is part of the Water Observation Information System (WOIS)  *
+* developed under the TIGER-NET project funded by the European Space      *
+* Agency as part of the long-term TIGER initiative aiming at promoting    *
+* the use of Earth Observation (EO) for improved Integrated Water         *
+* Resources Management (IWRM) in Africa.                                  *
+*                                                                         *
+* WOIS is a free software i.e. you can redistribute it and/or modify      *
+* it under the terms of the GNU General Public License as published       *
+* by the Free Software Foundation, either version 3 of the License,       *
+* or (at your option) any later version.                                  *
+*                                                                         *
+* WOIS is distributed in the hope that it will be useful, but WITHOUT ANY *
+* WARRANTY; without even the implied warranty of MERCHANTABILITY or       *
+* FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License   *
+* for more details.                                                       *
+*                                                                         *
+* You should have received a copy of the GNU General Public License along *
+* with this program.  If not, see <http://www.gnu.org/licenses/>.         *
+***************************************************************************
+"""
+
+
+# Helpers for the unit tests of the plugin's pure Python logic (graph handling,
+# caching, staging, job queue, ...) which can run without QGIS:
+#   python -m unittest discover -s test -p "test_*.py"
+# When QGIS' Processing framework or GDAL can't be imported, minimal stand-ins
+# of the parts used by those modules are installed. The plugin folder is made 
+# importable as processing_gpf whatever the name of the checkout.
+
+import os
+import sys
+import types
+import shutil
+import tempfile
+
+PLUGIN_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+USER_FOLDER = tempfile.mkdtemp(prefix = "gpf_test_user_")
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    if "." in name:
+        parent, child = name.rsplit(".", 1)
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def _installProcessing():
+    try:
+        import processing.core.ProcessingConfig
+        return
+    except ImportError:
+        pass
+
+    class Setting(object):
+        def __init__(self, group, name, description, default, *args, **kwargs):
+            self.group = group
+            self.name = name
+            self.description = description
+            self.value = default
+
+    class ProcessingConfig:
+        settings = {}
+
+        @staticmethod
+        def getSetting(name):
+            return ProcessingConfig.settings.get(name)
+
+        @staticmethod
+        def setSettingValue(name, value):
+            ProcessingConfig.settings[name] = value
+
+        @staticmethod
+        def addSetting(setting):
+            ProcessingConfig.settings.setdefault(setting.name, setting.value)
+
+        @staticmethod
+        def removeSetting(name):
+            ProcessingConfig.settings.pop(name, None)
+
+    class ProcessingLog:
+        LOG_ERROR = "ERROR"
+        LOG_INFO = "INFO"
+        LOG_WARNING = "WARNING"
+        entries = []
+
+        @staticmethod
+        def addToLog(msgtype, msg):
+            ProcessingLog.entries.append((msgtype, msg))
+
+    class GeoAlgorithmExecutionException(Exception):
+        def __init__(self, msg):
+            Exception.__init__(self, msg)
+            self.msg = msg
+
+    def userFolder():
+        return USER_FOLDER
+
+    def mkdir(folder):
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    _module("processing", __path__ = [])
+    _module("processing.core", __path__ = [])
+    _module("processing.core.ProcessingConfig", ProcessingConfig = ProcessingConfig, Setting = Setting)
+    _module("processing.core.ProcessingLog", ProcessingLog = ProcessingLog)
+    _module("processing.core.GeoAlgorithmExecutionException", GeoAlgorithmExecutionException = GeoAlgorithmExecutionException)
+    _module("processing.tools", __path__ = [])
+    _module("processing.tools.system", userFolder = userFolder, mkdir = mkdir)
+
+
+def _installGdal():
+    try:
+        from osgeo import gdal, osr
+        return
+    except ImportError:
+        pass
+    _module("osgeo", __path__ = [])
+    _module("osgeo.gdal")
+    _module("osgeo.osr")
+
+
+def _installPlugin():
+    if "processing_gpf" not in sys.modules:
+        _module("processing_gpf", __path__ = [PLUGIN_FOLDER])
+
+
+_installProcessing()
+_installGdal()
+_installPlugin()
+
+
+# Settings and log of the Processing framework used by the plugin
+def processingConfig():
+    from processing.core.ProcessingConfig import ProcessingConfig
+    return ProcessingConfig
+
+
+def processingLog():
+    from processing.core.ProcessingLog import ProcessingLog
+    return ProcessingLog
+
+
+def setSetting(name, value):
+    processingConfig().setSettingValue(name, value)
+
+
+def clearUserFolder():
+    for name in os.listdir(USER_FOLDER):
+        path = os.path.join(USER_FOLDER, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors = True)
+        else:
+            os.remove(path)